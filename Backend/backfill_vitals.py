@@ -0,0 +1,14 @@
+from database.db import SessionLocal
+from models.User import AuthUser
+from models.Patient import Patient
+from models.Appointment import Appointment
+from services.vitals_service import backfill_vitals
+
+
+# Generar los signos vitales numéricos de las citas registradas antes de appointment_vitals
+db = SessionLocal()
+try:
+    total = backfill_vitals(db)
+    print(f"Signos vitales generados para {total} citas")
+finally:
+    db.close()
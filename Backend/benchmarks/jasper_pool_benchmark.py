@@ -0,0 +1,114 @@
+"""
+Throughput de certificados Jasper con peticiones en paralelo: un PyReportJasper() nuevo
+por petición (como antes) vs el pool de procesos con la JVM caliente (services/jasper_pool.py),
+que recibe los datos ya leídos con el pool de SQLAlchemy.
+
+Necesita pyreportjasper, Java, DATABASE_URL y citas con diagnóstico principal.
+Cada modo corre en un proceso hijo aparte para que no compartan la JVM.
+
+Uso (desde Backend/):
+    python -m benchmarks.jasper_pool_benchmark --appointment-ids 10 11 12 --requests 60 --concurrency 8
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def jdbc_connection():
+    """Conexión que PyReportJasper abría por su cuenta en cada petición (el modo anterior)"""
+    from sqlalchemy.engine import make_url
+    from database.db import DATABASE_URL
+
+    url = make_url(DATABASE_URL)
+    port = url.port or 5432
+    return {
+        'driver': 'postgres',
+        'username': url.username,
+        'password': url.password,
+        'host': url.host,
+        'database': url.database,
+        'port': str(port),
+        'jdbc_driver': 'org.postgresql.Driver',
+        'jdbc_url': f'jdbc:postgresql://{url.host}:{port}/{url.database}'
+    }
+
+
+def per_request_renderer():
+    from pyreportjasper import PyReportJasper
+    from routes.report import REPORTS_DIR
+
+    output_dir = tempfile.mkdtemp()
+    input_file = os.path.abspath(os.path.join(REPORTS_DIR, "medicalCertificate.jrxml"))
+    db_connection = jdbc_connection()
+
+    def render(appointment_id):
+        output_file = os.path.join(output_dir, f"certificate_{appointment_id}_{time.perf_counter_ns()}")
+        jasper = PyReportJasper()
+        jasper.config(input_file=input_file, output_file=output_file, output_formats=["pdf"],
+                      parameters={"APPOINTMENT_ID": appointment_id}, db_connection=db_connection)
+        jasper.process_report()
+        with open(f"{output_file}.pdf", "rb") as pdf:
+            data = pdf.read()
+        os.remove(f"{output_file}.pdf")
+        return data
+    return render, None
+
+
+def pool_renderer():
+    from database.db import SessionLocal
+    from routes.report import jasper_pool
+    from services.jasper_pool import certificate_rows
+    from services.report_data import load_certificate
+
+    started = time.perf_counter()
+    jasper_pool.start()
+    startup = time.perf_counter() - started
+
+    def render(appointment_id):
+        with SessionLocal() as db:
+            rows = certificate_rows(load_certificate(db, appointment_id))
+        return jasper_pool.render("medicalCertificate", {"APPOINTMENT_ID": appointment_id}, rows)
+    return render, startup
+
+
+def run(mode, appointment_ids, requests, concurrency):
+    render, startup = {"por petición": per_request_renderer, "pool": pool_renderer}[mode]()
+
+    def timed(index):
+        started = time.perf_counter()
+        render(appointment_ids[index % len(appointment_ids)])
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        latencies = sorted(executor.map(timed, range(requests)))
+    elapsed = time.perf_counter() - started
+
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    arranque = f"   arranque {startup:6.1f} s" if startup is not None else ""
+    print(f"{mode:<13} {requests / elapsed:7.2f} certificados/s   p50 {statistics.median(latencies) * 1000:8.1f} ms"
+          f"   p95 {p95 * 1000:8.1f} ms{arranque}", flush=True)
+
+    if mode == "pool":
+        from routes.report import jasper_pool
+        jasper_pool.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--appointment-ids", type=int, nargs="+", required=True)
+    parser.add_argument("--requests", type=int, default=60)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    print(f"{args.requests} certificados, {args.concurrency} en paralelo, "
+          f"JASPER_WORKERS={os.getenv('JASPER_WORKERS', '2')}")
+    for mode in ("por petición", "pool"):
+        process = context.Process(target=run, args=(mode, args.appointment_ids, args.requests, args.concurrency))
+        process.start()
+        process.join()
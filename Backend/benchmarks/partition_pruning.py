@@ -0,0 +1,83 @@
+"""
+Demostración de poda de particiones sobre un conjunto de citas de varios años.
+
+Crea el esquema temporal partition_demo con dos copias de la estructura de
+medical.appointments (una normal y otra particionada por año con
+database.partitioning), siembra las mismas filas sintéticas en ambas y muestra
+el EXPLAIN de una consulta de los últimos 30 días. En la tabla particionada el
+plan solo recorre la partición del año en curso. Al terminar se elimina el esquema.
+
+Uso (desde Backend/, con una base PostgreSQL de pruebas en DATABASE_URL):
+    python -m benchmarks.partition_pruning [años] [citas_por_día]
+"""
+import os
+import sys
+from datetime import date
+
+from sqlalchemy import create_engine, text
+
+from models.User import AuthUser
+from models.Patient import Patient
+from models.Appointment import Appointment
+from database.partitioning import _indexes
+
+YEARS = int(sys.argv[1]) if len(sys.argv) > 1 else 6
+PER_DAY = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+
+QUERY = """
+    EXPLAIN (ANALYZE, COSTS OFF, TIMING OFF)
+    SELECT id, appointment_date, appointment_time
+    FROM partition_demo.{table}
+    WHERE appointment_date >= current_date - 30
+    ORDER BY appointment_date DESC, appointment_time DESC
+    LIMIT 100
+"""
+
+
+def main():
+    engine = create_engine(os.environ["DATABASE_URL"])
+    today = date.today()
+    first_year = today.year - YEARS + 1
+
+    with engine.begin() as connection:
+        connection.execute(text("DROP SCHEMA IF EXISTS partition_demo CASCADE"))
+        connection.execute(text("CREATE SCHEMA partition_demo"))
+        connection.execute(text("""
+            CREATE TABLE partition_demo.plain (
+                LIKE medical.appointments INCLUDING DEFAULTS INCLUDING GENERATED INCLUDING INDEXES)"""))
+        connection.execute(text("""
+            CREATE TABLE partition_demo.partitioned (
+                LIKE medical.appointments INCLUDING DEFAULTS INCLUDING GENERATED,
+                PRIMARY KEY (id, appointment_date)
+            ) PARTITION BY RANGE (appointment_date)"""))
+        for year in range(first_year, today.year + 2):
+            connection.execute(text(
+                f"CREATE TABLE partition_demo.partitioned_{year} PARTITION OF partition_demo.partitioned "
+                f"FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')"))
+        for name, definition in _indexes():
+            connection.execute(text(f"CREATE INDEX ON partition_demo.partitioned {definition}"))
+
+        for table in ("plain", "partitioned"):
+            connection.execute(text(f"""
+                INSERT INTO partition_demo.{table}
+                    (id, patient_id, user_id, appointment_date, appointment_time, current_illness, created_at)
+                SELECT row_number() OVER (), 1, 1, day::date, time '08:00' + (slot * interval '10 minutes'),
+                       'Paciente refiere dolor abdominal', now()
+                FROM generate_series(CAST(:first AS date), current_date, interval '1 day') AS day,
+                     generate_series(1, :per_day) AS slot"""),
+                {"first": date(first_year, 1, 1), "per_day": PER_DAY})
+            connection.execute(text(f"ANALYZE partition_demo.{table}"))
+
+    with engine.connect() as connection:
+        for table in ("plain", "partitioned"):
+            rows = connection.execute(text(f"SELECT count(*) FROM partition_demo.{table}")).scalar()
+            print(f"\n=== {table} ({rows} citas, {YEARS} años) ===")
+            for line in connection.execute(text(QUERY.format(table=table))).scalars():
+                print(line)
+
+    with engine.begin() as connection:
+        connection.execute(text("DROP SCHEMA partition_demo CASCADE"))
+
+
+if __name__ == "__main__":
+    main()
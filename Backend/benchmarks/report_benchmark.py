@@ -0,0 +1,131 @@
+"""
+Benchmark de generación de reportes PDF: ReportLab (services/report_pdf.py) vs JasperReports.
+
+Cada motor se mide en un proceso hijo aparte para que el pico de memoria (RSS)
+de uno no contamine al otro. Se reporta la primera generación (en frío: imports,
+JVM, compilación de plantillas) y la mediana de las siguientes.
+
+- python: datos sintéticos armados en memoria, no necesita base de datos.
+- jasper: necesita pyreportjasper, Java y DATABASE_URL, y los IDs a usar; los datos se leen
+  una vez antes de medir, igual que en el motor python solo se mide la generación.
+
+Uso (desde Backend/):
+    python -m benchmarks.report_benchmark
+    python -m benchmarks.report_benchmark --jasper --patient-id 12 --appointment-id 345
+"""
+import argparse
+import multiprocessing
+import resource
+import statistics
+import sys
+import time
+from datetime import date, time as clock, timedelta
+from decimal import Decimal
+
+APPOINTMENTS = 40
+REPEAT = 10
+
+TEXT = "Paciente refiere dolor abdominal de tres días de evolución, sin fiebre. " * 3
+
+
+def build_medical_record():
+    patient = {"id": 1, "first_name": "María", "last_name": "Salazar", "document_id": "1712345678",
+               "birth_date": date(1985, 3, 14), "gender": "F", "enterprise": "Textiles Andinos",
+               "work_activity": "Operaria", "street": "Av. Amazonas", "neighborhood": "Centro", "city": "Quito",
+               "telephone": "0999999999"}
+    appointments = []
+    for i in range(APPOINTMENTS):
+        appointments.append({
+            "id": i, "appointment_date": date(2025, 1, 1) - timedelta(days=30 * i), "appointment_time": clock(9, 30),
+            "current_illness": TEXT, "physical_examination": TEXT, "observations": TEXT,
+            "laboratory_tests": "Biometría hemática", "temperature": "36.8", "blood_pressure": "120/80",
+            "heart_rate": "72", "oxygen_saturation": "97", "weight": Decimal("70.50"), "weight_unit": "kg",
+            "height": "170", "medical_preinscription": None, "doctor_first_name": "Ana", "doctor_last_name": "Pérez",
+            "doctor_cedula": None,
+            "diagnoses": [{"appointment_id": i, "diagnosis_code": f"K3{k}", "diagnosis_description": "Dispepsia",
+                           "diagnosis_type": "primary" if k == 0 else "secondary", "diagnosis_observations": None}
+                          for k in range(3)],
+            "recipes": [{"appointment_id": i, "medicine": "Omeprazol 20 mg", "amount": "14",
+                         "instructions": "Una cápsula cada 12 horas", "lunchTime": ["desayuno", "cena"],
+                         "observations": None} for _ in range(2)],
+        })
+    return {"patient": patient, "appointments": appointments}
+
+
+def build_certificate():
+    record = build_medical_record()
+    appointment = dict(record["appointments"][0])
+    appointment.update(patient=record["patient"], rest_from=date(2025, 1, 1), rest_to=date(2025, 1, 3),
+                       sabbath_days=3, has_representative=False, contingency_type="Enfermedad general",
+                       contact_first_name=None, contact_last_name=None, contact_document_id=None,
+                       relationship_type=None)
+    appointment["diagnoses"] = appointment["diagnoses"][:1]
+    return appointment
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss está en KB en Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(render, label):
+    started = time.perf_counter()
+    size = len(render())
+    cold = time.perf_counter() - started
+    warm = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        render()
+        warm.append(time.perf_counter() - started)
+    print(f"{label:<34} frío {cold * 1000:9.1f} ms   caliente {statistics.median(warm) * 1000:8.1f} ms"
+          f"   {size / 1024:7.1f} KB   RSS pico {peak_rss_mb():7.1f} MB", flush=True)
+
+
+def run_python():
+    from services.report_pdf import render_medical_record, render_certificate, render_prescription
+
+    record, certificate = build_medical_record(), build_certificate()
+    prescription = dict(certificate, recipes=certificate["recipes"] * 10)
+    measure(lambda: render_medical_record(record), f"python historial ({APPOINTMENTS} citas)")
+    measure(lambda: render_certificate(certificate), "python certificado")
+    measure(lambda: render_prescription(prescription), f"python receta ({len(prescription['recipes'])} medicamentos)")
+
+
+def run_jasper(patient_id: int, appointment_id: int):
+    from database.db import SessionLocal
+    from routes.report import jasper_pool
+    from services.jasper_pool import medical_record_rows, certificate_rows
+    from services.report_data import load_medical_record, load_certificate
+
+    with SessionLocal() as db:
+        record = medical_record_rows(load_medical_record(db, patient_id))
+        certificate = certificate_rows(load_certificate(db, appointment_id))
+
+    # La primera generación incluye arrancar el pool (JVM y plantillas). El RSS pico es solo
+    # el de este proceso: la JVM vive en los procesos del pool
+    measure(lambda: jasper_pool.render("MedicalRecord", {"patient_id": patient_id}, record),
+            f"jasper historial (paciente {patient_id})")
+    measure(lambda: jasper_pool.render("medicalCertificate", {"APPOINTMENT_ID": appointment_id}, certificate),
+            f"jasper certificado (cita {appointment_id})")
+    jasper_pool.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--jasper", action="store_true", help="Medir también el motor Jasper")
+    parser.add_argument("--patient-id", type=int)
+    parser.add_argument("--appointment-id", type=int)
+    args = parser.parse_args()
+
+    if args.jasper and (args.patient_id is None or args.appointment_id is None):
+        sys.exit("--jasper necesita --patient-id y --appointment-id")
+
+    context = multiprocessing.get_context("spawn")
+    print(f"Mediana de {REPEAT} generaciones después de la primera")
+    jobs = [(run_python, ())]
+    if args.jasper:
+        jobs.append((run_jasper, (args.patient_id, args.appointment_id)))
+    for target, job_args in jobs:
+        process = context.Process(target=target, args=job_args)
+        process.start()
+        process.join()
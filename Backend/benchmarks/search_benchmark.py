@@ -0,0 +1,133 @@
+"""
+Búsqueda de citas en dos fases (services.appointment_service.search_appointments) vs la
+consulta anterior con joinedload, sobre citas con muchos diagnósticos.
+
+Crea el esquema temporal search_demo con copias de medical.patients, medical.appointments
+y medical.appointment_diagnoses, siembra citas con N diagnósticos cada una y ejecuta las
+dos consultas con las mismas búsquedas (por diagnóstico, que antes multiplicaba filas antes
+del LIMIT, y por nombre del paciente). Muestra el tiempo, las filas que devuelve la base,
+las sentencias ejecutadas y cuántas citas llegan en la página frente a limit. Al terminar
+se elimina el esquema.
+
+Uso (desde Backend/, con una base PostgreSQL de pruebas en DATABASE_URL):
+    python -m benchmarks.search_benchmark [citas] [diagnósticos_por_cita] [limit]
+"""
+import os
+import statistics
+import sys
+import time
+
+from sqlalchemy import create_engine, desc, event, func, or_, text
+from sqlalchemy.orm import Session, joinedload
+
+from models.User import AuthUser
+from models.Patient import Patient
+from models.Appointment import Appointment, AppointmentDiagnosis
+from services.appointment_service import search_appointments
+
+APPOINTMENTS = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+DIAGNOSES = int(sys.argv[2]) if len(sys.argv) > 2 else 12
+LIMIT = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+PATIENTS = max(1, APPOINTMENTS // 20)
+REPEAT = 5
+
+SEARCHES = (
+    ("diagnóstico", "dolor"),
+    ("paciente", "torres"),
+)
+
+
+def joinedload_search(db: Session, query: str, skip: int = 0, limit: int = 100):
+    """La consulta anterior: joins para filtrar y joinedload, con LIMIT sobre cita x diagnóstico"""
+    search_term = f"%{query.lower()}%"
+    return (db.query(Appointment)
+            .options(joinedload(Appointment.patient), joinedload(Appointment.diagnoses))
+            .join(Patient).outerjoin(AppointmentDiagnosis)
+            .filter(or_(
+                func.lower(Patient.first_name).like(search_term),
+                func.lower(Patient.last_name).like(search_term),
+                Patient.document_id.contains(query.strip()),
+                func.lower(AppointmentDiagnosis.diagnosis_description).like(search_term),
+                AppointmentDiagnosis.diagnosis_code.contains(query.strip().upper())
+            ))
+            .order_by(desc(Appointment.appointment_date), desc(Appointment.appointment_time))
+            .offset(skip).limit(limit).all())
+
+
+def seed(engine):
+    with engine.begin() as connection:
+        connection.execute(text("DROP SCHEMA IF EXISTS search_demo CASCADE"))
+        connection.execute(text("CREATE SCHEMA search_demo"))
+        for table in ("patients", "appointments", "appointment_diagnoses"):
+            connection.execute(text(f"""
+                CREATE TABLE search_demo.{table} (
+                    LIKE medical.{table} INCLUDING DEFAULTS INCLUDING GENERATED INCLUDING INDEXES)"""))
+
+        connection.execute(text("""
+            INSERT INTO search_demo.patients (id, first_name, last_name, gender, document_id, created_at)
+            SELECT n, 'Juan', 'Torres ' || n, 'M', lpad(n::text, 10, '0'), now()
+            FROM generate_series(1, :patients) AS n"""), {"patients": PATIENTS})
+        connection.execute(text("""
+            INSERT INTO search_demo.appointments
+                (id, patient_id, user_id, appointment_date, appointment_time, current_illness, created_at)
+            SELECT n, 1 + n % :patients, 1, current_date - (n % 730), time '08:00' + (n % 60) * interval '10 minutes',
+                   'Paciente refiere dolor abdominal', now()
+            FROM generate_series(1, :appointments) AS n"""),
+            {"patients": PATIENTS, "appointments": APPOINTMENTS})
+        connection.execute(text("""
+            INSERT INTO search_demo.appointment_diagnoses
+                (id, appointment_id, diagnosis_code, diagnosis_description, diagnosis_type, created_at)
+            SELECT row_number() OVER (), a, 'R' || lpad((10 + k)::text, 2, '0'), 'Dolor abdominal tipo ' || k,
+                   CASE WHEN k = 1 THEN 'primary' ELSE 'secondary' END, now()
+            FROM generate_series(1, :appointments) AS a, generate_series(1, :diagnoses) AS k"""),
+            {"appointments": APPOINTMENTS, "diagnoses": DIAGNOSES})
+        for table in ("patients", "appointments", "appointment_diagnoses"):
+            connection.execute(text(f"ANALYZE search_demo.{table}"))
+
+
+def measure(engine, search, query):
+    counters = {"statements": 0, "rows": 0}
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        counters["statements"] += 1
+        counters["rows"] += max(cursor.rowcount, 0)
+
+    timings = []
+    event.listen(engine, "after_cursor_execute", count)
+    try:
+        for _ in range(REPEAT):
+            counters.update(statements=0, rows=0)
+            with Session(engine) as db:
+                started = time.perf_counter()
+                appointments = search(db, query, limit=LIMIT)
+                timings.append(time.perf_counter() - started)
+    finally:
+        event.remove(engine, "after_cursor_execute", count)
+    return statistics.median(timings), counters, appointments
+
+
+def main():
+    base = create_engine(os.environ["DATABASE_URL"])
+    seed(base)
+    # Las consultas del ORM (schema "medical") se dirigen a las tablas sembradas
+    engine = base.execution_options(schema_translate_map={"medical": "search_demo"})
+
+    try:
+        print(f"{APPOINTMENTS} citas con {DIAGNOSES} diagnósticos cada una, {PATIENTS} pacientes, limit {LIMIT}")
+        for label, query in SEARCHES:
+            print(f"\n=== búsqueda por {label}: '{query}' ===")
+            for name, search in (("joinedload", joinedload_search), ("dos fases", search_appointments)):
+                elapsed, counters, appointments = measure(engine, search, query)
+                distinct = len({appointment.id for appointment in appointments})
+                diagnoses = sum(len(appointment.diagnoses) for appointment in appointments)
+                respected = "sí" if distinct == min(LIMIT, APPOINTMENTS) else "no"
+                print(f"{name:<11} {elapsed * 1000:8.1f} ms   {counters['rows']:7d} filas   "
+                      f"{counters['statements']} consultas   {distinct:4d}/{LIMIT} citas "
+                      f"(limit respetado: {respected})   {diagnoses} diagnósticos cargados")
+    finally:
+        with base.begin() as connection:
+            connection.execute(text("DROP SCHEMA search_demo CASCADE"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Micro-benchmark de serialización para listas de 1000 filas.
+
+Compara el camino por defecto (objetos ORM -> from_attributes -> JSONResponse)
+con el camino rápido (diccionarios armados desde filas SQL -> TypeAdapter
+cacheado -> orjson). No necesita base de datos: los objetos ORM son transitorios.
+
+Uso (desde Backend/):
+    python -m benchmarks.serialization_benchmark
+"""
+import json
+import timeit
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import List
+
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from models.User import AuthUser
+from models.Patient import Patient
+from models.Contact import Contact
+from models.Appointment import Appointment, AppointmentDiagnosis
+from models.Recipe import Recipe
+from schemas.appointment import AppointmentResponse
+from schemas.patient import PatientResponse
+from schemas.serialization import rows_response
+
+ROWS = 1000
+REPEAT = 5
+NUMBER = 3
+
+TEXT = "Paciente refiere dolor abdominal de tres días de evolución, sin fiebre. " * 3
+
+
+def build_appointments():
+    user = AuthUser(id=1, first_name="Ana", last_name="Pérez", email="ana@clinica.ec")
+    objects, rows = [], []
+    for i in range(ROWS):
+        patient = Patient(id=i, first_name="Juan", last_name=f"Torres {i}", document_id=f"17{i:08d}",
+                          medical_history="Hipertensión", gender="M")
+        appointment = Appointment(
+            id=i, patient_id=i, user_id=1, appointment_date=date(2025, 1, 1) + timedelta(days=i % 365),
+            appointment_time=time(8 + i % 10, 30), current_illness=TEXT, physical_examination=TEXT,
+            observations=TEXT, laboratory_tests="Biometría hemática", temperature="36.8",
+            blood_pressure="120/80", heart_rate="72", oxygen_saturation="97", weight=Decimal("70.50"),
+            weight_unit="kg", height="170", sabbath_days=None, rest_from=None, rest_to=None,
+            has_representative=False, representative_id=None, medical_preinscription=TEXT,
+            contingency_type="Enfermedad general", created_at=datetime(2025, 1, 1, 8), updated_at=None
+        )
+        appointment.patient = patient
+        appointment.user = user
+        appointment.diagnoses = [
+            AppointmentDiagnosis(id=i * 3 + k, appointment_id=i, diagnosis_code=f"K{30 + k}",
+                                 diagnosis_description="Dispepsia", diagnosis_type="secondary",
+                                 diagnosis_observations=None, created_at=datetime(2025, 1, 1, 8))
+            for k in range(3)
+        ]
+        appointment.recipes = [
+            Recipe(id=i * 2 + k, appointment_id=i, medicine="Omeprazol 20 mg", amount="14",
+                   instructions="Una cápsula cada 12 horas", lunchTime=["desayuno", "cena"], observations=None)
+            for k in range(2)
+        ]
+        objects.append(appointment)
+
+        row = {column: getattr(appointment, column) for column in AppointmentResponse.model_fields
+               if column in Appointment.__table__.c}
+        row["patient"] = {column: getattr(patient, column) for column in ("id", "first_name", "last_name",
+                                                                          "document_id", "medical_history")}
+        row["user"] = {"id": 1, "first_name": "Ana", "last_name": "Pérez", "email": "ana@clinica.ec"}
+        row["diagnoses"] = [{column: getattr(d, column) for column in ("id", "appointment_id", "diagnosis_code",
+                                                                       "diagnosis_description", "diagnosis_type",
+                                                                       "diagnosis_observations", "created_at")}
+                            for d in appointment.diagnoses]
+        row["recipes"] = [{column: getattr(r, column) for column in ("id", "appointment_id", "medicine", "amount",
+                                                                     "instructions", "lunchTime", "observations")}
+                          for r in appointment.recipes]
+        rows.append(row)
+    return objects, rows
+
+
+def build_patients():
+    objects, rows = [], []
+    for i in range(ROWS):
+        patient = Patient(id=i, first_name="María", last_name=f"Salazar {i}", gender="F", document_id=f"09{i:08d}",
+                          birth_date=date(1980, 1, 1), city="Quito", province="Pichincha", street="Av. Amazonas",
+                          email="maria@correo.ec", telephone="0999999999", created_at=datetime(2025, 1, 1))
+        patient.contacts = [Contact(id=i, patient_id=i, first_name="Luis", last_name="Salazar", phone="0988888888",
+                                    email=None, relationship_type="Hermano", document_id=None,
+                                    created_at=datetime(2025, 1, 1))]
+        objects.append(patient)
+        row = {column: getattr(patient, column) for column in PatientResponse.model_fields
+               if column in Patient.__table__.c}
+        row["contacts"] = [{"id": i, "first_name": "Luis", "last_name": "Salazar", "phone": "0988888888",
+                            "email": None, "relationship_type": "Hermano", "document_id": None,
+                            "created_at": datetime(2025, 1, 1)}]
+        rows.append(row)
+    return objects, rows
+
+
+def orm_path(schema, objects):
+    # Equivalente a lo que hace FastAPI con response_model sobre objetos ORM
+    adapter = TypeAdapter(schema)
+    value = adapter.validate_python(objects, from_attributes=True)
+    return JSONResponse(content=adapter.dump_python(value, mode="json")).body
+
+
+def fast_path(schema, rows):
+    return rows_response(schema, rows).body
+
+
+def report(name, schema, objects, rows):
+    assert json.loads(orm_path(schema, objects)) == json.loads(fast_path(schema, rows))
+    size = len(fast_path(schema, rows))
+    for label, func, data in (("orm + JSONResponse", orm_path, objects), ("rows + orjson", fast_path, rows)):
+        best = min(timeit.repeat(lambda: func(schema, data), repeat=REPEAT, number=NUMBER)) / NUMBER
+        print(f"{name:<14} {label:<20} {best * 1000:8.2f} ms   {size / 1024:8.1f} KB")
+
+
+if __name__ == "__main__":
+    appointments, appointment_rows = build_appointments()
+    patients, patient_rows = build_patients()
+    print(f"{ROWS} filas, mejor de {REPEAT}x{NUMBER}")
+    report("appointments", List[AppointmentResponse], appointments, appointment_rows)
+    report("patients", List[PatientResponse], patients, patient_rows)
@@ -1,10 +1,44 @@
+from sqlalchemy import text
+
 from database.db import Base,engine
 from models.User import AuthUser
 from models.Patient import Patient
 from models.Contact import Contact
 from models.Appointment import Appointment
 from models.Recipe import  Recipe
-from models.Appointment import  AppointmentDiagnosis
+from models.Appointment import  AppointmentDiagnosis, APPOINTMENT_SEARCH_VECTOR_SQL, \
+    APPOINTMENT_REST_PERIOD_SQL
+from models.Vitals import AppointmentVitals
+from models.DiagnosisStats import DiagnosisMonthlyStat
+from models.Workload import DoctorDailyWorkload
+from models.Medication import MedicationUsage
+from models.ReportJob import ReportJob
+
+
+Base.metadata.create_all(bind=engine)
 
+# create_all no modifica tablas existentes: columnas e índices agregados después
+UPGRADE_STATEMENTS = [
+    f"""ALTER TABLE medical.appointments
+        ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS ({APPOINTMENT_SEARCH_VECTOR_SQL}) STORED""",
+    """CREATE INDEX IF NOT EXISTS ix_appointments_search_vector
+        ON medical.appointments USING gin (search_vector)""",
+    f"""ALTER TABLE medical.appointments
+        ADD COLUMN IF NOT EXISTS rest_period daterange
+        GENERATED ALWAYS AS ({APPOINTMENT_REST_PERIOD_SQL}) STORED""",
+    """CREATE INDEX IF NOT EXISTS ix_appointments_rest_period
+        ON medical.appointments USING gist (rest_period)""",
+    """ALTER TABLE medical.appointments ADD COLUMN IF NOT EXISTS version integer NOT NULL DEFAULT 1""",
+    """ALTER TABLE medical.patients ADD COLUMN IF NOT EXISTS version integer NOT NULL DEFAULT 1""",
+    """CREATE INDEX IF NOT EXISTS ix_appointments_patient_timeline
+        ON medical.appointments (patient_id, appointment_date, appointment_time, id)""",
+    """CREATE INDEX IF NOT EXISTS ix_auth_users_role ON auth.auth_users (role_id, id)""",
+    """CREATE INDEX IF NOT EXISTS ix_auth_users_birth_date ON auth.auth_users (birth_date)""",
+    """CREATE INDEX IF NOT EXISTS ix_auth_users_first_name_prefix
+        ON auth.auth_users (lower(first_name) text_pattern_ops)""",
+]
 
-Base.metadata.create_all(bind=engine)
\ No newline at end of file
+with engine.begin() as connection:
+    for statement in UPGRADE_STATEMENTS:
+        connection.execute(text(statement))
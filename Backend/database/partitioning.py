@@ -0,0 +1,327 @@
+# partitioning.py - Particionamiento por año de medical.appointments
+#
+# Convierte medical.appointments en una tabla particionada por rango de
+# appointment_date sin detener la aplicación:
+#   1. Crea medical.appointments_partitioned (mismas columnas, PK (id, appointment_date))
+#      con una partición por año y una partición DEFAULT.
+#   2. Un trigger replica en la tabla nueva cada INSERT/UPDATE/DELETE de la tabla actual.
+#   3. Copia las filas existentes por lotes de ID y verifica los conteos sin bloquear.
+#   4. En una transacción corta intercambia los nombres de tablas e índices. Las FK de las
+#      tablas hijas no pueden apuntar a la tabla particionada (su PK incluye
+#      appointment_date): se reemplazan por triggers que aplican la misma regla.
+# Los modelos y las consultas siguen usando medical.appointments sin cambios.
+import logging
+from datetime import date
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from models.Appointment import Appointment
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = "medical"
+TABLE = "appointments"
+NEW_TABLE = "appointments_partitioned"
+OLD_TABLE = "appointments_unpartitioned"
+MIRROR_FUNCTION = "appointments_partition_mirror"
+FK_CHECK_FUNCTION = "appointments_fk_check"
+FK_PARENT_FUNCTION = "appointments_fk_parent"
+
+
+def _stored_columns() -> List[str]:
+    """Columnas que se copian; las generadas (search_vector, rest_period) se recalculan solas"""
+    return [column.name for column in Appointment.__table__.columns if column.computed is None]
+
+
+def _column_list(prefix: str = "") -> str:
+    return ", ".join(f'{prefix}"{name}"' for name in _stored_columns())
+
+
+def _partition_name(year: int) -> str:
+    return f"{TABLE}_{year}"
+
+
+def _create_partition_sql(parent: str, year: int) -> str:
+    return (f"CREATE TABLE IF NOT EXISTS {SCHEMA}.{_partition_name(year)} "
+            f"PARTITION OF {SCHEMA}.{parent} "
+            f"FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')")
+
+
+def _indexes():
+    """(nombre, definición) de los índices del modelo, para recrearlos en la tabla particionada"""
+    for index in Appointment.__table__.indexes:
+        using = index.dialect_options["postgresql"].get("using")
+        columns = ", ".join(column.name for column in index.columns)
+        yield index.name, f"USING {using} ({columns})" if using else f"({columns})"
+
+
+def create_partitioned_table(connection: Connection, first_year: int, last_year: int):
+    """Paso 1: tabla particionada vacía, particiones, índices y claves foráneas"""
+    connection.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {SCHEMA}.{NEW_TABLE} (
+            LIKE {SCHEMA}.{TABLE} INCLUDING DEFAULTS INCLUDING GENERATED,
+            CONSTRAINT {NEW_TABLE}_pkey PRIMARY KEY (id, appointment_date)
+        ) PARTITION BY RANGE (appointment_date)"""))
+
+    for year in range(first_year, last_year + 1):
+        connection.execute(text(_create_partition_sql(NEW_TABLE, year)))
+    connection.execute(text(f"CREATE TABLE IF NOT EXISTS {SCHEMA}.{TABLE}_default "
+                            f"PARTITION OF {SCHEMA}.{NEW_TABLE} DEFAULT"))
+
+    for name, definition in _indexes():
+        connection.execute(text(f"CREATE INDEX IF NOT EXISTS {name}_part ON {SCHEMA}.{NEW_TABLE} {definition}"))
+
+    for foreign_key in Appointment.__table__.foreign_keys:
+        target = foreign_key.column
+        connection.execute(text(f"""
+            ALTER TABLE {SCHEMA}.{NEW_TABLE}
+            ADD FOREIGN KEY ({foreign_key.parent.name})
+            REFERENCES {target.table.schema}.{target.table.name} ({target.name})"""))
+
+
+def install_mirror_trigger(connection: Connection):
+    """Paso 2: replicar las escrituras de la tabla actual mientras se copia"""
+    connection.execute(text(f"""
+        CREATE OR REPLACE FUNCTION {SCHEMA}.{MIRROR_FUNCTION}() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                DELETE FROM {SCHEMA}.{NEW_TABLE} WHERE id = OLD.id;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO {SCHEMA}.{NEW_TABLE} ({_column_list()})
+                VALUES ({_column_list("NEW.")})
+                ON CONFLICT DO NOTHING;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql"""))
+    connection.execute(text(f"DROP TRIGGER IF EXISTS {MIRROR_FUNCTION} ON {SCHEMA}.{TABLE}"))
+    connection.execute(text(f"""
+        CREATE TRIGGER {MIRROR_FUNCTION}
+        AFTER INSERT OR UPDATE OR DELETE ON {SCHEMA}.{TABLE}
+        FOR EACH ROW EXECUTE FUNCTION {SCHEMA}.{MIRROR_FUNCTION}()"""))
+
+
+def copy_rows(engine: Engine, batch_size: int = 5000) -> int:
+    """
+    Paso 3: copiar por lotes de ID, una transacción por lote.
+    FOR SHARE bloquea el lote frente a UPDATE concurrentes hasta el commit; después
+    el trigger se encarga de esas filas. Devuelve el último ID cubierto por la copia:
+    las citas con ID mayor se crearon con el trigger ya instalado.
+    """
+    with engine.connect() as connection:
+        max_id = connection.execute(text(f"SELECT coalesce(max(id), 0) FROM {SCHEMA}.{TABLE}")).scalar()
+
+    copied = 0
+    for start in range(0, max_id, batch_size):
+        with engine.begin() as connection:
+            result = connection.execute(text(f"""
+                INSERT INTO {SCHEMA}.{NEW_TABLE} ({_column_list()})
+                SELECT {_column_list()} FROM {SCHEMA}.{TABLE}
+                WHERE id > :start AND id <= :end
+                FOR SHARE
+                ON CONFLICT DO NOTHING"""), {"start": start, "end": start + batch_size})
+            copied += result.rowcount
+        logger.info(f"Citas copiadas a la tabla particionada: {copied} (hasta ID {start + batch_size})")
+    return max_id
+
+
+def verify_copy(connection: Connection):
+    """
+    Comparar los conteos de ambas tablas sin bloquearlas (una sola consulta, una sola foto).
+    Con el trigger instalado deben coincidir; se ejecuta antes del intercambio.
+    """
+    old_count, new_count = connection.execute(text(f"""
+        SELECT (SELECT count(*) FROM {SCHEMA}.{TABLE}), (SELECT count(*) FROM {SCHEMA}.{NEW_TABLE})""")).one()
+    if old_count != new_count:
+        raise RuntimeError(f"La copia no está completa: {old_count} citas originales, {new_count} copiadas")
+
+
+def install_foreign_key_triggers(connection: Connection, references: List[Tuple[str, str, str, str]]):
+    """
+    Reemplazo de las FK (tabla hija, restricción, columna, acción ON DELETE) hacia
+    medical.appointments(id), que no pueden apuntar a la tabla particionada:
+      - en la hija, INSERT/UPDATE de la columna exige que la cita exista y la bloquea con
+        FOR KEY SHARE (como una FK) hasta el commit;
+      - en appointments, DELETE aplica la acción original (CASCADE, SET NULL o rechazo) y
+        un cambio de id con hijas se rechaza.
+    Un UPDATE que cambia de año mueve la fila de partición y PostgreSQL lo ejecuta como
+    DELETE + INSERT: si la cita sigue existiendo, el trigger de DELETE no hace nada.
+    """
+    connection.execute(text(f"""
+        CREATE OR REPLACE FUNCTION {SCHEMA}.{FK_CHECK_FUNCTION}() RETURNS trigger AS $$
+        DECLARE
+            referenced_id integer := (to_jsonb(NEW) ->> TG_ARGV[0])::integer;
+        BEGIN
+            IF referenced_id IS NOT NULL THEN
+                PERFORM 1 FROM {SCHEMA}.{TABLE} WHERE id = referenced_id FOR KEY SHARE;
+                IF NOT FOUND THEN
+                    RAISE EXCEPTION 'La cita % no existe (%.%)', referenced_id, TG_TABLE_NAME, TG_ARGV[0]
+                        USING ERRCODE = 'foreign_key_violation';
+                END IF;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql"""))
+
+    # TG_ARGV: tabla hija, columna, acción (confdeltype: c, n, a, r)
+    connection.execute(text(f"""
+        CREATE OR REPLACE FUNCTION {SCHEMA}.{FK_PARENT_FUNCTION}() RETURNS trigger AS $$
+        DECLARE
+            has_children boolean;
+        BEGIN
+            IF TG_OP = 'UPDATE' AND OLD.id IS NOT DISTINCT FROM NEW.id THEN
+                RETURN NULL;
+            END IF;
+            IF TG_OP = 'DELETE' AND EXISTS (SELECT 1 FROM {SCHEMA}.{TABLE} WHERE id = OLD.id) THEN
+                -- Fila movida a otra partición, no eliminada
+                RETURN NULL;
+            END IF;
+            IF TG_OP = 'DELETE' AND TG_ARGV[2] = 'c' THEN
+                EXECUTE format('DELETE FROM %s WHERE %I = $1', TG_ARGV[0], TG_ARGV[1]) USING OLD.id;
+            ELSIF TG_OP = 'DELETE' AND TG_ARGV[2] = 'n' THEN
+                EXECUTE format('UPDATE %s SET %I = NULL WHERE %I = $1', TG_ARGV[0], TG_ARGV[1], TG_ARGV[1])
+                    USING OLD.id;
+            ELSE
+                EXECUTE format('SELECT EXISTS (SELECT 1 FROM %s WHERE %I = $1)', TG_ARGV[0], TG_ARGV[1])
+                    INTO has_children USING OLD.id;
+                IF has_children THEN
+                    RAISE EXCEPTION 'La cita % tiene filas en %', OLD.id, TG_ARGV[0]
+                        USING ERRCODE = 'foreign_key_violation';
+                END IF;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql"""))
+
+    for table_name, constraint, column, action in references:
+        connection.execute(text(f'DROP TRIGGER IF EXISTS "{constraint}_check" ON {table_name}'))
+        connection.execute(text(f"""
+            CREATE TRIGGER "{constraint}_check"
+            AFTER INSERT OR UPDATE OF "{column}" ON {table_name}
+            FOR EACH ROW EXECUTE FUNCTION {SCHEMA}.{FK_CHECK_FUNCTION}('{column}')"""))
+        connection.execute(text(f'DROP TRIGGER IF EXISTS "{constraint}_parent" ON {SCHEMA}.{TABLE}'))
+        connection.execute(text(f"""
+            CREATE TRIGGER "{constraint}_parent"
+            AFTER DELETE OR UPDATE OF id ON {SCHEMA}.{TABLE}
+            FOR EACH ROW EXECUTE FUNCTION {SCHEMA}.{FK_PARENT_FUNCTION}('{table_name}', '{column}', '{action}')"""))
+
+
+def swap_tables(connection: Connection, copied_through: int):
+    """
+    Paso 4 (transacción corta): intercambiar tablas e índices.
+    Los conteos completos se verifican antes (verify_copy); con el bloqueo tomado solo se
+    revisan las citas con ID posterior a la copia por lotes, que llegaron por el trigger.
+    Las FK de appointment_diagnoses, recipe y appointment_vitals se reemplazan por
+    triggers con la misma acción ON DELETE (install_foreign_key_triggers).
+    """
+    connection.execute(text(f"LOCK TABLE {SCHEMA}.{TABLE} IN ACCESS EXCLUSIVE MODE"))
+
+    missing = connection.execute(text(f"""
+        SELECT count(*) FROM {SCHEMA}.{TABLE} AS source
+        WHERE source.id > :copied_through
+          AND NOT EXISTS (SELECT 1 FROM {SCHEMA}.{NEW_TABLE} AS copy WHERE copy.id = source.id)"""),
+        {"copied_through": copied_through}).scalar()
+    if missing:
+        raise RuntimeError(f"{missing} citas posteriores a la copia no llegaron a la tabla particionada")
+
+    references = connection.execute(text("""
+        SELECT c.conrelid::regclass::text, c.conname, a.attname, c.confdeltype
+        FROM pg_constraint AS c
+        JOIN pg_attribute AS a ON a.attrelid = c.conrelid AND a.attnum = c.conkey[1]
+        WHERE c.contype = 'f' AND c.confrelid = CAST(:table AS regclass)
+    """), {"table": f"{SCHEMA}.{TABLE}"}).all()
+    for table_name, constraint, _, _ in references:
+        connection.execute(text(f'ALTER TABLE {table_name} DROP CONSTRAINT "{constraint}"'))
+
+    connection.execute(text(f"DROP TRIGGER IF EXISTS {MIRROR_FUNCTION} ON {SCHEMA}.{TABLE}"))
+    connection.execute(text(f"DROP FUNCTION IF EXISTS {SCHEMA}.{MIRROR_FUNCTION}()"))
+
+    connection.execute(text(f"ALTER TABLE {SCHEMA}.{TABLE} RENAME TO {OLD_TABLE}"))
+    connection.execute(text(f"ALTER TABLE {SCHEMA}.{NEW_TABLE} RENAME TO {TABLE}"))
+    for name, _ in _indexes():
+        connection.execute(text(f"ALTER INDEX IF EXISTS {SCHEMA}.{name} RENAME TO {name}_unpartitioned"))
+        connection.execute(text(f"ALTER INDEX {SCHEMA}.{name}_part RENAME TO {name}"))
+
+    # La secuencia de id pasa a pertenecer a la tabla nueva
+    sequence = connection.execute(text("SELECT pg_get_serial_sequence(:table, 'id')"),
+                                  {"table": f"{SCHEMA}.{OLD_TABLE}"}).scalar()
+    if sequence:
+        connection.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {SCHEMA}.{TABLE}.id"))
+
+    install_foreign_key_triggers(connection, [tuple(reference) for reference in references])
+
+
+def ensure_partitions(connection: Connection, years_ahead: int = 1, today: Optional[date] = None):
+    """
+    Crear por adelantado las particiones de los próximos años (ejecutar periódicamente).
+    Si la partición DEFAULT ya tiene citas de ese año, PostgreSQL no permite crearla: se
+    separa la DEFAULT, se mueven esas citas a la partición nueva y se vuelve a adjuntar.
+    """
+    today = today or date.today()
+    for year in range(today.year, today.year + years_ahead + 1):
+        exists = connection.execute(text("SELECT to_regclass(:name) IS NOT NULL"),
+                                    {"name": f"{SCHEMA}.{_partition_name(year)}"}).scalar()
+        if exists:
+            continue
+
+        bounds = {"start": date(year, 1, 1), "end": date(year + 1, 1, 1)}
+        in_default = connection.execute(text(f"""
+            SELECT EXISTS (SELECT 1 FROM {SCHEMA}.{TABLE}_default
+                           WHERE appointment_date >= :start AND appointment_date < :end)"""), bounds).scalar()
+        if not in_default:
+            connection.execute(text(_create_partition_sql(TABLE, year)))
+            continue
+
+        connection.execute(text(f"ALTER TABLE {SCHEMA}.{TABLE} DETACH PARTITION {SCHEMA}.{TABLE}_default"))
+        connection.execute(text(_create_partition_sql(TABLE, year)))
+        # Primero se inserta (la cita ya existe en la partición nueva) y luego se borra de la
+        # DEFAULT: así el trigger de DELETE de las FK no elimina sus diagnósticos ni recetas
+        moved = connection.execute(text(f"""
+            INSERT INTO {SCHEMA}.{_partition_name(year)} ({_column_list()})
+            SELECT {_column_list()} FROM {SCHEMA}.{TABLE}_default
+            WHERE appointment_date >= :start AND appointment_date < :end"""), bounds).rowcount
+        connection.execute(text(f"""
+            DELETE FROM {SCHEMA}.{TABLE}_default
+            WHERE appointment_date >= :start AND appointment_date < :end"""), bounds)
+        connection.execute(text(f"ALTER TABLE {SCHEMA}.{TABLE} ATTACH PARTITION {SCHEMA}.{TABLE}_default DEFAULT"))
+        logger.info(f"Partición {_partition_name(year)} creada; {moved} citas movidas desde la DEFAULT")
+
+
+def migrate(engine: Engine, batch_size: int = 5000, years_ahead: int = 1):
+    """Migración completa en línea"""
+    with engine.connect() as connection:
+        first = connection.execute(text(f"SELECT min(appointment_date) FROM {SCHEMA}.{TABLE}")).scalar()
+    today = date.today()
+    first_year = first.year if first else today.year
+
+    with engine.begin() as connection:
+        create_partitioned_table(connection, first_year, today.year + years_ahead)
+        install_mirror_trigger(connection)
+
+    copied_through = copy_rows(engine, batch_size)
+
+    with engine.connect() as connection:
+        verify_copy(connection)
+
+    with engine.begin() as connection:
+        swap_tables(connection, copied_through)
+
+    with engine.connect() as connection:
+        connection.execute(text(f"ANALYZE {SCHEMA}.{TABLE}"))
+    logger.info(f"{SCHEMA}.{TABLE} particionada por año desde {first_year}; "
+                f"la tabla original quedó como {SCHEMA}.{OLD_TABLE}")
+
+
+def explain_recent_query(connection: Connection, days: int = 30) -> str:
+    """Plan de una consulta reciente; con particiones debe mostrar solo la partición del año en curso"""
+    plan = connection.execute(text(f"""
+        EXPLAIN (ANALYZE, COSTS OFF)
+        SELECT id, appointment_date, appointment_time
+        FROM {SCHEMA}.{TABLE}
+        WHERE appointment_date >= CAST(:since AS date)
+        ORDER BY appointment_date DESC, appointment_time DESC
+        LIMIT 100"""), {"since": date.fromordinal(date.today().toordinal() - days)}).scalars().all()
+    return "\n".join(plan)
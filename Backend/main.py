@@ -9,6 +9,8 @@ from routes import patient
 from routes import appointment
 from routes import report
 from routes import contact
+from routes import diagnosis
+from routes import medication
 
 app = FastAPI()
 
@@ -37,6 +39,8 @@ app.include_router(users.router)
 app.include_router(patient.router)
 app.include_router(appointment.router)
 app.include_router(contact.router)
+app.include_router(diagnosis.router)
+app.include_router(medication.router)
 
 app.include_router(report.router)
 
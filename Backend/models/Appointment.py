@@ -1,13 +1,38 @@
 import datetime
-from sqlalchemy import Column, Integer, String, Date, Time, Text, DateTime, ForeignKey, Numeric, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Date, Time, Text, DateTime, ForeignKey, Numeric, Boolean, Computed, Index
+from sqlalchemy.dialects.postgresql import TSVECTOR, DATERANGE
+from sqlalchemy.orm import relationship, deferred
 from database.db import Base
 from models.Recipe import Recipe
+from models.Vitals import AppointmentVitals
+
+
+# Vector de búsqueda en español sobre los campos narrativos de la cita.
+# Es una columna generada: PostgreSQL la recalcula en cada INSERT/UPDATE.
+APPOINTMENT_SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('spanish', coalesce(current_illness, '')), 'A') || "
+    "setweight(to_tsvector('spanish', coalesce(physical_examination, '')), 'B') || "
+    "setweight(to_tsvector('spanish', coalesce(observations, '')), 'B') || "
+    "setweight(to_tsvector('spanish', coalesce(laboratory_tests, '')), 'C') || "
+    "setweight(to_tsvector('spanish', coalesce(medical_preinscription, '')), 'C')"
+)
+
+# Periodo de reposo como rango de fechas inclusivo, para consultas de solapamiento con índice GiST
+APPOINTMENT_REST_PERIOD_SQL = (
+    "CASE WHEN rest_from IS NOT NULL AND rest_to IS NOT NULL AND rest_to >= rest_from "
+    "THEN daterange(rest_from, rest_to, '[]') END"
+)
 
 
 class Appointment(Base):
     __tablename__ = "appointments"
-    __table_args__ = {"schema": "medical"}
+    __table_args__ = (
+        Index("ix_appointments_search_vector", "search_vector", postgresql_using="gin"),
+        Index("ix_appointments_rest_period", "rest_period", postgresql_using="gist"),
+        # Historial del paciente paginado por (fecha, hora, id)
+        Index("ix_appointments_patient_timeline", "patient_id", "appointment_date", "appointment_time", "id"),
+        {"schema": "medical"}
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     patient_id = Column(Integer, ForeignKey("medical.patients.id"), nullable=False, index=True)
@@ -37,11 +62,19 @@ class Appointment(Base):
 
     created_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
     updated_at = Column(DateTime, nullable=True, onupdate=datetime.datetime.utcnow)
+    # Versión para control de concurrencia optimista (services/concurrency.py)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    # Diferida para no cargar el tsvector en las consultas normales
+    search_vector = deferred(Column(TSVECTOR, Computed(APPOINTMENT_SEARCH_VECTOR_SQL, persisted=True)))
+    rest_period = deferred(Column(DATERANGE, Computed(APPOINTMENT_REST_PERIOD_SQL, persisted=True)))
 
     patient = relationship("Patient", back_populates="appointments")
     recipes = relationship("Recipe", back_populates="appointment", cascade="all, delete-orphan")
     diagnoses = relationship("AppointmentDiagnosis", back_populates="appointment", cascade="all, delete-orphan")
     user = relationship("AuthUser", back_populates="appointments")
+    vitals = relationship("AppointmentVitals", back_populates="appointment", uselist=False,
+                          cascade="all, delete-orphan")
 
 
 
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, String, Date, ForeignKey
+from database.db import Base
+
+
+class DiagnosisMonthlyStat(Base):
+    """Conteo de diagnósticos por mes, médico, tipo de contingencia y código CIE-10"""
+    __tablename__ = "diagnosis_monthly_stats"
+    __table_args__ = {"schema": "medical"}
+
+    month = Column(Date, primary_key=True)  # Primer día del mes
+    user_id = Column(Integer, ForeignKey("auth.auth_users.id"), primary_key=True, index=True)
+    contingency_type = Column(String(100), primary_key=True, default="")  # '' cuando la cita no tiene contingencia
+    diagnosis_code = Column(String(10), primary_key=True, index=True)
+    diagnosis_count = Column(Integer, nullable=False, default=0)
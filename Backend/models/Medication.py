@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String
+from database.db import Base
+
+
+class MedicationUsage(Base):
+    """
+    Frecuencias aprendidas de las recetas, por medicamento normalizado:
+    kind = 'name' (forma escrita), 'amount' (cantidad) o 'instructions' (indicaciones)
+    """
+    __tablename__ = "medication_usage"
+    __table_args__ = {"schema": "medical"}
+
+    medicine_key = Column(String(100), primary_key=True)  # Nombre normalizado (minúsculas, sin tildes)
+    kind = Column(String(20), primary_key=True)
+    value = Column(String(500), primary_key=True)
+    usage_count = Column(Integer, nullable=False, default=0)
@@ -33,6 +33,8 @@ class Patient(Base):
     telephone2 = Column(String(20), nullable=True)
     created_at = Column(DateTime, nullable=True, default=datetime.datetime.utcnow)
     updated_at = Column(DateTime, nullable=True, onupdate=datetime.datetime.utcnow)
+    # Versión para control de concurrencia optimista (services/concurrency.py)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     # Relation to contacts
     contacts = relationship(Contact, back_populates="patient", cascade="all, delete-orphan")
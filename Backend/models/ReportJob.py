@@ -0,0 +1,33 @@
+import datetime
+from sqlalchemy import Column, Integer, String, Text, DateTime, LargeBinary, Index
+from sqlalchemy.orm import deferred
+from database.db import Base
+
+
+class ReportJob(Base):
+    """
+    Reporte PDF pedido para generarse en segundo plano (report_worker.py).
+    status: pending -> running -> done | failed; los fallos pasan a pending con run_after
+    mientras queden intentos.
+    """
+    __tablename__ = "report_jobs"
+    __table_args__ = (
+        # Cola: siguiente trabajo pendiente cuyo run_after ya pasó
+        Index("ix_report_jobs_queue", "status", "run_after"),
+        {"schema": "medical"}
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    report_type = Column(String(30), nullable=False)  # medical_history | medical_certificate | prescription
+    entity_id = Column(Integer, nullable=False)  # patient_id o appointment_id según el tipo
+    status = Column(String(20), nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    error = Column(Text)
+    run_after = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+    created_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    file_name = Column(String(255))
+    size_bytes = Column(Integer)
+    pdf = deferred(Column(LargeBinary))  # Solo se carga al descargar
@@ -1,7 +1,7 @@
 import datetime
 
 from pydantic import BaseModel
-from sqlalchemy import Column, Integer, String, Date, UniqueConstraint, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Date, UniqueConstraint, Boolean, DateTime, ForeignKey, Index, func
 from sqlalchemy.orm import relationship
 
 from database.db import Base
@@ -46,6 +46,9 @@ class AuthUser(Base):
     __table_args__ = (
         UniqueConstraint('email', name='uq_user_email'),
         UniqueConstraint('cedula', name='uq_user_cedula'),  # ← AGREGAR ESTA LÍNEA
+        # Filtros del listado de usuarios (services/user_service.py)
+        Index("ix_auth_users_role", "role_id", "id"),
+        Index("ix_auth_users_birth_date", "birth_date"),
         {'schema': 'auth'}
     )
 
@@ -73,6 +76,11 @@ class AuthUser(Base):
     def __repr__(self):
         return f"<AuthUser(id={self.id}, email='{self.email}', cedula='{self.cedula}')>"
 
+
+# Búsqueda por prefijo del nombre sin distinguir mayúsculas: lower(first_name) LIKE 'ana%'
+Index("ix_auth_users_first_name_prefix", func.lower(AuthUser.first_name).label("first_name_lower"),
+      postgresql_ops={"first_name_lower": "text_pattern_ops"})
+
 class Role(Base):
     __tablename__ = 'roles'
     __table_args__ = {'schema': 'auth'}
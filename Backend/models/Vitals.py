@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, Date, Numeric, ForeignKey, Index
+from sqlalchemy.orm import relationship
+from database.db import Base
+
+
+class AppointmentVitals(Base):
+    """Signos vitales de una cita, interpretados y normalizados a unidades numéricas"""
+    __tablename__ = "appointment_vitals"
+    __table_args__ = (
+        Index("ix_appointment_vitals_patient_date", "patient_id", "measured_on"),
+        {"schema": "medical"}
+    )
+
+    appointment_id = Column(Integer, ForeignKey("medical.appointments.id", ondelete="CASCADE"), primary_key=True)
+    patient_id = Column(Integer, ForeignKey("medical.patients.id", ondelete="CASCADE"), nullable=False)
+    measured_on = Column(Date, nullable=False)
+
+    temperature_c = Column(Numeric(precision=4, scale=1), nullable=True)
+    systolic_mmhg = Column(Integer, nullable=True)
+    diastolic_mmhg = Column(Integer, nullable=True)
+    heart_rate_bpm = Column(Integer, nullable=True)
+    oxygen_saturation_pct = Column(Numeric(precision=4, scale=1), nullable=True)
+    weight_kg = Column(Numeric(precision=6, scale=2), nullable=True)
+    height_cm = Column(Numeric(precision=5, scale=1), nullable=True)
+
+    appointment = relationship("Appointment", back_populates="vitals")
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, Date, Time, ForeignKey
+from database.db import Base
+
+
+class DoctorDailyWorkload(Base):
+    """Contador diario de citas por médico (se recalcula el día afectado en cada escritura)"""
+    __tablename__ = "doctor_daily_workload"
+    __table_args__ = {"schema": "medical"}
+
+    user_id = Column(Integer, ForeignKey("auth.auth_users.id"), primary_key=True)
+    day = Column(Date, primary_key=True, index=True)
+    appointment_count = Column(Integer, nullable=False, default=0)
+    first_time = Column(Time, nullable=False)  # Primera cita del día
+    last_time = Column(Time, nullable=False)  # Última cita del día
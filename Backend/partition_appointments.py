@@ -0,0 +1,29 @@
+import logging
+import sys
+
+from database.db import engine
+from models.User import AuthUser
+from models.Patient import Patient
+from models.Appointment import Appointment
+from database.partitioning import migrate, ensure_partitions, explain_recent_query
+
+
+# Particionar medical.appointments por año (migración en línea) o mantener sus particiones
+#   python partition_appointments.py migrate   -> convertir la tabla (una sola vez)
+#   python partition_appointments.py ensure    -> crear las particiones de los próximos años
+#   python partition_appointments.py explain   -> plan de una consulta de los últimos 30 días
+logging.basicConfig(level=logging.INFO)
+command = sys.argv[1] if len(sys.argv) > 1 else "ensure"
+
+if command == "migrate":
+    migrate(engine)
+elif command == "ensure":
+    with engine.begin() as connection:
+        ensure_partitions(connection)
+    print("Particiones de citas al día")
+elif command == "explain":
+    with engine.connect() as connection:
+        print(explain_recent_query(connection))
+else:
+    print(f"Comando desconocido: {command} (migrate, ensure, explain)")
+    sys.exit(1)
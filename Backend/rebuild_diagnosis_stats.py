@@ -0,0 +1,14 @@
+from database.db import SessionLocal
+from models.User import AuthUser
+from models.Patient import Patient
+from models.Appointment import Appointment
+from services.diagnosis_stats_service import rebuild_diagnosis_stats
+
+
+# Recalcular los rollups de diagnósticos desde appointment_diagnoses
+db = SessionLocal()
+try:
+    total = rebuild_diagnosis_stats(db)
+    print(f"Rollups de diagnósticos recalculados: {total} filas")
+finally:
+    db.close()
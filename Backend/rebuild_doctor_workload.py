@@ -0,0 +1,14 @@
+from database.db import SessionLocal
+from models.User import AuthUser
+from models.Patient import Patient
+from models.Appointment import Appointment
+from services.workload_service import rebuild_doctor_workload
+
+
+# Recalcular los contadores diarios de citas por médico desde appointments
+db = SessionLocal()
+try:
+    total = rebuild_doctor_workload(db)
+    print(f"Contadores de carga de trabajo recalculados: {total} filas")
+finally:
+    db.close()
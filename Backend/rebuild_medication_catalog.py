@@ -0,0 +1,14 @@
+from database.db import SessionLocal
+from models.User import AuthUser
+from models.Patient import Patient
+from models.Appointment import Appointment
+from services.medication_catalog import rebuild_medication_usage
+
+
+# Recalcular el catálogo de medicamentos desde las recetas existentes
+db = SessionLocal()
+try:
+    total = rebuild_medication_usage(db)
+    print(f"Catálogo de medicamentos recalculado: {total} filas")
+finally:
+    db.close()
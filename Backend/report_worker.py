@@ -0,0 +1,44 @@
+import logging
+import multiprocessing
+import os
+import signal
+
+
+# Procesos que generan los reportes encolados en medical.report_jobs
+#   python report_worker.py            -> REPORT_JOB_WORKERS procesos (2 por defecto)
+WORKERS = int(os.getenv("REPORT_JOB_WORKERS", "2"))
+
+
+def work(stop):
+    from database.db import SessionLocal
+    from models.User import AuthUser
+    from models.Patient import Patient
+    from models.Appointment import Appointment
+    from services.report_jobs import run_worker
+
+    logging.basicConfig(level=logging.INFO)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # El proceso principal avisa con stop
+    run_worker(SessionLocal, stop)
+
+
+if __name__ == "__main__":
+    from database.db import SessionLocal
+    from services.report_jobs import purge_finished_jobs
+
+    logging.basicConfig(level=logging.INFO)
+    with SessionLocal() as db:
+        print(f"Trabajos de reporte antiguos eliminados: {purge_finished_jobs(db)}")
+
+    context = multiprocessing.get_context("spawn")
+    stop = context.Event()
+    processes = [context.Process(target=work, args=(stop,), name=f"report-worker-{i}") for i in range(WORKERS)]
+    for process in processes:
+        process.start()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        stop.set()
+        for process in processes:
+            process.join()
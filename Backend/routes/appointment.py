@@ -1,19 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Header
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import date
 
 from services.appointment_service import (
     create_appointment,
-    get_appointments,
     get_appointment_by_id,
     search_appointments,
+    search_appointments_fulltext,
     update_appointment,
     manage_appointment,
     delete_appointment,
-     get_appointments_by_doctor
+    get_today_appointments,
+    get_calendar_appointments,
+    list_appointment_rows
 )
-from schemas.appointment import AppointmentCreate, AppointmentUpdate, AppointmentResponse, AppointmentManage
+from services.agenda_cache import today_agenda_cache
+from services.agenda_events import agenda_events
+from services.workload_service import get_doctor_workload
+from services.leave_service import get_patients_on_leave, get_leave_statistics, LEAVE_GROUP_COLUMNS
+from schemas.serialization import rows_response
+from schemas.appointment import AppointmentCreate, AppointmentUpdate, AppointmentResponse, AppointmentManage, \
+    AppointmentTextSearchResult, AppointmentCalendarItem
 from database.db import get_db
 
 router = APIRouter(prefix="/appointments", tags=["appointments"])
@@ -73,27 +82,173 @@ def search_appointments_endpoint(
         )
 
 
+@router.get("/search/text", response_model=List[AppointmentTextSearchResult])
+def search_appointments_text_endpoint(
+        db: Session = Depends(get_db),
+        q: str = Query(..., min_length=2, max_length=200, description="Texto a buscar en enfermedad actual, examen físico, observaciones, exámenes y prescripción"),
+        start_date: Optional[date] = Query(None, description="Fecha de inicio (YYYY-MM-DD)"),
+        end_date: Optional[date] = Query(None, description="Fecha de fin (YYYY-MM-DD)"),
+        skip: int = Query(0, ge=0, description="Número de registros a omitir"),
+        limit: int = Query(20, ge=1, le=100, description="Límite de registros")
+):
+    """
+    Búsqueda de texto completo en los campos narrativos de las citas.
+    Acepta la sintaxis de websearch: "frase exacta", -excluir, OR.
+
+    Ejemplos de uso:
+    - /appointments/search/text?q=dolor abdominal
+    - /appointments/search/text?q="cefalea intensa" -fiebre&start_date=2024-01-01
+    """
+    try:
+        return search_appointments_fulltext(
+            db=db,
+            text_query=q.strip(),
+            start_date=start_date,
+            end_date=end_date,
+            skip=skip,
+            limit=limit
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error interno del servidor al buscar citas: {str(e)}"
+        )
+
+
+@router.get("/today", response_model=List[AppointmentResponse])
+def get_today_appointments_route(
+    user_id: Optional[int] = Query(None, description="Filtrar por médico"),
+    db: Session = Depends(get_db)
+):
+    """Obtener la agenda del día actual (global o de un médico)"""
+    return get_today_appointments(db, doctor_id=user_id)
+
+
+@router.get("/stats")
+def get_appointment_stats():
+    """Estadísticas de la caché de la agenda del día"""
+    return {
+        "today_agenda_cache": today_agenda_cache.stats(),
+        "agenda_stream": agenda_events.stats()
+    }
+
+
+@router.get("/stream")
+async def stream_appointment_changes(
+    user_id: Optional[int] = Query(None, description="Recibir solo cambios de este médico"),
+    day: Optional[date] = Query(None, description="Recibir solo cambios de este día (YYYY-MM-DD)"),
+    last_event_id: Optional[int] = Header(None, alias="Last-Event-ID")
+):
+    """
+    Stream Server-Sent Events con los cambios de citas (created, updated, deleted).
+    El cliente carga la agenda una vez y luego aplica los deltas; un evento
+    "resync" indica que debe volver a cargarla.
+    """
+    return StreamingResponse(
+        agenda_events.stream(doctor_id=user_id, day=day, last_event_id=last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/calendar", response_model=List[AppointmentCalendarItem])
+def get_calendar_route(
+    start_date: date = Query(..., description="Fecha de inicio (YYYY-MM-DD)"),
+    end_date: date = Query(..., description="Fecha de fin (YYYY-MM-DD)"),
+    user_id: Optional[int] = Query(None, description="Filtrar por médico"),
+    db: Session = Depends(get_db)
+):
+    """Citas de un rango de fechas en formato compacto para la vista de calendario"""
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end_date debe ser posterior o igual a start_date")
+
+    if (end_date - start_date).days > 92:
+        raise HTTPException(status_code=400, detail="El rango máximo del calendario es de 92 días")
+
+    return get_calendar_appointments(db, start_date, end_date, doctor_id=user_id)
+
+
+@router.get("/workload")
+def get_workload_route(
+    start_date: date = Query(..., description="Fecha de inicio (YYYY-MM-DD)"),
+    end_date: date = Query(..., description="Fecha de fin (YYYY-MM-DD)"),
+    user_id: Optional[int] = Query(None, description="Filtrar por médico"),
+    granularity: str = Query("day", pattern="^(day|week)$", description="Agrupar por día (day) o semana (week)"),
+    db: Session = Depends(get_db)
+):
+    """Citas por médico y día/semana con el intervalo promedio entre citas, desde contadores diarios"""
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end_date debe ser posterior o igual a start_date")
+
+    return get_doctor_workload(db, start_date, end_date, doctor_id=user_id, granularity=granularity)
+
+
+@router.get("/leave")
+def get_leave_route(
+    start_date: date = Query(..., description="Fecha de inicio (YYYY-MM-DD)"),
+    end_date: Optional[date] = Query(None, description="Fecha de fin (YYYY-MM-DD); por defecto igual a start_date"),
+    user_id: Optional[int] = Query(None, description="Filtrar por médico"),
+    contingency_type: Optional[str] = Query(None, description="Filtrar por tipo de contingencia"),
+    skip: int = Query(0, ge=0, description="Número de registros a omitir"),
+    limit: int = Query(100, ge=1, le=1000, description="Límite de registros"),
+    db: Session = Depends(get_db)
+):
+    """
+    Pacientes con reposo médico en una fecha o rango de fechas.
+
+    Ejemplos de uso:
+    - /appointments/leave?start_date=2024-05-10 - ¿Quién está de reposo el 10 de mayo?
+    - /appointments/leave?start_date=2024-05-01&end_date=2024-05-31
+    """
+    end_date = end_date or start_date
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end_date debe ser posterior o igual a start_date")
+
+    return get_patients_on_leave(db, start_date, end_date, user_id, contingency_type, skip, limit)
+
+
+@router.get("/leave/stats")
+def get_leave_stats_route(
+    start_date: date = Query(..., description="Fecha de inicio (YYYY-MM-DD)"),
+    end_date: date = Query(..., description="Fecha de fin (YYYY-MM-DD)"),
+    group_by: str = Query("contingency_type", description="Agrupar por: contingency_type, doctor, month"),
+    user_id: Optional[int] = Query(None, description="Filtrar por médico"),
+    db: Session = Depends(get_db)
+):
+    """Certificados y días de reposo emitidos en el rango, agrupados (ej. por contingencia en el trimestre)"""
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end_date debe ser posterior o igual a start_date")
+
+    if group_by not in LEAVE_GROUP_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"Agrupación no válida: {group_by}")
+
+    return get_leave_statistics(db, start_date, end_date, group_by, user_id)
+
+
 @router.get("/user/{user_id}", response_model=List[AppointmentResponse])
 def get_appointments_by_user(
     user_id: int,
     skip: int = Query(0, ge=0, description="Número de registros a omitir"),
     limit: int = Query(1000, ge=1, le=1000, description="Límite de registros a retornar"),
-    include_patient: bool = Query(True, description="Incluir información del paciente"),
-    include_recipes: bool = Query(False, description="Incluir recetas médicas"),
-    include_diagnoses: bool = Query(False, description="Incluir diagnósticos"),
+    include_patient: bool = Query(True, description="Incluir información del paciente (false: patient es null)"),
+    include_recipes: bool = Query(True, description="Incluir recetas médicas (false: lista vacía)"),
+    include_diagnoses: bool = Query(True, description="Incluir diagnósticos (false: lista vacía)"),
     db: Session = Depends(get_db)
 ):
-    """Obtener todas las citas de un usuario/doctor específico"""
-    appointments = get_appointments_by_doctor(
+    """
+    Obtener todas las citas de un usuario/doctor específico. Por defecto la respuesta es
+    completa, como antes; los include_* en false permiten pedir una respuesta más liviana.
+    """
+    appointments = list_appointment_rows(
         db=db,
-        doctor_id=user_id,
         skip=skip,
         limit=limit,
+        doctor_id=user_id,
         include_patient=include_patient,
         include_recipes=include_recipes,
         include_diagnoses=include_diagnoses
     )
-    return appointments
+    return rows_response(List[AppointmentResponse], appointments)
 
 
 @router.post("/", response_model=AppointmentResponse, status_code=201)
@@ -111,7 +266,8 @@ def get_all_appointments(
     include_patient: bool = Query(True, description="Incluir información del paciente"),
     db: Session = Depends(get_db)
 ):
-    return get_appointments(db, skip, limit, include_patient)
+    appointments = list_appointment_rows(db, skip, limit, include_patient=include_patient)
+    return rows_response(List[AppointmentResponse], appointments)
 
 
 @router.get("/{appointment_id}", response_model=AppointmentResponse)
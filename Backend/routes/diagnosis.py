@@ -0,0 +1,59 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import date
+
+from database.db import get_db
+from schemas.diagnosis import Cie10Entry
+from services.cie10_catalog import get_catalog, require_catalog
+from services.diagnosis_stats_service import get_top_diagnoses, GROUP_COLUMNS
+
+router = APIRouter(prefix="/diagnoses", tags=["diagnoses"])
+
+
+@router.get("/cie10", response_model=List[Cie10Entry])
+def autocomplete_cie10(
+    q: str = Query(..., min_length=1, max_length=100, description="Prefijo de código (J06) o de palabras de la descripción (farin aguda)"),
+    limit: int = Query(10, ge=1, le=50, description="Límite de sugerencias")
+):
+    """Autocompletado de códigos CIE-10 desde el catálogo en memoria (503 si no hay catálogo cargado)"""
+    return require_catalog().autocomplete(q, limit)
+
+
+@router.get("/cie10/{code}", response_model=Cie10Entry)
+def get_cie10_code(code: str):
+    """Obtener la descripción de un código CIE-10"""
+    entry = require_catalog().get(code)
+    if not entry:
+        raise HTTPException(status_code=404, detail=f"Código CIE-10 {code} no encontrado")
+    return entry
+
+
+@router.get("/stats/top")
+def get_top_diagnoses_route(
+    start_month: Optional[date] = Query(None, description="Mes inicial (cualquier día del mes, YYYY-MM-DD)"),
+    end_month: Optional[date] = Query(None, description="Mes final (cualquier día del mes, YYYY-MM-DD)"),
+    user_id: Optional[int] = Query(None, description="Filtrar por médico"),
+    contingency_type: Optional[str] = Query(None, description="Filtrar por tipo de contingencia"),
+    group_by: Optional[List[str]] = Query(None, description="Agrupar por: month, doctor, contingency_type"),
+    limit: int = Query(10, ge=1, le=100, description="Diagnósticos por grupo"),
+    db: Session = Depends(get_db)
+):
+    """
+    Diagnósticos más frecuentes, leídos de los rollups mensuales.
+
+    Ejemplos de uso:
+    - /diagnoses/stats/top?start_month=2024-01-01&end_month=2024-12-01
+    - /diagnoses/stats/top?group_by=month&group_by=doctor&limit=5
+    """
+    invalid = [name for name in (group_by or []) if name not in GROUP_COLUMNS]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Agrupación no válida: {', '.join(invalid)}")
+
+    rows = get_top_diagnoses(db, start_month, end_month, user_id, contingency_type, group_by, limit)
+
+    catalog = get_catalog()
+    for row in rows:
+        entry = catalog.get(row["diagnosis_code"])
+        row["diagnosis_description"] = entry["description"] if entry else None
+    return rows
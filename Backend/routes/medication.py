@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Query
+from typing import List
+
+from database.db import SessionLocal
+from schemas.medication import MedicationSuggestion
+from services.medication_catalog import medication_catalog
+
+router = APIRouter(prefix="/medications", tags=["medications"])
+
+
+@router.get("/autocomplete", response_model=List[MedicationSuggestion])
+def autocomplete_medications(
+    q: str = Query(..., min_length=1, max_length=100, description="Inicio del nombre del medicamento"),
+    limit: int = Query(10, ge=1, le=50, description="Límite de sugerencias")
+):
+    """Autocompletado de medicamentos aprendido de las recetas, con cantidades e indicaciones frecuentes"""
+    return medication_catalog.get(SessionLocal).autocomplete(q, limit)
@@ -3,7 +3,12 @@ from sqlalchemy.orm import Session
 from database.db import get_db
 from schemas.patient import PatientCreate, PatientUpdate, PatientResponse, PatientManage
 from services import patient_service
-from typing import List
+from services.vitals_service import get_vitals_trend
+from services.appointment_service import get_patient_timeline
+from schemas.appointment import PatientTimeline
+from schemas.serialization import rows_response
+from typing import List, Optional
+from datetime import date
 
 router = APIRouter(prefix="/patients", tags=["Patients"])
 
@@ -24,7 +29,8 @@ def create_patient(patient: PatientCreate, db: Session = Depends(get_db)):
 
 @router.get("/", response_model=List[PatientResponse])
 def list_patients(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    return patient_service.get_patients(db, skip, limit)
+    patients = patient_service.list_patient_rows(db, skip, limit)
+    return rows_response(List[PatientResponse], patients)
 
 @router.get("/{patient_id}", response_model=PatientResponse)
 def get_patient(patient_id: int, db: Session = Depends(get_db)):
@@ -33,6 +39,28 @@ def get_patient(patient_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Patient not found")
     return db_patient
 
+@router.get("/{patient_id}/timeline", response_model=PatientTimeline)
+def get_patient_timeline_route(
+        patient_id: int,
+        cursor: Optional[str] = Query(None, description="Cursor devuelto en next_cursor por la página anterior"),
+        limit: int = Query(20, ge=1, le=100, description="Citas por página"),
+        db: Session = Depends(get_db)
+):
+    """Historial del paciente (citas, diagnósticos y recetas), de lo más reciente a lo más antiguo"""
+    timeline = get_patient_timeline(db, patient_id, cursor, limit)
+    return rows_response(PatientTimeline, timeline)
+
+@router.get("/{patient_id}/vitals/trend")
+def get_patient_vitals_trend(
+        patient_id: int,
+        window: int = Query(3, ge=1, le=50, description="Número de mediciones para la media móvil"),
+        start_date: Optional[date] = Query(None, description="Fecha de inicio (YYYY-MM-DD)"),
+        end_date: Optional[date] = Query(None, description="Fecha de fin (YYYY-MM-DD)"),
+        db: Session = Depends(get_db)
+):
+    """Tendencia de signos vitales del paciente (°C, mmHg, lpm, %, kg, cm)"""
+    return get_vitals_trend(db, patient_id, window, start_date, end_date)
+
 @router.put("/{patient_id}", response_model=PatientResponse)
 def update_patient(patient_id: int, patient: PatientUpdate, db: Session = Depends(get_db)):
     db_patient = patient_service.update_patient(db, patient_id, patient)
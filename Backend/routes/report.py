@@ -1,13 +1,23 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.orm import Session
+import io
 import os
-from pyreportjasper import PyReportJasper
-from datetime import datetime
+import re
+import atexit
+from datetime import date, datetime
 import logging
-import psycopg2
 import base64
 import traceback
-from urllib.parse import urlparse
+from typing import BinaryIO, Optional, Tuple
+
+from database.db import get_db, SessionLocal
+from services.report_service import render_report, open_report, report_file_name
+from services.pdf_cache import report_pdf_cache
+from services.jasper_pool import JasperPool
+from services import report_jobs
+from services.report_batch import certificate_batch_ids, stream_certificates_zip
+from schemas.report import ReportJobCreate, ReportJobResponse
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
@@ -15,169 +25,110 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/reports", tags=["reports"])
 
 
-# Parsear DATABASE_URL para extraer credenciales
-def parse_database_url():
-    """Extraer información de conexión desde DATABASE_URL"""
-    database_url = os.getenv("DATABASE_URL")
+# Rutas de archivos (opcionales como variables de entorno)
+REPORTS_DIR = os.getenv("REPORTS_DIR", "reports")
 
-    if not database_url:
-        raise ValueError("DATABASE_URL no está configurado en las variables de entorno")
 
-    # Remover el prefijo postgresql+psycopg2:// o postgresql://
-    url = database_url
-    if url.startswith("postgresql+psycopg2://"):
-        url = url.replace("postgresql+psycopg2://", "postgresql://")
-    elif url.startswith("postgres://"):
-        url = url.replace("postgres://", "postgresql://")
+# Procesos de Jasper con la JVM y las plantillas cargadas (se arrancan con el primer reporte)
+jasper_pool = JasperPool(os.path.abspath(REPORTS_DIR))
+atexit.register(jasper_pool.shutdown)
 
-    parsed = urlparse(url)
 
-    return {
-        'host': parsed.hostname,
-        'port': parsed.port or 5432,
-        'database': parsed.path.lstrip('/'),
-        'user': parsed.username,
-        'password': parsed.password
-    }
+# Motor de generación: "jasper" (plantillas .jrxml, por defecto) o "python" (ReportLab,
+# services/report_pdf.py). El motor python se usa a pedido hasta compararlo lado a lado con Jasper
+REPORT_ENGINE_PATTERN = "^(python|jasper)$"
 
 
-# Obtener configuración de la base de datos
-db_info = parse_database_url()
-DB_HOST = db_info['host']
-DB_PORT = db_info['port']
-DB_NAME = db_info['database']
-DB_USER = db_info['user']
-DB_PASSWORD = db_info['password']
+def _medical_history_json(patient_id: int, pdf_bytes: bytes) -> JSONResponse:
+    return JSONResponse(
+        content={
+            "success": True,
+            "patient_id": patient_id,
+            "filename": f"historial_medico_paciente_{patient_id}.pdf",
+            "pdf_base64": base64.b64encode(pdf_bytes).decode('utf-8'),
+            "size_bytes": len(pdf_bytes),
+            "generated_at": datetime.now().isoformat()
+        },
+        status_code=200
+    )
 
-logger.info(f"📊 Configuración DB - Host: {DB_HOST}, Port: {DB_PORT}, Database: {DB_NAME}, User: {DB_USER}")
 
-# Rutas de archivos (opcionales como variables de entorno)
-REPORTS_DIR = os.getenv("REPORTS_DIR", "reports")
-OUTPUT_DIR = os.getenv("OUTPUT_DIR", "reports/output")
-
-
-def get_db_config():
-    """Obtener configuración de base de datos para JasperReports"""
-    return {
-        'driver': 'postgres',
-        'username': DB_USER,
-        'password': DB_PASSWORD,
-        'host': DB_HOST,
-        'database': DB_NAME,
-        'port': str(DB_PORT),
-        'jdbc_driver': 'org.postgresql.Driver',
-        'jdbc_url': f'jdbc:postgresql://{DB_HOST}:{DB_PORT}/{DB_NAME}'
-    }
+# Formato de respuesta: "pdf" (binario por partes, con soporte de Range) o "json" (base64, compatibilidad)
+REPORT_FORMAT_PATTERN = "^(json|pdf)$"
+PDF_CHUNK_SIZE = 64 * 1024
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
 
 
-def verify_database_connection(patient_id: int):
-    """Verificar que la conexión y los datos existen"""
-    try:
-        conn = psycopg2.connect(
-            host=DB_HOST,
-            port=DB_PORT,
-            database=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD
-        )
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            SELECT p.id, COUNT(a.id) as appointment_count
-            FROM medical.patients p
-            LEFT JOIN medical.appointments a ON a.patient_id = p.id
-            WHERE p.id = %s
-            GROUP BY p.id
-        """, (patient_id,))
-
-        result = cursor.fetchone()
-
-        cursor.close()
-        conn.close()
-
-        if result:
-            patient_id_found, appointment_count = result
-            if appointment_count == 0:
-                return False
-            return True
-        else:
-            return False
+def _byte_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """(inicio, fin inclusivo) de un encabezado Range de un solo rango; None si no se entiende"""
+    match = RANGE_PATTERN.match(range_header.strip())
+    if not match or match.groups() == ("", ""):
+        return None
+    start, end = match.groups()
+    if start == "":
+        # bytes=-N: los últimos N bytes
+        start, end = max(0, size - int(end)), size - 1
+    else:
+        start, end = int(start), min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, detail="Rango no satisfacible",
+                            headers={"Content-Range": f"bytes */{size}"})
+    return start, end
 
-    except Exception as e:
-        logger.error(f"❌ Error verificando BD: {e}")
-        logger.error(f"Stack trace: {traceback.format_exc()}")
-        return False
+
+def _iter_pdf(pdf: BinaryIO, start: int, length: int):
+    try:
+        pdf.seek(start)
+        while length > 0:
+            chunk = pdf.read(min(PDF_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        pdf.close()
+
+
+def _pdf_response(request: Request, pdf: BinaryIO, filename: str) -> StreamingResponse:
+    """PDF binario leído por partes, con Content-Length y respuestas 206 para Range"""
+    try:
+        size = pdf.seek(0, os.SEEK_END)
+        byte_range = _byte_range(request.headers["range"], size) if "range" in request.headers else None
+    except Exception:
+        pdf.close()
+        raise
+
+    start, end = byte_range or (0, size - 1)
+    headers = {
+        "Content-Disposition": f"attachment; filename={filename}",
+        "Content-Length": str(end - start + 1),
+        "Accept-Ranges": "bytes"
+    }
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return StreamingResponse(_iter_pdf(pdf, start, end - start + 1), status_code=206 if byte_range else 200,
+                             media_type='application/pdf', headers=headers)
 
 
 @router.get("/medical-history/{patient_id}")
-def get_medical_history_report(patient_id: int):
+def get_medical_history_report(
+        patient_id: int,
+        request: Request,
+        engine: str = Query("jasper", pattern=REPORT_ENGINE_PATTERN, description="Motor de generación del PDF"),
+        format: str = Query("json", pattern=REPORT_FORMAT_PATTERN, description="pdf (binario) o json (base64)"),
+        db: Session = Depends(get_db)
+):
     """Genera reporte de historial médico del paciente"""
-
-    if not verify_database_connection(patient_id):
-        logger.error(f"❌ Paciente {patient_id} no encontrado o no tiene citas")
-        raise HTTPException(
-            status_code=404,
-            detail=f"Paciente {patient_id} no encontrado o no tiene citas registradas"
-        )
-
-    input_file = os.path.abspath(os.path.join(REPORTS_DIR, "MedicalRecord.jrxml"))
-
-    if not os.path.exists(input_file):
-        logger.error(f"❌ Archivo no encontrado: {input_file}")
-        raise HTTPException(status_code=404, detail="Archivo de reporte no encontrado")
-
-    output_dir = os.path.abspath(OUTPUT_DIR)
-    os.makedirs(output_dir, exist_ok=True)
-
-    timestamp = int(datetime.now().timestamp())
-    output_file = os.path.join(output_dir, f"medical_history_{patient_id}_{timestamp}")
-
+    # Mismos datos con los dos motores (pool de SQLAlchemy, 404 si no hay citas) y la misma caché
+    jasper = jasper_pool if engine == "jasper" else None
     try:
-        pyreportjasper = PyReportJasper()
-
-        parameters = {
-            'patient_id': patient_id,
-            'SUBREPORT_DIR': os.path.abspath(REPORTS_DIR) + os.sep
-        }
-
-        pyreportjasper.config(
-            input_file=input_file,
-            output_file=output_file,
-            output_formats=["pdf"],
-            parameters=parameters,
-            db_connection=get_db_config()
-        )
-
-        pyreportjasper.process_report()
-
-        pdf_file = f"{output_file}.pdf"
-
-        if not os.path.exists(pdf_file):
-            logger.error(f"❌ PDF no generado: {pdf_file}")
-            raise HTTPException(status_code=500, detail="PDF no generado")
-
-        with open(pdf_file, "rb") as pdf:
-            pdf_bytes = pdf.read()
-            pdf_base64 = base64.b64encode(pdf_bytes).decode('utf-8')
-
-        # Limpiar archivo temporal
-        try:
-            os.remove(pdf_file)
-        except Exception as cleanup_error:
-            logger.warning(f"No se pudo eliminar archivo temporal: {cleanup_error}")
-
-        return JSONResponse(
-            content={
-                "success": True,
-                "patient_id": patient_id,
-                "filename": f"historial_medico_paciente_{patient_id}.pdf",
-                "pdf_base64": pdf_base64,
-                "size_bytes": len(pdf_bytes),
-                "generated_at": datetime.now().isoformat()
-            },
-            status_code=200
-        )
+        if format == "pdf":
+            return _pdf_response(request, open_report(db, "medical_history", patient_id, jasper),
+                                 report_file_name("medical_history", patient_id))
+        return _medical_history_json(patient_id, render_report(db, "medical_history", patient_id, jasper))
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"❌ ERROR: {e}")
         logger.error(f"Stack trace: {traceback.format_exc()}")
@@ -185,56 +136,78 @@ def get_medical_history_report(patient_id: int):
 
 
 @router.get("/medical-certificate/{appointment_id}")
-def get_medical_certificate_report(appointment_id: int):
+def get_medical_certificate_report(
+        appointment_id: int,
+        request: Request,
+        engine: str = Query("jasper", pattern=REPORT_ENGINE_PATTERN, description="Motor de generación del PDF"),
+        db: Session = Depends(get_db)
+):
     """Genera certificado médico para una cita"""
-
-    input_file = os.path.abspath(os.path.join(REPORTS_DIR, "medicalCertificate.jrxml"))
-
-    if not os.path.exists(input_file):
-        logger.error(f"❌ Archivo no encontrado: {input_file}")
-        raise HTTPException(status_code=404, detail="Archivo de reporte no encontrado")
-
-    output_dir = os.path.abspath(OUTPUT_DIR)
-    os.makedirs(output_dir, exist_ok=True)
-
-    timestamp = int(datetime.now().timestamp())
-    output_file = os.path.join(output_dir, f"medical_certificate_{appointment_id}_{timestamp}")
-
+    jasper = jasper_pool if engine == "jasper" else None
     try:
-        pyreportjasper = PyReportJasper()
-
-        parameters = {
-            'APPOINTMENT_ID': appointment_id,
-        }
-
-        pyreportjasper.config(
-            input_file=input_file,
-            output_file=output_file,
-            output_formats=["pdf"],
-            parameters=parameters,
-            db_connection=get_db_config()
-        )
-
-        pyreportjasper.process_report()
-
-        pdf_file = f"{output_file}.pdf"
-
-        if not os.path.exists(pdf_file):
-            logger.error(f"❌ PDF no generado: {pdf_file}")
-            raise HTTPException(status_code=500, detail="PDF no generado")
-
-        filename = f"certificado_medico_{appointment_id}.pdf"
-
-        return FileResponse(
-            path=pdf_file,
-            media_type='application/pdf',
-            filename=filename,
-            headers={
-                "Content-Disposition": f"attachment; filename={filename}"
-            }
-        )
+        return _pdf_response(request, open_report(db, "medical_certificate", appointment_id, jasper),
+                             report_file_name("medical_certificate", appointment_id))
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"❌ ERROR: {e}")
         logger.error(f"Stack trace: {traceback.format_exc()}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/prescription/{appointment_id}")
+def get_prescription_report(appointment_id: int, request: Request, db: Session = Depends(get_db)):
+    """Receta médica de una cita (Recipe.jrxml, generada con ReportLab)"""
+    return _pdf_response(request, open_report(db, "prescription", appointment_id),
+                         report_file_name("prescription", appointment_id))
+
+
+@router.get("/medical-certificates/batch")
+def get_medical_certificates_batch(
+        start_date: date = Query(..., description="Fecha de inicio (YYYY-MM-DD)"),
+        end_date: date = Query(..., description="Fecha de fin (YYYY-MM-DD)"),
+        doctor_id: Optional[int] = Query(None, description="Solo las citas de este médico"),
+        contingency_type: Optional[str] = Query(None, description="Tipo de contingencia"),
+        engine: str = Query("jasper", pattern=REPORT_ENGINE_PATTERN,
+                            description="Motor de generación, el mismo que en /medical-certificate/{id}"),
+        db: Session = Depends(get_db)
+):
+    """
+    Certificados médicos de las citas del rango en un ZIP que se descarga mientras se genera.
+    Cada PDF es el mismo documento que se imprime de a uno con el motor indicado.
+    """
+    appointment_ids = certificate_batch_ids(db, start_date, end_date, doctor_id, contingency_type)
+    jasper = jasper_pool if engine == "jasper" else None
+    if jasper is not None:
+        # Si Jasper no arranca se responde 503 antes de empezar a enviar el ZIP
+        jasper.start()
+    filename = f"certificados_{start_date.isoformat()}_{end_date.isoformat()}.zip"
+    return StreamingResponse(
+        stream_certificates_zip(SessionLocal, appointment_ids, jasper),
+        media_type='application/zip',
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+
+@router.get("/cache/stats")
+def get_report_cache_stats():
+    """Archivos y bytes en memoria y en disco, por motor, aciertos, desalojos y vencimientos de la caché de PDF"""
+    return report_pdf_cache.stats()
+
+
+@router.post("/jobs", response_model=ReportJobResponse, status_code=202)
+def create_report_job(job: ReportJobCreate, db: Session = Depends(get_db)):
+    """Encolar un reporte; lo genera report_worker.py y se consulta con GET /reports/jobs/{id}"""
+    return report_jobs.enqueue_report_job(db, job.report_type, job.entity_id)
+
+
+@router.get("/jobs/{job_id}", response_model=ReportJobResponse)
+def get_report_job(job_id: int, db: Session = Depends(get_db)):
+    return report_jobs.get_report_job(db, job_id)
+
+
+@router.get("/jobs/{job_id}/download")
+def download_report_job(job_id: int, request: Request, db: Session = Depends(get_db)):
+    job, pdf_bytes = report_jobs.get_report_job_pdf(db, job_id)
+    return _pdf_response(request, io.BytesIO(pdf_bytes), job.file_name)
@@ -11,19 +11,24 @@ from database.db import SessionLocal, get_db
 router = APIRouter(prefix="/users", tags=["users"])
 
 @router.get("/")
-def get_users_route(request: Request, db: Session = Depends(get_db), role: str = None, first_name: str = None, start_birth_date: str = None, end_birth_date: str = None):
+def get_users_route(request: Request, db: Session = Depends(get_db), role: str = None,
+                    first_name: str = Query(None, description="Prefijo del nombre"),
+                    start_birth_date: str = None, end_birth_date: str = None,
+                    skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=500)):
     #if not hasattr(request.state, "user"):
     #    raise HTTPException(status_code=401, detail="Unauthorized")
-    return get_users(db=db, role=role, first_name=first_name, start_birth_date=start_birth_date, end_birth_date=end_birth_date)
+    return get_users(db=db, role=role, first_name=first_name, start_birth_date=start_birth_date,
+                     end_birth_date=end_birth_date, skip=skip, limit=limit)
 
 
 @router.get("/getByRole")
 def get_users_by_role(
     role_id: Optional[int] = Query(None, description="ID del rol a filtrar"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=500),
     db: Session = Depends(get_db)
 ):
-    print(f"Role ID recibido: {role_id}")
-    return get_by_role_services(db=db, role_id=role_id)
+    return get_by_role_services(db=db, role_id=role_id, skip=skip, limit=limit)
 
 @router.get("/roles")
 def get_roles_route(request: Request, db: Session = Depends(get_db)):
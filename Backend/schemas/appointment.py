@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, field_validator
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import date, time, datetime
 from decimal import Decimal
 
@@ -42,7 +42,11 @@ class DiagnosisBase(BaseModel):
 
 
 class DiagnosisCreate(DiagnosisBase):
-    pass
+    @field_validator('diagnosis_code')
+    @classmethod
+    def normalize_diagnosis_code(cls, v):
+        # El código se valida contra el catálogo CIE-10 en services/appointment_service.py
+        return v.strip().upper() if v is not None else None
 
 
 class DiagnosisUpdate(BaseModel):
@@ -51,6 +55,12 @@ class DiagnosisUpdate(BaseModel):
     diagnosis_type: Optional[str] = Field(None, description="Tipo de diagnóstico (primary/secondary)")
     diagnosis_observations: Optional[str] = Field(None, description="Observaciones Generales")
 
+    @field_validator('diagnosis_code')
+    @classmethod
+    def normalize_diagnosis_code(cls, v):
+        # El código se valida contra el catálogo CIE-10 en services/appointment_service.py
+        return v.strip().upper() if v is not None else None
+
 
 class DiagnosisResponse(BaseModel):
     id: int
@@ -148,6 +158,7 @@ class AppointmentUpdate(BaseModel):
     has_representative: Optional[bool] = Field(None, description="Indica si el paciente tiene un representante")
     representative_id : Optional[int] = Field(None, description="Id del representante")
     contingency_type: Optional[str] = Field(None, description="Tipo de vontigencia")
+    version: Optional[int] = Field(None, description="Versión leída por el cliente; si ya cambió se responde 409")
 
 class AppointmentManage(BaseModel):
     current_illness: Optional[str] = Field(None, description="Enfermedad actual")
@@ -167,6 +178,7 @@ class AppointmentManage(BaseModel):
 
     diagnoses: Optional[List[DiagnosisUpdate]] = Field(default_factory=list, description="Lista de diagnósticos")
     recipes: Optional[List[RecipeUpdate]] = Field(default_factory=list, description="Lista de recetas médicas")
+    version: Optional[int] = Field(None, description="Versión leída por el cliente; si ya cambió se responde 409")
 
     model_config = {
         "validate_assignment": True,
@@ -200,6 +212,7 @@ class AppointmentResponse(BaseModel):
     contingency_type: Optional[str] = Field(None, description="Tipo de vontigencia"),
     created_at: datetime
     updated_at: Optional[datetime] = None
+    version: Optional[int] = None
     patient: Optional[PatientBasic] = None
     user: Optional[UserBasic] = None  # Relación con el médico
     diagnoses: Optional[List[DiagnosisResponse]] = Field(default_factory=list, description="Lista de diagnósticos")
@@ -208,6 +221,31 @@ class AppointmentResponse(BaseModel):
     model_config = {"from_attributes": True}
 
 
+class AppointmentTextSearchResult(BaseModel):
+    id: int
+    patient_id: int
+    user_id: int
+    appointment_date: date
+    appointment_time: time
+    rank: float = Field(..., description="Relevancia de la coincidencia")
+    patient: Optional[PatientBasic] = None
+    highlights: Dict[str, str] = Field(default_factory=dict, description="Fragmentos resaltados por campo narrativo")
+
+
+class AppointmentCalendarItem(BaseModel):
+    id: int
+    date: date
+    time: str = Field(..., description="Hora de la cita (HH:MM)")
+    patient: str = Field(..., description="Nombre del paciente")
+    status: str = Field(..., description="scheduled (agendada) o attended (atendida)")
+
+
+class PatientTimeline(BaseModel):
+    patient: PatientBasic
+    appointments: List[AppointmentResponse] = Field(default_factory=list, description="Citas de la más reciente a la más antigua")
+    next_cursor: Optional[str] = Field(None, description="Cursor para la página siguiente (citas más antiguas); null si no hay más")
+
+
 class AppointmentWithPatientDetails(AppointmentResponse):
     vital_signs: Optional[VitalSigns] = None
 
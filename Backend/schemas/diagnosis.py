@@ -0,0 +1,6 @@
+from pydantic import BaseModel, Field
+
+
+class Cie10Entry(BaseModel):
+    code: str = Field(..., description="Código CIE-10")
+    description: str = Field(..., description="Descripción del diagnóstico")
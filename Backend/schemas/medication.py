@@ -0,0 +1,15 @@
+from typing import List
+
+from pydantic import BaseModel, Field
+
+
+class MedicationUsageSuggestion(BaseModel):
+    value: str
+    count: int = Field(..., description="Veces que se recetó con este valor")
+
+
+class MedicationSuggestion(BaseModel):
+    name: str = Field(..., description="Forma más usada del nombre del medicamento")
+    count: int = Field(..., description="Veces que se recetó")
+    amounts: List[MedicationUsageSuggestion] = Field(default_factory=list, description="Cantidades más comunes")
+    instructions: List[MedicationUsageSuggestion] = Field(default_factory=list, description="Indicaciones más comunes")
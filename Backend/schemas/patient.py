@@ -107,12 +107,14 @@ class PatientUpdate(BaseModel):
     telephone: Optional[str] = None
     telephone2: Optional[str] = None
     contacts: Optional[List[ContactUpdate]] = None
+    version: Optional[int] = None  # Versión leída por el cliente; si ya cambió se responde 409
 
 
 class PatientResponse(PatientBase):
     id: Optional[int] = None
     created_at: Optional[datetime.datetime] = None
     updated_at: Optional[datetime.datetime] = None
+    version: Optional[int] = None
     contacts: Optional[List[ContactResponse]] = Field(default_factory=list)
     document_id: Optional[str] = None
 
@@ -139,4 +141,5 @@ class PatientManage(BaseModel):
     notes: Optional[str] = None
     enterprise: Optional[str] = None
     work_activity: Optional[str] = None
-    contacts: List[ContactUpdate] = Field(default_factory=list)  # ← Cambio aquí
\ No newline at end of file
+    contacts: List[ContactUpdate] = Field(default_factory=list)  # ← Cambio aquí
+    version: Optional[int] = None  # Versión leída por el cliente; si ya cambió se responde 409
\ No newline at end of file
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import Literal, Optional
 
 
 class ReportResponse(BaseModel):
@@ -21,4 +21,26 @@ class ReportGenerateRequest(BaseModel):
     db_port: Optional[str] = "5432"
     db_name: Optional[str] = "femixweb3"
     db_user: Optional[str] = "postgres"
-    db_password: Optional[str] = "sa"
\ No newline at end of file
+    db_password: Optional[str] = "sa"
+
+class ReportJobCreate(BaseModel):
+    report_type: Literal["medical_history", "medical_certificate", "prescription"]
+    entity_id: int  # patient_id para medical_history, appointment_id para los demás
+
+
+class ReportJobResponse(BaseModel):
+    id: int
+    report_type: str
+    entity_id: int
+    status: str
+    attempts: int
+    max_attempts: int
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    file_name: Optional[str] = None
+    size_bytes: Optional[int] = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,42 @@
+# serialization.py - Serialización rápida de respuestas de listas
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Iterable, Mapping
+
+import orjson
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, TypeAdapter
+
+
+def _orjson_default(value: Any):
+    # orjson serializa fechas y horas de forma nativa; Decimal se envía como
+    # texto, igual que lo hace Pydantic en AppointmentResponse.weight
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    raise TypeError
+
+
+class FastJSONResponse(ORJSONResponse):
+    """Respuesta JSON codificada con orjson"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+@lru_cache(maxsize=None)
+def get_type_adapter(schema: Any) -> TypeAdapter:
+    """TypeAdapter cacheado por tipo; construirlo es costoso y se reutiliza entre requests"""
+    return TypeAdapter(schema)
+
+
+def rows_response(schema: Any, rows: Iterable[Mapping[str, Any]], status_code: int = 200) -> FastJSONResponse:
+    """
+    Construir la respuesta a partir de diccionarios armados desde filas SQL.
+    Se validan con el esquema de respuesta (sin from_attributes ni objetos ORM)
+    y se codifican con orjson.
+    """
+    adapter = get_type_adapter(schema)
+    validated = adapter.validate_python(rows)
+    return FastJSONResponse(content=adapter.dump_python(validated), status_code=status_code)
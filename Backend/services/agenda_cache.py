@@ -0,0 +1,83 @@
+# agenda_cache.py - Caché en memoria de la agenda del día
+import threading
+from datetime import date
+from typing import Callable, Dict, List, Optional
+
+
+class AgendaCache:
+    """
+    Caché en proceso de las citas del día actual, global (doctor_id=None) y por doctor.
+    Se invalida desde las rutas de escritura de citas y se vacía al cambiar de día.
+    """
+
+    def __init__(self, today: Callable[[], date] = date.today):
+        self._today = today
+        self._lock = threading.Lock()
+        self._day: Optional[date] = None
+        self._entries: Dict[Optional[int], list] = {}
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _roll_over(self) -> date:
+        # Debe llamarse con el lock tomado
+        today = self._today()
+        if self._day != today:
+            self._day = today
+            self._entries.clear()
+            self._generation += 1
+        return today
+
+    def get_or_load(self, doctor_id: Optional[int], loader: Callable[[date], list]) -> List:
+        """Devolver la agenda cacheada o cargarla con loader(fecha)"""
+        with self._lock:
+            today = self._roll_over()
+            cached = self._entries.get(doctor_id)
+            if cached is not None:
+                self.hits += 1
+                return list(cached)
+            self.misses += 1
+            generation = self._generation
+
+        # La consulta se ejecuta fuera del lock para no bloquear otras lecturas
+        value = loader(today)
+
+        with self._lock:
+            # Si hubo una escritura mientras se cargaba, no guardar datos viejos
+            if self._generation == generation and self._day == today:
+                self._entries[doctor_id] = value
+        return list(value)
+
+    def invalidate(self, appointment_date: Optional[date], doctor_id: Optional[int] = None):
+        """Invalidar la agenda si la cita modificada es del día cacheado"""
+        with self._lock:
+            self._roll_over()
+            if appointment_date is not None and appointment_date != self._day:
+                return
+            self._generation += 1
+            self.invalidations += 1
+            self._entries.pop(None, None)
+            if doctor_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(doctor_id, None)
+
+    def clear(self):
+        """Vaciar toda la caché (por ejemplo, al modificar datos de un paciente)"""
+        self.invalidate(None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "day": self._day.isoformat() if self._day else None,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / requests, 4) if requests else 0.0
+            }
+
+
+today_agenda_cache = AgendaCache()
@@ -0,0 +1,132 @@
+# agenda_events.py - Publicación en vivo de cambios de citas (Server-Sent Events)
+import asyncio
+import json
+import threading
+from collections import deque
+from datetime import date
+from typing import AsyncIterator, Deque, List, Optional
+
+HEARTBEAT_SECONDS = 15
+SUBSCRIBER_QUEUE_SIZE = 100
+REPLAY_BUFFER_SIZE = 500
+
+
+class _Subscriber:
+    def __init__(self, loop: asyncio.AbstractEventLoop, doctor_id: Optional[int], day: Optional[date]):
+        self.loop = loop
+        self.doctor_id = doctor_id
+        self.day = day.isoformat() if day else None
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def matches(self, event: dict) -> bool:
+        if self.doctor_id is not None and event["user_id"] != self.doctor_id:
+            return False
+        if self.day is not None and self.day not in (event["appointment_date"], event.get("previous_date")):
+            return False
+        return True
+
+    def push(self, event: dict):
+        # Se ejecuta en el event loop del suscriptor
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Cliente demasiado lento: se descartan los deltas y se pide recargar
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"action": "resync"})
+
+
+class AgendaEventBroker:
+    """
+    Distribuye los cambios de citas a los clientes conectados, filtrando por doctor y día.
+    Las rutas de escritura publican desde hilos del threadpool; cada suscriptor
+    recibe los eventos en su propio event loop.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: List[_Subscriber] = []
+        self._recent: Deque[dict] = deque(maxlen=REPLAY_BUFFER_SIZE)
+        self._sequence = 0
+
+    def publish(self, action: str, appointment: dict, previous_date: Optional[date] = None):
+        """Publicar un cambio compacto de una cita (created, updated, deleted)"""
+        with self._lock:
+            self._sequence += 1
+            event = {
+                "seq": self._sequence,
+                "action": action,
+                "id": appointment["id"],
+                "patient_id": appointment["patient_id"],
+                "user_id": appointment["user_id"],
+                "appointment_date": appointment["appointment_date"].isoformat(),
+                "appointment_time": appointment["appointment_time"].isoformat(),
+            }
+            if previous_date is not None and previous_date != appointment["appointment_date"]:
+                event["previous_date"] = previous_date.isoformat()
+            self._recent.append(event)
+            subscribers = [subscriber for subscriber in self._subscribers if subscriber.matches(event)]
+
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.push, event)
+            except RuntimeError:
+                # Event loop cerrado: el suscriptor se elimina al terminar su stream
+                pass
+
+    async def stream(self, doctor_id: Optional[int] = None, day: Optional[date] = None,
+                     last_event_id: Optional[int] = None) -> AsyncIterator[str]:
+        """Generar el stream SSE; con Last-Event-ID se reenvían los eventos perdidos"""
+        subscriber = _Subscriber(asyncio.get_running_loop(), doctor_id, day)
+        with self._lock:
+            self._subscribers.append(subscriber)
+            missed = self._missed_events(subscriber, last_event_id)
+
+        try:
+            yield "retry: 3000\n\n"
+            for event in missed:
+                yield self._format(event)
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), timeout=HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield self._format(event)
+        finally:
+            with self._lock:
+                self._subscribers.remove(subscriber)
+
+    def _missed_events(self, subscriber: _Subscriber, last_event_id: Optional[int]) -> List[dict]:
+        """
+        Eventos posteriores a last_event_id, o un resync si el buffer no los tiene todos.
+        Se llama con el candado tomado.
+        """
+        if last_event_id is None or last_event_id == self._sequence:
+            return []
+        if last_event_id > self._sequence or not self._recent or self._recent[0]["seq"] > last_event_id + 1:
+            # Servidor reiniciado (la secuencia volvió a empezar) o eventos que ya salieron
+            # del buffer: no se puede asegurar la continuidad, el cliente debe recargar.
+            # Lleva la secuencia actual para que el próximo Last-Event-ID sea válido
+            return [{"seq": self._sequence, "action": "resync"}]
+        return [event for event in self._recent if event["seq"] > last_event_id and subscriber.matches(event)]
+
+    @staticmethod
+    def _format(event: dict) -> str:
+        lines = []
+        if "seq" in event:
+            lines.append(f"id: {event['seq']}")
+        lines.append(f"event: {event['action']}")
+        lines.append(f"data: {json.dumps(event, separators=(',', ':'))}")
+        return "\n".join(lines) + "\n\n"
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "subscribers": len(self._subscribers),
+                "published": self._sequence,
+                "buffered": len(self._recent)
+            }
+
+
+agenda_events = AgendaEventBroker()
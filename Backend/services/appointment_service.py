@@ -1,13 +1,49 @@
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_, or_, func, desc, asc
+import base64
+import html
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import and_, or_, func, desc, asc, select, case, tuple_
 from models.Appointment import Appointment, AppointmentDiagnosis
 from models.Contact import Contact
 from models.Patient import Patient
 from models.Recipe import Recipe
-from schemas.appointment import AppointmentCreate, AppointmentUpdate, AppointmentManage, AppointmentResponse
-from typing import List, Optional
-from datetime import date, datetime
+from models.User import AuthUser
+from schemas.appointment import AppointmentCreate, AppointmentUpdate, AppointmentManage, AppointmentResponse, \
+    PatientBasic, UserBasic, DiagnosisResponse, RecipeResponse
+from typing import List, Optional, Dict, Any, Tuple
+from collections import Counter
+from datetime import date, datetime, time
 from fastapi import HTTPException, status
+from services.agenda_cache import today_agenda_cache
+from services.pdf_cache import report_pdf_cache
+from services.concurrency import claim_version
+from services.agenda_events import agenda_events
+from services.cie10_catalog import check_diagnosis_codes
+from services.vitals_service import sync_appointment_vitals
+from services.diagnosis_stats_service import diagnosis_stat_keys, appointment_stat_keys, \
+    apply_diagnosis_stats_delta
+from services.workload_service import refresh_doctor_workload
+from services.medication_catalog import medication_usage_keys, appointment_medication_keys, \
+    apply_medication_usage_delta, medication_catalog
+
+
+def _appointment_snapshot(appointment: Appointment) -> Dict[str, Any]:
+    """Datos mínimos de una cita para notificar cambios (se toman antes de borrarla)"""
+    return {
+        "id": appointment.id,
+        "patient_id": appointment.patient_id,
+        "user_id": appointment.user_id,
+        "appointment_date": appointment.appointment_date,
+        "appointment_time": appointment.appointment_time,
+    }
+
+
+def _notify_appointment_change(action: str, snapshot: Dict[str, Any], previous_date: Optional[date] = None):
+    """Invalidar la agenda del día y los PDF del paciente cacheados y publicar el cambio a las pantallas conectadas"""
+    today_agenda_cache.invalidate(snapshot["appointment_date"], snapshot["user_id"])
+    report_pdf_cache.invalidate_patient(snapshot["patient_id"])
+    if previous_date is not None and previous_date != snapshot["appointment_date"]:
+        today_agenda_cache.invalidate(previous_date, snapshot["user_id"])
+    agenda_events.publish(action, snapshot, previous_date)
 
 
 def create_appointment(db: Session, appointment_data: AppointmentCreate) -> Appointment:
@@ -37,6 +73,7 @@ def create_appointment(db: Session, appointment_data: AppointmentCreate) -> Appo
 
     # ✅ EXTRAER DIAGNÓSTICOS Y RECETAS ANTES Y REMOVER DEL DICT
     diagnoses_data = appointment_data.diagnoses or []
+    check_diagnosis_codes(diagnosis.diagnosis_code for diagnosis in diagnoses_data)
     recipes_data = appointment_data.recipes or []
     appointment_dict = appointment_data.model_dump()
     appointment_dict.pop('diagnoses', None)  # Remover diagnoses del dict
@@ -68,34 +105,164 @@ def create_appointment(db: Session, appointment_data: AppointmentCreate) -> Appo
         )
         db.add(db_recipe)
 
+    sync_appointment_vitals(db_appointment)
+    apply_diagnosis_stats_delta(db, Counter(), diagnosis_stat_keys(
+        db_appointment.appointment_date, db_appointment.user_id, db_appointment.contingency_type,
+        [diagnosis_data.diagnosis_code for diagnosis_data in diagnoses_data]
+    ))
+    refresh_doctor_workload(db, [(db_appointment.user_id, db_appointment.appointment_date)])
+    apply_medication_usage_delta(db, Counter(), medication_usage_keys(recipes_data))
     db.commit()
     db.refresh(db_appointment)
+    medication_catalog.mark_stale()
+    _notify_appointment_change("created", _appointment_snapshot(db_appointment))
 
     return db_appointment
 
 
-def get_appointments(
+def _response_columns(model, schema) -> list:
+    """Columnas de la tabla que forman parte del esquema de respuesta"""
+    table = model.__table__
+    return [table.c[name] for name in schema.model_fields if name in table.c]
+
+
+def _children_by_appointment(db: Session, model, schema, appointment_ids: List[int]) -> Dict[int, List[dict]]:
+    """Cargar diagnósticos o recetas de varias citas en una sola consulta, agrupados por cita"""
+    grouped = {appointment_id: [] for appointment_id in appointment_ids}
+    stmt = (select(*_response_columns(model, schema))
+            .where(model.appointment_id.in_(appointment_ids))
+            .order_by(model.id))
+    for row in db.execute(stmt).mappings():
+        grouped[row["appointment_id"]].append(dict(row))
+    return grouped
+
+
+def list_appointment_rows(
         db: Session,
         skip: int = 0,
         limit: int = 100,
+        doctor_id: Optional[int] = None,
         include_patient: bool = True,
         include_recipes: bool = True,
-        include_diagnoses: bool = True  # Nuevo parámetro para diagnósticos
-) -> List[Appointment]:
-    """Obtener lista de citas con paginación"""
-    query = db.query(Appointment)
+        include_diagnoses: bool = True
+) -> List[Dict[str, Any]]:
+    """
+    Listado de citas con la forma de AppointmentResponse, armado desde filas SQL.
+    No hidrata objetos ORM: una consulta para citas, paciente y médico, y una por
+    cada colección incluida.
+    """
+    patient_columns = [column.label(f"patient__{column.name}") for column in _response_columns(Patient, PatientBasic)]
+    user_columns = [column.label(f"user__{column.name}") for column in _response_columns(AuthUser, UserBasic)]
+
+    stmt = (select(*_response_columns(Appointment, AppointmentResponse), *user_columns)
+            .outerjoin(AuthUser, AuthUser.id == Appointment.user_id))
 
     if include_patient:
-        query = query.options(joinedload(Appointment.patient))
+        stmt = stmt.add_columns(*patient_columns).outerjoin(Patient, Patient.id == Appointment.patient_id)
+
+    if doctor_id is not None:
+        stmt = stmt.where(Appointment.user_id == doctor_id)
+
+    stmt = (stmt
+            .order_by(desc(Appointment.appointment_date), desc(Appointment.appointment_time))
+            .offset(skip).limit(limit))
+
+    appointments = [_nest_appointment_row(row) for row in db.execute(stmt).mappings()]
+    _attach_children(db, appointments, include_diagnoses, include_recipes)
+    return appointments
+
+
+def _nest_appointment_row(row) -> Dict[str, Any]:
+    """Convertir las columnas patient__* y user__* de una fila en los objetos anidados de la respuesta"""
+    appointment = {}
+    nested = {"patient": {}, "user": {}}
+    for key, value in row.items():
+        prefix, _, field = key.partition("__")
+        if field:
+            nested[prefix][field] = value
+        else:
+            appointment[key] = value
+    appointment["patient"] = nested["patient"] if nested["patient"].get("id") is not None else None
+    appointment["user"] = nested["user"] if nested["user"].get("id") is not None else None
+    return appointment
+
+
+def _attach_children(db: Session, appointments: List[Dict[str, Any]], include_diagnoses: bool = True,
+                     include_recipes: bool = True):
+    """Agregar diagnósticos y recetas a las citas: una consulta por colección"""
+    appointment_ids = [appointment["id"] for appointment in appointments]
+    if appointment_ids and include_diagnoses:
+        diagnoses = _children_by_appointment(db, AppointmentDiagnosis, DiagnosisResponse, appointment_ids)
+        for appointment in appointments:
+            appointment["diagnoses"] = diagnoses[appointment["id"]]
+
+    if appointment_ids and include_recipes:
+        recipes = _children_by_appointment(db, Recipe, RecipeResponse, appointment_ids)
+        for appointment in appointments:
+            appointment["recipes"] = recipes[appointment["id"]]
+
+
+def _encode_timeline_cursor(appointment: Dict[str, Any]) -> str:
+    raw = f"{appointment['appointment_date'].isoformat()}|{appointment['appointment_time'].isoformat()}|{appointment['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_timeline_cursor(cursor: str) -> Tuple[date, time, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        day, moment, appointment_id = raw.split("|")
+        return date.fromisoformat(day), time.fromisoformat(moment), int(appointment_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor de historial no válido"
+        )
 
-    if include_recipes:
-        query = query.options(joinedload(Appointment.recipes))
 
-    if include_diagnoses:
-        query = query.options(joinedload(Appointment.diagnoses))
+def get_patient_timeline(
+        db: Session,
+        patient_id: int,
+        cursor: Optional[str] = None,
+        limit: int = 20
+) -> Dict[str, Any]:
+    """
+    Historial del paciente: citas con médico, diagnósticos y recetas, de la más reciente
+    a la más antigua. Siempre cuatro consultas (paciente, página de citas, diagnósticos,
+    recetas) sin importar el largo del historial. La paginación es por cursor sobre
+    (fecha, hora, id): cada página continúa donde terminó la anterior sin OFFSET.
+    """
+    patient = db.execute(
+        select(*_response_columns(Patient, PatientBasic)).where(Patient.id == patient_id)
+    ).mappings().first()
+    if patient is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Paciente con ID {patient_id} no encontrado"
+        )
+
+    user_columns = [column.label(f"user__{column.name}") for column in _response_columns(AuthUser, UserBasic)]
+    stmt = (select(*_response_columns(Appointment, AppointmentResponse), *user_columns)
+            .outerjoin(AuthUser, AuthUser.id == Appointment.user_id)
+            .where(Appointment.patient_id == patient_id))
 
-    return query.order_by(desc(Appointment.appointment_date), desc(Appointment.appointment_time)).offset(skip).limit(
-        limit).all()
+    if cursor:
+        stmt = stmt.where(tuple_(Appointment.appointment_date, Appointment.appointment_time, Appointment.id)
+                          < tuple_(*_decode_timeline_cursor(cursor)))
+
+    # Se pide una fila extra para saber si hay más páginas
+    rows = db.execute(stmt
+                      .order_by(desc(Appointment.appointment_date), desc(Appointment.appointment_time),
+                                desc(Appointment.id))
+                      .limit(limit + 1)).mappings().all()
+
+    appointments = [_nest_appointment_row(row) for row in rows[:limit]]
+    _attach_children(db, appointments)
+
+    return {
+        "patient": dict(patient),
+        "appointments": appointments,
+        "next_cursor": _encode_timeline_cursor(appointments[-1]) if len(rows) > limit else None
+    }
 
 
 def get_appointment_by_id(db: Session, appointment_id: int) -> Optional[AppointmentResponse]:
@@ -125,11 +292,10 @@ def search_appointments(
     - Por código o descripción de diagnóstico
     - Combinación de ambos criterios
     """
-    # Construir la consulta base
-    db_query = db.query(Appointment).options(
-        joinedload(Appointment.patient),
-        joinedload(Appointment.diagnoses)
-    )
+    # Fase 1: seleccionar solo los IDs ordenados. Patient es 1 a 1 con la cita
+    # y los diagnósticos se filtran con EXISTS, así no se multiplican filas y
+    # el limit/offset se aplica sobre citas y no sobre diagnósticos.
+    id_query = db.query(Appointment.id)
 
     # Lista de condiciones a aplicar
     conditions = []
@@ -137,13 +303,18 @@ def search_appointments(
     # Filtro por texto (nombre, apellido, cédula, diagnóstico)
     if query and query.strip():
         search_term = f"%{query.lower()}%"
-        db_query = db_query.join(Patient).outerjoin(AppointmentDiagnosis)
+        id_query = id_query.join(Patient, Patient.id == Appointment.patient_id)
+        diagnosis_match = Appointment.diagnoses.any(
+            or_(
+                func.lower(AppointmentDiagnosis.diagnosis_description).like(search_term),
+                AppointmentDiagnosis.diagnosis_code.contains(query.strip().upper())
+            )
+        )
         text_conditions = or_(
             func.lower(Patient.first_name).like(search_term),
             func.lower(Patient.last_name).like(search_term),
             Patient.document_id.contains(query.strip()),
-            func.lower(AppointmentDiagnosis.diagnosis_description).like(search_term),
-            AppointmentDiagnosis.diagnosis_code.contains(query.strip().upper())
+            diagnosis_match
         )
         conditions.append(text_conditions)
 
@@ -156,12 +327,129 @@ def search_appointments(
 
     # Aplicar todas las condiciones
     if conditions:
-        db_query = db_query.filter(and_(*conditions))
+        id_query = id_query.filter(and_(*conditions))
+
+    # Aplicar ordenamiento y paginación sobre los IDs
+    appointment_ids = [row.id for row in (id_query
+                                          .order_by(desc(Appointment.appointment_date),
+                                                    desc(Appointment.appointment_time),
+                                                    desc(Appointment.id))
+                                          .offset(skip).limit(limit).all())]
+
+    if not appointment_ids:
+        return []
+
+    # Fase 2: hidratar las citas con selectinload (una consulta por relación)
+    appointments = (db.query(Appointment)
+                    .options(
+        selectinload(Appointment.patient),
+        selectinload(Appointment.diagnoses)
+    )
+                    .filter(Appointment.id.in_(appointment_ids))
+                    .all())
 
-    # Aplicar ordenamiento y paginación
-    return (db_query
-            .order_by(desc(Appointment.appointment_date), desc(Appointment.appointment_time))
-            .offset(skip).limit(limit).all())
+    # Restaurar el orden de la fase 1
+    appointments_by_id = {appointment.id: appointment for appointment in appointments}
+    return [appointments_by_id[appointment_id] for appointment_id in appointment_ids
+            if appointment_id in appointments_by_id]
+
+
+# Campos narrativos incluidos en Appointment.search_vector
+NARRATIVE_FIELDS = (
+    "current_illness",
+    "physical_examination",
+    "observations",
+    "laboratory_tests",
+    "medical_preinscription",
+)
+
+# ts_headline marca con caracteres de control que no aparecen en el texto (se eliminan antes);
+# el fragmento se escapa como HTML y recién después las marcas se cambian por <mark>
+HIGHLIGHT_START, HIGHLIGHT_STOP = "\x02", "\x03"
+HEADLINE_OPTIONS = (f'StartSel="{HIGHLIGHT_START}", StopSel="{HIGHLIGHT_STOP}", '
+                    f'MaxFragments=2, MaxWords=25, MinWords=8')
+
+
+def _highlight_html(headline: str) -> str:
+    return (html.escape(headline)
+            .replace(HIGHLIGHT_START, "<mark>")
+            .replace(HIGHLIGHT_STOP, "</mark>"))
+
+
+def search_appointments_fulltext(
+        db: Session,
+        text_query: str,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        skip: int = 0,
+        limit: int = 20
+) -> List[Dict[str, Any]]:
+    """
+    Búsqueda de texto completo (español) sobre los campos narrativos de las citas.
+    Ordena por relevancia y devuelve fragmentos resaltados por campo.
+    """
+    ts_query = func.websearch_to_tsquery("spanish", text_query)
+    rank = func.ts_rank_cd(Appointment.search_vector, ts_query)
+
+    # Primero se rankea y pagina usando solo el índice GIN; ts_headline es
+    # costoso y se calcula únicamente para las filas de la página.
+    matches = select(Appointment.id, rank.label("rank")).where(Appointment.search_vector.op("@@")(ts_query))
+
+    if start_date:
+        matches = matches.where(Appointment.appointment_date >= start_date)
+
+    if end_date:
+        matches = matches.where(Appointment.appointment_date <= end_date)
+
+    matches = (matches
+               .order_by(desc("rank"), desc(Appointment.appointment_date), desc(Appointment.id))
+               .offset(skip).limit(limit)
+               .subquery())
+
+    headlines = []
+    for field in NARRATIVE_FIELDS:
+        text = func.translate(func.coalesce(getattr(Appointment, field), ""), HIGHLIGHT_START + HIGHLIGHT_STOP, "")
+        headlines.append(func.ts_headline("spanish", text, ts_query, HEADLINE_OPTIONS).label(field))
+        # ts_headline devuelve el inicio del texto si no hay coincidencia: el campo coincide
+        # solo si su propio tsvector satisface la consulta
+        headlines.append(func.to_tsvector("spanish", text).op("@@")(ts_query).label(f"{field}_matched"))
+
+    stmt = (select(
+        Appointment.id,
+        Appointment.patient_id,
+        Appointment.user_id,
+        Appointment.appointment_date,
+        Appointment.appointment_time,
+        matches.c.rank,
+        Patient.first_name,
+        Patient.last_name,
+        Patient.document_id,
+        *headlines
+    )
+            .join(matches, matches.c.id == Appointment.id)
+            .join(Patient, Patient.id == Appointment.patient_id)
+            .order_by(desc(matches.c.rank), desc(Appointment.appointment_date), desc(Appointment.id)))
+
+    results = []
+    for row in db.execute(stmt).mappings():
+        results.append({
+            "id": row["id"],
+            "patient_id": row["patient_id"],
+            "user_id": row["user_id"],
+            "appointment_date": row["appointment_date"],
+            "appointment_time": row["appointment_time"],
+            "rank": row["rank"],
+            "patient": {
+                "id": row["patient_id"],
+                "first_name": row["first_name"],
+                "last_name": row["last_name"],
+                "document_id": row["document_id"],
+            },
+            "highlights": {field: _highlight_html(row[field]) for field in NARRATIVE_FIELDS
+                           if row[f"{field}_matched"]}
+        })
+
+    return results
 
 
 def update_appointment(
@@ -226,10 +514,17 @@ def update_appointment(
                 detail=f"Ya existe otra cita programada para {appointment_data.appointment_date} a las {appointment_data.appointment_time}"
             )
 
+    # Verificar e incrementar la versión antes de modificar (409 si otro usuario guardó antes)
+    claim_version(db, Appointment, appointment_id, appointment_data.version, "La cita")
+
+    previous_date = db_appointment.appointment_date
+    previous_stats = appointment_stat_keys(db_appointment)
+    previous_medications = appointment_medication_keys(db_appointment)
+
     # 1. Actualizar campos simples EXCLUYENDO relaciones
     update_data = appointment_data.model_dump(
         exclude_unset=True,
-        exclude={'recipes', 'diagnoses'}
+        exclude={'recipes', 'diagnoses', 'version'}
     )
 
     for field, value in update_data.items():
@@ -237,6 +532,7 @@ def update_appointment(
 
     # 2. Manejar diagnósticos por separado
     if appointment_data.diagnoses is not None:
+        check_diagnosis_codes(diagnosis.diagnosis_code for diagnosis in appointment_data.diagnoses)
         # Eliminar diagnósticos existentes
         db.query(AppointmentDiagnosis).filter(
             AppointmentDiagnosis.appointment_id == appointment_id
@@ -261,9 +557,21 @@ def update_appointment(
             new_recipe = Recipe(**recipe_data)
             db.add(new_recipe)
 
+    sync_appointment_vitals(db_appointment)
+
+    # Recargar los diagnósticos reemplazados para actualizar los rollups
+    db.flush()
+    db.expire(db_appointment, ["diagnoses", "recipes"])
+    apply_diagnosis_stats_delta(db, previous_stats, appointment_stat_keys(db_appointment))
+    apply_medication_usage_delta(db, previous_medications, appointment_medication_keys(db_appointment))
+    refresh_doctor_workload(db, [(db_appointment.user_id, previous_date),
+                                 (db_appointment.user_id, db_appointment.appointment_date)])
+
     db_appointment.updated_at = datetime.utcnow()
     db.commit()
     db.refresh(db_appointment)
+    medication_catalog.mark_stale()
+    _notify_appointment_change("updated", _appointment_snapshot(db_appointment), previous_date)
 
     return db_appointment
 
@@ -277,23 +585,38 @@ def delete_appointment(db: Session, appointment_id: int) -> bool:
             detail=f"Cita con ID {appointment_id} no encontrada"
         )
 
+    snapshot = _appointment_snapshot(db_appointment)
+    apply_diagnosis_stats_delta(db, appointment_stat_keys(db_appointment), Counter())
+    apply_medication_usage_delta(db, appointment_medication_keys(db_appointment), Counter())
     db.delete(db_appointment)
+    refresh_doctor_workload(db, [(snapshot["user_id"], snapshot["appointment_date"])])
     db.commit()
+    medication_catalog.mark_stale()
+    _notify_appointment_change("deleted", snapshot)
     return True
 
 
-def get_today_appointments(db: Session) -> List[Appointment]:
-    """Obtener las citas del día actual"""
-    try:
-        today = date.today()
-        appointments = (db.query(Appointment)
-                        .options(
+def get_today_appointments(db: Session, doctor_id: Optional[int] = None) -> List[AppointmentResponse]:
+    """Obtener las citas del día actual (global o de un doctor), servidas desde la caché en memoria"""
+
+    def load_agenda(today: date) -> List[AppointmentResponse]:
+        query = (db.query(Appointment)
+                 .options(
             joinedload(Appointment.patient),
-            joinedload(Appointment.diagnoses)
+            joinedload(Appointment.user),
+            selectinload(Appointment.diagnoses),
+            selectinload(Appointment.recipes)
         )
-                        .filter(Appointment.appointment_date == today)
-                        .order_by(asc(Appointment.appointment_time)).all())
-        return appointments
+                 .filter(Appointment.appointment_date == today))
+
+        if doctor_id is not None:
+            query = query.filter(Appointment.user_id == doctor_id)
+
+        appointments = query.order_by(asc(Appointment.appointment_time)).all()
+        return [AppointmentResponse.model_validate(appointment) for appointment in appointments]
+
+    try:
+        return today_agenda_cache.get_or_load(doctor_id, load_agenda)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -301,6 +624,50 @@ def get_today_appointments(db: Session) -> List[Appointment]:
         )
 
 
+def get_calendar_appointments(
+        db: Session,
+        start_date: date,
+        end_date: date,
+        doctor_id: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Proyección compacta de citas para vistas de calendario.
+    Solo consulta las columnas necesarias, sin hidratar objetos ORM.
+    Una cita se considera atendida cuando ya tiene registrada la anamnesis o el examen físico.
+    """
+    status_expr = case(
+        (or_(Appointment.current_illness.isnot(None), Appointment.physical_examination.isnot(None)), "attended"),
+        else_="scheduled"
+    )
+
+    stmt = (select(
+        Appointment.id,
+        Appointment.appointment_date,
+        Appointment.appointment_time,
+        Patient.first_name,
+        Patient.last_name,
+        status_expr.label("status")
+    )
+            .join(Patient, Patient.id == Appointment.patient_id)
+            .where(Appointment.appointment_date.between(start_date, end_date)))
+
+    if doctor_id is not None:
+        stmt = stmt.where(Appointment.user_id == doctor_id)
+
+    stmt = stmt.order_by(asc(Appointment.appointment_date), asc(Appointment.appointment_time))
+
+    return [
+        {
+            "id": row.id,
+            "date": row.appointment_date,
+            "time": row.appointment_time.strftime("%H:%M"),
+            "patient": f"{row.first_name} {row.last_name}",
+            "status": row.status
+        }
+        for row in db.execute(stmt)
+    ]
+
+
 def get_appointment_count_by_patient(db: Session, patient_id: int) -> int:
     """Contar el número total de citas de un paciente"""
     return (db.query(Appointment)
@@ -320,9 +687,12 @@ def add_diagnosis_to_appointment(
         appointment_id: int,
         diagnosis_code: str,
         diagnosis_description: str,
-        diagnosis_type: str = "secondary"
+        diagnosis_type: str = "secondary",
+        expected_version: Optional[int] = None
 ) -> AppointmentDiagnosis:
-    """Agregar un diagnóstico a una cita existente"""
+    """Agregar un diagnóstico a una cita existente (expected_version: versión de la cita que vio el cliente)"""
+    diagnosis_code = diagnosis_code.strip().upper()
+    check_diagnosis_codes([diagnosis_code])
     # Verificar que la cita existe
     appointment = db.query(Appointment).filter(Appointment.id == appointment_id).first()
     if not appointment:
@@ -331,6 +701,9 @@ def add_diagnosis_to_appointment(
             detail=f"Cita con ID {appointment_id} no encontrada"
         )
 
+    # Los diagnósticos son parte de la cita: 409 si otro usuario la guardó antes
+    claim_version(db, Appointment, appointment_id, expected_version, "La cita")
+
     # Crear el nuevo diagnóstico
     new_diagnosis = AppointmentDiagnosis(
         appointment_id=appointment_id,
@@ -340,14 +713,18 @@ def add_diagnosis_to_appointment(
     )
 
     db.add(new_diagnosis)
+    apply_diagnosis_stats_delta(db, Counter(), diagnosis_stat_keys(
+        appointment.appointment_date, appointment.user_id, appointment.contingency_type, [diagnosis_code]
+    ))
     db.commit()
     db.refresh(new_diagnosis)
+    _notify_appointment_change("updated", _appointment_snapshot(appointment))
 
     return new_diagnosis
 
 
-def remove_diagnosis_from_appointment(db: Session, diagnosis_id: int) -> bool:
-    """Eliminar un diagnóstico específico de una cita"""
+def remove_diagnosis_from_appointment(db: Session, diagnosis_id: int, expected_version: Optional[int] = None) -> bool:
+    """Eliminar un diagnóstico específico de una cita (expected_version: versión de la cita que vio el cliente)"""
     diagnosis = db.query(AppointmentDiagnosis).filter(AppointmentDiagnosis.id == diagnosis_id).first()
     if not diagnosis:
         raise HTTPException(
@@ -355,8 +732,15 @@ def remove_diagnosis_from_appointment(db: Session, diagnosis_id: int) -> bool:
             detail=f"Diagnóstico con ID {diagnosis_id} no encontrado"
         )
 
+    appointment = diagnosis.appointment
+    claim_version(db, Appointment, appointment.id, expected_version, "La cita")
+    snapshot = _appointment_snapshot(appointment)
+    apply_diagnosis_stats_delta(db, diagnosis_stat_keys(
+        appointment.appointment_date, appointment.user_id, appointment.contingency_type, [diagnosis.diagnosis_code]
+    ), Counter())
     db.delete(diagnosis)
     db.commit()
+    _notify_appointment_change("updated", snapshot)
     return True
 
 
@@ -391,10 +775,17 @@ def manage_appointment(
                 detail=f"Ya existe otra cita programada para {appointment_data.appointment_date} a las {appointment_data.appointment_time}"
             )
 
+    # Verificar e incrementar la versión antes de modificar (409 si otro usuario guardó antes)
+    claim_version(db, Appointment, appointment_id, appointment_data.version, "La cita")
+
+    previous_date = db_appointment.appointment_date
+    previous_stats = appointment_stat_keys(db_appointment)
+    previous_medications = appointment_medication_keys(db_appointment)
+
     # 1. Actualizar campos simples EXCLUYENDO relaciones
     update_data = appointment_data.model_dump(
         exclude_unset=True,
-        exclude={'recipes', 'diagnoses'}
+        exclude={'recipes', 'diagnoses', 'version'}
     )
 
     for field, value in update_data.items():
@@ -402,6 +793,7 @@ def manage_appointment(
 
     # 2. Manejar diagnósticos por separado
     if appointment_data.diagnoses is not None:
+        check_diagnosis_codes(diagnosis.diagnosis_code for diagnosis in appointment_data.diagnoses)
         # Eliminar diagnósticos existentes
         db.query(AppointmentDiagnosis).filter(
             AppointmentDiagnosis.appointment_id == appointment_id
@@ -426,37 +818,20 @@ def manage_appointment(
             new_recipe = Recipe(**recipe_data)
             db.add(new_recipe)
 
+    sync_appointment_vitals(db_appointment)
+
+    # Recargar los diagnósticos reemplazados para actualizar los rollups
+    db.flush()
+    db.expire(db_appointment, ["diagnoses", "recipes"])
+    apply_diagnosis_stats_delta(db, previous_stats, appointment_stat_keys(db_appointment))
+    apply_medication_usage_delta(db, previous_medications, appointment_medication_keys(db_appointment))
+    refresh_doctor_workload(db, [(db_appointment.user_id, previous_date),
+                                 (db_appointment.user_id, db_appointment.appointment_date)])
+
     db_appointment.updated_at = datetime.utcnow()
     db.commit()
     db.refresh(db_appointment)
+    medication_catalog.mark_stale()
+    _notify_appointment_change("updated", _appointment_snapshot(db_appointment), previous_date)
 
     return db_appointment
-
-
-
-
-def get_appointments_by_doctor(
-        db: Session,
-        doctor_id: int,
-        skip: int = 0,
-        limit: int = 100,
-        include_patient: bool = True,
-        include_recipes: bool = True,
-        include_diagnoses: bool = True
-) -> List[Appointment]:
-    """Obtener lista de citas de un doctor específico con paginación"""
-    query = db.query(Appointment).filter(Appointment.user_id == doctor_id)
-
-    if include_patient:
-        query = query.options(joinedload(Appointment.patient))
-
-    if include_recipes:
-        query = query.options(joinedload(Appointment.recipes))
-
-    if include_diagnoses:
-        query = query.options(joinedload(Appointment.diagnoses))
-
-    return query.order_by(
-        desc(Appointment.appointment_date),
-        desc(Appointment.appointment_time)
-    ).offset(skip).limit(limit).all()
\ No newline at end of file
@@ -0,0 +1,166 @@
+# cie10_catalog.py - Catálogo CIE-10 en memoria con autocompletado por prefijo
+import csv
+import logging
+import os
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+# Archivo CSV con columnas código y descripción (separador , ; o tabulador, encabezado opcional)
+# No viene con el repositorio: se exporta de la publicación oficial de la CIE-10 y se
+# monta en esta ruta. Sin él, el autocompletado responde 503 y los códigos no se validan.
+CIE10_CATALOG_PATH = os.getenv("CIE10_CATALOG_PATH", "data/cie10.csv")
+
+
+def normalize_code(code: str) -> str:
+    """J06.9, j069 y 'J06.9 ' se indexan igual"""
+    return code.strip().upper().replace(".", "")
+
+
+def _normalize_text(value: str) -> str:
+    value = unicodedata.normalize("NFKD", value.lower())
+    return "".join(char for char in value if not unicodedata.combining(char))
+
+
+def _tokenize(value: str) -> List[str]:
+    return [token for token in "".join(char if char.isalnum() else " " for char in _normalize_text(value)).split()
+            if len(token) > 1]
+
+
+def _prefix_range(keys: List[str], prefix: str) -> range:
+    start = bisect_left(keys, prefix)
+    end = bisect_left(keys, prefix + "\uffff", lo=start)
+    return range(start, end)
+
+
+class Cie10Catalog:
+    """
+    Catálogo CIE-10 inmutable en arreglos ordenados.
+    - Códigos: lista ordenada de claves normalizadas; prefijo por búsqueda binaria.
+    - Descripciones: índice invertido de palabras ordenado (palabra -> posición del código),
+      que permite buscar por prefijo de cada palabra escrita.
+    """
+
+    def __init__(self, entries: Dict[str, str]):
+        items = sorted((normalize_code(code), code.strip().upper(), description.strip())
+                       for code, description in entries.items() if code.strip())
+        self._keys = [key for key, _, _ in items]
+        self._codes = [code for _, code, _ in items]
+        self._descriptions = [description for _, _, description in items]
+
+        words = sorted({(token, position) for position, (_, _, description) in enumerate(items)
+                        for token in _tokenize(description)})
+        self._words = [word for word, _ in words]
+        self._word_positions = array("I", (position for _, position in words))
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _entry(self, position: int) -> dict:
+        return {"code": self._codes[position], "description": self._descriptions[position]}
+
+    def get(self, code: str) -> Optional[dict]:
+        key = normalize_code(code)
+        position = bisect_left(self._keys, key)
+        if position < len(self._keys) and self._keys[position] == key:
+            return self._entry(position)
+        return None
+
+    def contains(self, code: str) -> bool:
+        return self.get(code) is not None
+
+    def autocomplete(self, query: str, limit: int = 10) -> List[dict]:
+        """Sugerencias por prefijo de código o, si no hay, por prefijo de palabras de la descripción"""
+        query = query.strip()
+        if not query:
+            return []
+
+        code_matches = _prefix_range(self._keys, normalize_code(query))
+        if len(code_matches):
+            return [self._entry(position) for position in code_matches[:limit]]
+
+        tokens = _tokenize(query)
+        if not tokens:
+            return []
+
+        # Cada palabra escrita debe ser prefijo de alguna palabra de la descripción;
+        # se intersecta empezando por la palabra con menos coincidencias
+        candidates = sorted((_prefix_range(self._words, token) for token in tokens), key=len)
+        positions = {self._word_positions[index] for index in candidates[0]}
+        for word_range in candidates[1:]:
+            if not positions:
+                break
+            positions &= {self._word_positions[index] for index in word_range}
+
+        return [self._entry(position) for position in sorted(positions)[:limit]]
+
+
+def load_catalog(path: str) -> Cie10Catalog:
+    """Cargar el catálogo desde un CSV (código, descripción)"""
+    entries = {}
+    with open(path, newline="", encoding="utf-8-sig") as catalog_file:
+        sample = catalog_file.read(4096)
+        catalog_file.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            # Una sola columna o muestra ambigua: separador por coma; las filas sin
+            # descripción se descartan abajo
+            logger.warning(f"No se pudo detectar el separador de {path}; se usa coma")
+            dialect = csv.excel
+        for row in csv.reader(catalog_file, dialect):
+            if len(row) < 2:
+                continue
+            code, description = row[0], row[1]
+            if code.strip().lower() in ("code", "codigo", "código"):
+                continue
+            entries[code] = description
+    return Cie10Catalog(entries)
+
+
+_catalog: Optional[Cie10Catalog] = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog() -> Cie10Catalog:
+    """Catálogo cargado una sola vez por proceso; vacío si no existe el archivo"""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                if os.path.exists(CIE10_CATALOG_PATH):
+                    _catalog = load_catalog(CIE10_CATALOG_PATH)
+                    logger.info(f"Catálogo CIE-10 cargado: {len(_catalog)} códigos")
+                else:
+                    logger.warning(f"Catálogo CIE-10 no encontrado en {CIE10_CATALOG_PATH}; "
+                                   f"no se validarán los códigos de diagnóstico")
+                    _catalog = Cie10Catalog({})
+    return _catalog
+
+
+def require_catalog() -> Cie10Catalog:
+    """Catálogo para las rutas que solo sirven con datos: 503 si no se cargó ningún código"""
+    catalog = get_catalog()
+    if not len(catalog):
+        raise HTTPException(
+            status_code=503,
+            detail=f"Catálogo CIE-10 no cargado: falta el archivo {CIE10_CATALOG_PATH} "
+                   f"(CSV código, descripción; se configura con CIE10_CATALOG_PATH)"
+        )
+    return catalog
+
+
+def check_diagnosis_codes(codes: Iterable[Optional[str]]):
+    """Rechazar con 422 los códigos que no están en el catálogo (si hay catálogo cargado)"""
+    catalog = get_catalog()
+    if not len(catalog):
+        return
+    invalid = [code for code in codes if code is not None and not catalog.contains(code)]
+    if invalid:
+        raise HTTPException(status_code=422, detail=f"Código CIE-10 no válido: {', '.join(invalid)}")
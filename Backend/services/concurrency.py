@@ -0,0 +1,36 @@
+# concurrency.py - Control de concurrencia optimista por columna version
+import logging
+from typing import Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+
+def claim_version(db: Session, model, entity_id: int, expected_version: Optional[int], label: str):
+    """
+    Incrementar la versión de una fila dentro de la transacción actual:
+        UPDATE ... SET version = version + 1 WHERE id = :id AND version = :v
+    Si la versión enviada por el cliente ya no es la vigente, otro usuario guardó
+    antes y se responde 409. La fila queda bloqueada hasta el commit, por lo que dos
+    guardados simultáneos con la misma versión no pueden pasar ambos.
+    Sin versión (clientes anteriores) solo se incrementa, sin verificar: el último en
+    guardar gana. Se registra una advertencia para ubicar a esos clientes.
+    """
+    stmt = update(model).where(model.id == entity_id)
+    if expected_version is not None:
+        stmt = stmt.where(model.version == expected_version)
+    else:
+        logger.warning(f"⚠️ {label} con ID {entity_id} se guarda sin versión: "
+                       f"no se verifica si otro usuario lo modificó antes")
+
+    result = db.execute(stmt.values(version=model.version + 1).execution_options(synchronize_session=False))
+    if result.rowcount == 0:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"{label} con ID {entity_id} fue modificado por otro usuario (versión {expected_version} "
+                   f"desactualizada); recargue los datos antes de guardar"
+        )
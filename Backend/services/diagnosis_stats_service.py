@@ -0,0 +1,154 @@
+# diagnosis_stats_service.py - Rollups de diagnósticos por mes, médico y contingencia
+import logging
+from collections import Counter
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import select, delete, func, desc, literal_column
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from models.Appointment import Appointment, AppointmentDiagnosis
+from models.DiagnosisStats import DiagnosisMonthlyStat
+
+logger = logging.getLogger(__name__)
+
+GROUP_COLUMNS = {
+    "month": DiagnosisMonthlyStat.month,
+    "doctor": DiagnosisMonthlyStat.user_id,
+    "contingency_type": DiagnosisMonthlyStat.contingency_type,
+}
+
+
+def diagnosis_stat_keys(appointment_date: date, user_id: int, contingency_type: Optional[str],
+                        codes: Iterable[Optional[str]]) -> Counter:
+    """Aporte de una cita a los rollups: (mes, médico, contingencia, código) -> cantidad"""
+    month = appointment_date.replace(day=1)
+    return Counter((month, user_id, contingency_type or "", code) for code in codes if code)
+
+
+def appointment_stat_keys(appointment: Appointment) -> Counter:
+    """Aporte actual de una cita cargada, con sus diagnósticos"""
+    return diagnosis_stat_keys(appointment.appointment_date, appointment.user_id, appointment.contingency_type,
+                               [diagnosis.diagnosis_code for diagnosis in appointment.diagnoses])
+
+
+def apply_diagnosis_stats_delta(db: Session, before: Counter, after: Counter):
+    """
+    Aplicar la diferencia entre el estado anterior y el nuevo de una o más citas.
+    Se ejecuta en la misma transacción que la escritura de la cita.
+    """
+    delta = Counter(after)
+    delta.subtract(before)
+    changes = [(key, amount) for key, amount in delta.items() if amount]
+    if not changes:
+        return
+
+    stmt = insert(DiagnosisMonthlyStat).values([
+        {"month": month, "user_id": user_id, "contingency_type": contingency_type,
+         "diagnosis_code": code, "diagnosis_count": amount}
+        for (month, user_id, contingency_type, code), amount in changes
+    ])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[DiagnosisMonthlyStat.month, DiagnosisMonthlyStat.user_id,
+                        DiagnosisMonthlyStat.contingency_type, DiagnosisMonthlyStat.diagnosis_code],
+        set_={"diagnosis_count": DiagnosisMonthlyStat.diagnosis_count + stmt.excluded.diagnosis_count}
+    ))
+
+    if any(amount < 0 for _, amount in changes):
+        db.execute(delete(DiagnosisMonthlyStat).where(
+            DiagnosisMonthlyStat.month.in_({month for (month, _, _, _), _ in changes}),
+            DiagnosisMonthlyStat.diagnosis_count <= 0
+        ))
+
+
+def patient_stat_keys(db: Session, patient_id: int) -> Counter:
+    """Aporte de todas las citas de un paciente (antes de eliminarlo)"""
+    month = func.date_trunc("month", Appointment.appointment_date).cast(Appointment.appointment_date.type)
+    rows = db.execute(
+        select(month.label("month"), Appointment.user_id, func.coalesce(Appointment.contingency_type, ""),
+               AppointmentDiagnosis.diagnosis_code, func.count())
+        .join(AppointmentDiagnosis, AppointmentDiagnosis.appointment_id == Appointment.id)
+        .where(Appointment.patient_id == patient_id)
+        .group_by(literal_column("1"), literal_column("2"), literal_column("3"), literal_column("4"))
+    ).all()
+    return Counter({tuple(row[:4]): row[4] for row in rows})
+
+
+def rebuild_diagnosis_stats(db: Session, start_month: Optional[date] = None, end_month: Optional[date] = None) -> int:
+    """Recalcular los rollups desde appointment_diagnoses (todo o un rango de meses)"""
+    month = func.date_trunc("month", Appointment.appointment_date).cast(Appointment.appointment_date.type)
+
+    clear = delete(DiagnosisMonthlyStat)
+    source = (select(month, Appointment.user_id, func.coalesce(Appointment.contingency_type, ""),
+                     AppointmentDiagnosis.diagnosis_code, func.count())
+              .join(AppointmentDiagnosis, AppointmentDiagnosis.appointment_id == Appointment.id))
+
+    if start_month:
+        start_month = start_month.replace(day=1)
+        clear = clear.where(DiagnosisMonthlyStat.month >= start_month)
+        source = source.where(Appointment.appointment_date >= start_month)
+
+    if end_month:
+        end_month = end_month.replace(day=1)
+        clear = clear.where(DiagnosisMonthlyStat.month <= end_month)
+        source = source.where(month <= end_month)
+
+    source = source.group_by(literal_column("1"), literal_column("2"), literal_column("3"), literal_column("4"))
+
+    db.execute(clear)
+    result = db.execute(insert(DiagnosisMonthlyStat).from_select(
+        ["month", "user_id", "contingency_type", "diagnosis_code", "diagnosis_count"], source
+    ))
+    db.commit()
+    logger.info(f"Rollups de diagnósticos recalculados: {result.rowcount} filas")
+    return result.rowcount
+
+
+def get_top_diagnoses(
+        db: Session,
+        start_month: Optional[date] = None,
+        end_month: Optional[date] = None,
+        doctor_id: Optional[int] = None,
+        contingency_type: Optional[str] = None,
+        group_by: Optional[List[str]] = None,
+        limit: int = 10
+) -> List[Dict[str, Any]]:
+    """
+    Diagnósticos más frecuentes leyendo solo los rollups.
+    Con group_by (month, doctor, contingency_type) devuelve el top de cada grupo.
+    """
+    group_columns = [GROUP_COLUMNS[name].label(name) for name in (group_by or [])]
+    total = func.sum(DiagnosisMonthlyStat.diagnosis_count).label("total")
+
+    stmt = select(*group_columns, DiagnosisMonthlyStat.diagnosis_code, total)
+
+    if start_month:
+        stmt = stmt.where(DiagnosisMonthlyStat.month >= start_month.replace(day=1))
+
+    if end_month:
+        stmt = stmt.where(DiagnosisMonthlyStat.month <= end_month.replace(day=1))
+
+    if doctor_id is not None:
+        stmt = stmt.where(DiagnosisMonthlyStat.user_id == doctor_id)
+
+    if contingency_type is not None:
+        stmt = stmt.where(DiagnosisMonthlyStat.contingency_type == contingency_type)
+
+    grouped = stmt.group_by(*[GROUP_COLUMNS[name] for name in (group_by or [])],
+                            DiagnosisMonthlyStat.diagnosis_code).subquery()
+
+    partition = [grouped.c[name] for name in (group_by or [])]
+    ranking = func.row_number().over(
+        partition_by=partition or None,
+        order_by=(desc(grouped.c.total), grouped.c.diagnosis_code)
+    ).label("position")
+    ranked = select(grouped, ranking).subquery()
+
+    rows = db.execute(
+        select(ranked)
+        .where(ranked.c.position <= limit)
+        .order_by(*[ranked.c[name] for name in (group_by or [])], ranked.c.position)
+    ).mappings().all()
+
+    return [dict(row) for row in rows]
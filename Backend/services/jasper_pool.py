@@ -0,0 +1,257 @@
+# jasper_pool.py - Procesos de JasperReports con la JVM caliente y las plantillas ya cargadas
+#
+# Antes cada petición creaba un PyReportJasper() nuevo: cargaba (o compilaba) la plantilla,
+# abría su propia conexión JDBC, ejecutaba las consultas del reporte y de cada subreporte,
+# exportaba a un archivo en OUTPUT_DIR y se leía de vuelta. Aquí cada proceso del pool:
+#   - arranca su JVM una sola vez,
+#   - compila todos los .jrxml al arrancar, en un directorio propio del pool (una vez, con
+#     candado), de modo que los .jasper nunca quedan desactualizados,
+#   - deja cargada en memoria cada plantilla y solo la vuelve a llenar,
+#   - llena con filas ya leídas por services/report_data.py (pool de SQLAlchemy) mediante
+#     un JRMapCollectionDataSource: Jasper no abre conexiones a la base,
+#   - devuelve el PDF como bytes, sin pasar por disco.
+# Las peticiones entran por la cola del pool; JASPER_WORKERS limita cuántas se generan a la
+# vez y JASPER_QUEUE_SIZE cuántas pueden esperar (las demás reciben 503).
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time as clock
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+JASPER_WORKERS = int(os.getenv("JASPER_WORKERS", "2"))
+JASPER_QUEUE_SIZE = int(os.getenv("JASPER_QUEUE_SIZE", "16"))
+JASPER_TIMEOUT = float(os.getenv("JASPER_TIMEOUT", "120"))
+# Tras un arranque fallido (sin Java, sin pyreportjasper, plantilla inválida) se responde 503
+# de inmediato durante este tiempo en lugar de intentar arrancar el pool en cada petición
+JASPER_RETRY_SECONDS = float(os.getenv("JASPER_RETRY_SECONDS", "60"))
+
+# Plantillas principales que se dejan cargadas; los subreportes los resuelve Jasper por
+# SUBREPORT_DIR, que apunta al directorio de compilación del pool
+TEMPLATES = ("MedicalRecord", "medicalCertificate")
+
+
+def medical_record_rows(record: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Filas de MedicalRecord.jrxml (una por cita) a partir de report_data.load_medical_record"""
+    patient = record["patient"]
+    rows = []
+    for appointment in record["appointments"]:
+        row = {key: value for key, value in appointment.items() if key not in ("id", "recipes")}
+        row.update(appointment_id=appointment["id"], patient_id=patient["id"],
+                   patient_first_name=patient["first_name"], patient_last_name=patient["last_name"],
+                   birth_date=patient["birth_date"], document_id=patient["document_id"],
+                   # MedicalRecord_Recipe busca "desayuno", "almuerzo" o "cena" dentro del texto
+                   recipes=[dict(recipe, lunchTime=json.dumps(recipe["lunchTime"], ensure_ascii=False)
+                                 if recipe["lunchTime"] is not None else None)
+                            for recipe in appointment["recipes"]])
+        rows.append(row)
+    return rows
+
+
+def certificate_rows(certificate: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Filas de medicalCertificate.jrxml (una por diagnóstico principal) a partir de load_certificate"""
+    patient = certificate["patient"]
+    base = {key: value for key, value in certificate.items() if key not in ("patient", "diagnoses")}
+    base.update({f"patient_{key}": value for key, value in patient.items()})
+    base.update(enterprise=patient["enterprise"], work_activity=patient["work_activity"], street=patient["street"],
+                neighborhood=patient["neighborhood"], city=patient["city"])
+    return [dict(base, **diagnosis) for diagnosis in certificate["diagnoses"]]
+
+
+def compile_templates(reports_dir: str, build_dir: str) -> List[str]:
+    """
+    Compilar todos los .jrxml a build_dir (uno nuevo por arranque del pool): así nunca se
+    usa un .jasper desactualizado respecto de su .jrxml. Devuelve los nombres compilados.
+    """
+    from pyreportjasper.report import Report
+
+    compiled = []
+    for file_name in sorted(os.listdir(reports_dir)):
+        name, extension = os.path.splitext(file_name)
+        target = os.path.join(build_dir, f"{name}.jasper")
+        if extension != ".jrxml" or os.path.exists(target):
+            continue
+        source = os.path.join(reports_dir, file_name)
+        # Report() arranca la JVM si hace falta; se usa solo por el JasperCompileManager
+        compiler = Report(_config(source), source).jvJasperCompileManager
+        compiler.compileReportToFile(source, f"{target}.tmp")
+        os.replace(f"{target}.tmp", target)
+        compiled.append(name)
+    return compiled
+
+
+def _config(input_file: str):
+    """Config de pyreportjasper, sin conexión a base de datos"""
+    from pyreportjasper import PyReportJasper
+
+    jasper = PyReportJasper()
+    jasper.config(input_file=input_file, output_formats=["pdf"])
+    return jasper.config
+
+
+# Estado de cada proceso del pool
+_build_dir: Optional[str] = None
+_templates: Dict[str, Any] = {}
+_java: Dict[str, Any] = {}
+
+
+def _start_worker(reports_dir: str, build_dir: str, compile_lock):
+    global _build_dir
+    import jpype
+    from pyreportjasper.report import Report
+
+    # El primer proceso compila; los demás encuentran los .jasper ya escritos
+    _build_dir = build_dir
+    with compile_lock:
+        compiled = compile_templates(reports_dir, build_dir)
+    if compiled:
+        logger.info(f"Plantillas compiladas: {', '.join(compiled)}")
+
+    for name in TEMPLATES:
+        path = os.path.join(build_dir, f"{name}.jasper")
+        _templates[name] = Report(_config(path), path)
+
+    for name in ("java.util.HashMap", "java.util.ArrayList", "java.sql.Date", "java.sql.Time",
+                 "java.sql.Timestamp", "java.math.BigDecimal", "java.lang.Integer", "java.lang.Long",
+                 "java.lang.Boolean", "java.io.ByteArrayOutputStream",
+                 "net.sf.jasperreports.engine.data.JRMapCollectionDataSource"):
+        _java[name.rsplit(".", 1)[1]] = jpype.JClass(name)
+    logger.info(f"Proceso Jasper {os.getpid()} listo")
+
+
+def _to_java(value: Any):
+    """Valor de Python al tipo que declaran los campos de las plantillas"""
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return _java["Boolean"](value)
+    if isinstance(value, int):
+        return _java["Integer"](value)
+    if isinstance(value, Decimal):
+        return _java["BigDecimal"](str(value))
+    if isinstance(value, datetime):
+        return _java["Timestamp"].valueOf(value.strftime("%Y-%m-%d %H:%M:%S"))
+    if isinstance(value, date):
+        return _java["Date"].valueOf(value.isoformat())
+    if isinstance(value, time):
+        return _java["Time"].valueOf(value.strftime("%H:%M:%S"))
+    if isinstance(value, dict):
+        java_map = _java["HashMap"]()
+        for key, item in value.items():
+            java_map.put(key, _to_java(item))
+        return java_map
+    if isinstance(value, (list, tuple)):
+        java_list = _java["ArrayList"]()
+        for item in value:
+            java_list.add(_to_java(item))
+        return java_list
+    return str(value)
+
+
+def _render(template: str, parameters: Dict[str, Any], rows: List[Dict[str, Any]]) -> bytes:
+    """Llenar la plantilla ya cargada con las filas recibidas y exportar el PDF en memoria"""
+    report = _templates[template]
+    java_parameters = _java["HashMap"]()
+    # Los subreportes se cargan de los .jasper compilados en este arranque
+    java_parameters.put("SUBREPORT_DIR", _build_dir + os.sep)
+    for key, value in parameters.items():
+        # Los parámetros enteros de las plantillas (patient_id, APPOINTMENT_ID) son java.lang.Long
+        is_integer = isinstance(value, int) and not isinstance(value, bool)
+        java_parameters.put(key, _java["Long"](value) if is_integer else _to_java(value))
+    data_source = _java["JRMapCollectionDataSource"](_to_java(rows))
+    jasper_print = report.jvJasperFillManager.fillReport(report.jasper_report, java_parameters, data_source)
+    output = _java["ByteArrayOutputStream"]()
+    report.JasperExportManager.exportReportToPdfStream(jasper_print, output)
+    return bytes(output.toByteArray())
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+class JasperPool:
+    """
+    Pool de procesos de Jasper; se arranca con la primera petición o con start().
+    Un cupo (JASPER_WORKERS + JASPER_QUEUE_SIZE) se libera recién cuando el proceso termina
+    el reporte, aunque la petición ya haya respondido 504: los reportes colgados siguen
+    contando y no se acumulan sin límite.
+    """
+
+    def __init__(self, reports_dir: str, workers: int = JASPER_WORKERS, queue_size: int = JASPER_QUEUE_SIZE,
+                 timeout: float = JASPER_TIMEOUT, retry_seconds: float = JASPER_RETRY_SECONDS):
+        self.reports_dir = reports_dir
+        self.workers = workers
+        self.timeout = timeout
+        self.retry_seconds = retry_seconds
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._lock = threading.Lock()
+        self._pool = None
+        self._build_dir = None
+        self._failed_at: Optional[float] = None
+        self._failure: Optional[str] = None
+
+    def start(self):
+        with self._lock:
+            if self._pool is not None:
+                return self._pool
+            if self._failed_at is not None and clock.monotonic() - self._failed_at < self.retry_seconds:
+                raise HTTPException(status_code=503, detail=f"Jasper no está disponible: {self._failure}")
+
+            context = multiprocessing.get_context("spawn")
+            build_dir = tempfile.mkdtemp(prefix="jasper_build_")
+            pool = context.Pool(self.workers, initializer=_start_worker,
+                                initargs=(self.reports_dir, build_dir, context.Lock()))
+            try:
+                # Esperar a que al menos un proceso tenga la JVM y las plantillas listas. Si el
+                # inicializador falla, Pool reemplaza el proceso una y otra vez y esto vence
+                pool.apply_async(_ping).get(self.timeout)
+            except Exception as e:
+                pool.terminate()
+                pool.join()
+                shutil.rmtree(build_dir, ignore_errors=True)
+                self._failed_at = clock.monotonic()
+                self._failure = "tiempo de arranque agotado" if isinstance(e, multiprocessing.TimeoutError) else str(e)
+                logger.error(f"No se pudo arrancar el pool de Jasper: {self._failure}")
+                raise HTTPException(status_code=503, detail=f"Jasper no está disponible: {self._failure}")
+
+            self._pool, self._build_dir = pool, build_dir
+            self._failed_at = self._failure = None
+            return pool
+
+    def _release(self, _result):
+        self._slots.release()
+
+    def render(self, template: str, parameters: Dict[str, Any], rows: List[Dict[str, Any]]) -> bytes:
+        if template not in TEMPLATES:
+            raise ValueError(f"Plantilla no precargada: {template}")
+        if not self._slots.acquire(blocking=False):
+            raise HTTPException(status_code=503, detail="Hay demasiados reportes en cola, intente nuevamente")
+        try:
+            result = self.start().apply_async(_render, (template, parameters, rows),
+                                              callback=self._release, error_callback=self._release)
+        except BaseException:
+            self._slots.release()
+            raise
+
+        try:
+            return result.get(self.timeout)
+        except multiprocessing.TimeoutError:
+            # El cupo queda tomado hasta que el proceso termine este reporte
+            raise HTTPException(status_code=504, detail="El reporte tardó demasiado en generarse")
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.terminate()
+                self._pool.join()
+                self._pool = None
+                shutil.rmtree(self._build_dir, ignore_errors=True)
@@ -0,0 +1,98 @@
+# leave_service.py - Consultas de reposo médico sobre Appointment.rest_period
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select, func, asc, desc
+from sqlalchemy.orm import Session
+
+from models.Appointment import Appointment
+from models.Patient import Patient
+from models.User import AuthUser
+
+LEAVE_GROUP_COLUMNS = {
+    "contingency_type": func.coalesce(Appointment.contingency_type, ""),
+    "doctor": Appointment.user_id,
+    "month": func.date_trunc("month", Appointment.rest_from).cast(Appointment.rest_from.type),
+}
+
+
+def _window(start_date: date, end_date: date):
+    return func.daterange(start_date, end_date, "[]")
+
+
+def get_patients_on_leave(
+        db: Session,
+        start_date: date,
+        end_date: date,
+        doctor_id: Optional[int] = None,
+        contingency_type: Optional[str] = None,
+        skip: int = 0,
+        limit: int = 100
+) -> List[Dict[str, Any]]:
+    """Reposos médicos que se solapan con el rango de fechas (índice GiST sobre rest_period)"""
+    stmt = (select(
+        Appointment.id.label("appointment_id"),
+        Appointment.patient_id,
+        Patient.first_name,
+        Patient.last_name,
+        Patient.document_id,
+        Appointment.user_id,
+        Appointment.rest_from,
+        Appointment.rest_to,
+        Appointment.sabbath_days,
+        Appointment.contingency_type
+    )
+            .join(Patient, Patient.id == Appointment.patient_id)
+            .where(Appointment.rest_period.op("&&")(_window(start_date, end_date))))
+
+    if doctor_id is not None:
+        stmt = stmt.where(Appointment.user_id == doctor_id)
+
+    if contingency_type is not None:
+        stmt = stmt.where(Appointment.contingency_type == contingency_type)
+
+    stmt = stmt.order_by(asc(Appointment.rest_from), asc(Appointment.id)).offset(skip).limit(limit)
+
+    return [dict(row) for row in db.execute(stmt).mappings()]
+
+
+def get_leave_statistics(
+        db: Session,
+        start_date: date,
+        end_date: date,
+        group_by: str = "contingency_type",
+        doctor_id: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Certificados de reposo y días de reposo dentro del rango, agrupados.
+    Los días se recortan al rango consultado (intersección de rangos).
+    """
+    window = _window(start_date, end_date)
+    overlap = Appointment.rest_period.op("*")(window)
+    leave_days = func.sum(func.upper(overlap) - func.lower(overlap))
+    group_column = LEAVE_GROUP_COLUMNS[group_by].label(group_by)
+
+    stmt = (select(
+        group_column,
+        func.count().label("certificates"),
+        func.count(func.distinct(Appointment.patient_id)).label("patients"),
+        leave_days.label("leave_days"),
+        func.sum(func.upper(Appointment.rest_period) - func.lower(Appointment.rest_period)).label("issued_days")
+    )
+            .where(Appointment.rest_period.op("&&")(window)))
+
+    if doctor_id is not None:
+        stmt = stmt.where(Appointment.user_id == doctor_id)
+
+    stmt = stmt.group_by(LEAVE_GROUP_COLUMNS[group_by]).order_by(desc("leave_days"))
+    rows = [dict(row) for row in db.execute(stmt).mappings()]
+
+    if group_by == "doctor" and rows:
+        doctors = {user.id: f"{user.first_name} {user.last_name}" for user in db.execute(
+            select(AuthUser.id, AuthUser.first_name, AuthUser.last_name)
+            .where(AuthUser.id.in_([row["doctor"] for row in rows]))
+        )}
+        for row in rows:
+            row["doctor_name"] = doctors.get(row["doctor"])
+
+    return rows
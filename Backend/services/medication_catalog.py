@@ -0,0 +1,228 @@
+# medication_catalog.py - Catálogo de medicamentos aprendido de las recetas, con autocompletado
+import logging
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from typing import Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import select, delete
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from models.Appointment import Appointment
+from models.Medication import MedicationUsage
+from models.Recipe import Recipe
+
+logger = logging.getLogger(__name__)
+
+# Recarga como máximo cada MIN_REFRESH_SECONDS tras un cambio, y siempre pasados REFRESH_TTL_SECONDS
+MIN_REFRESH_SECONDS = 30
+REFRESH_TTL_SECONDS = 600
+SUGGESTIONS_PER_FIELD = 5
+
+_KINDS = {"name": 100, "amount": 100, "instructions": 500}
+
+
+def _clean(value: Optional[str], max_length: int) -> str:
+    return " ".join((value or "").split())[:max_length]
+
+
+def normalize_medicine(name: Optional[str]) -> str:
+    """'Amoxicilina  500mg', 'amoxicilina 500MG' y 'Amoxicilína 500 mg.' comparten clave"""
+    value = unicodedata.normalize("NFKD", (name or "").lower())
+    value = "".join(char for char in value if not unicodedata.combining(char))
+    return " ".join(value.replace(".", " ").replace(",", " ").split())[:100]
+
+
+def medication_usage_keys(recipes: Iterable) -> Counter:
+    """Aporte de unas recetas al catálogo: (clave, tipo, valor) -> cantidad"""
+    keys = Counter()
+    for recipe in recipes:
+        medicine_key = normalize_medicine(recipe.medicine)
+        if not medicine_key:
+            continue
+        for kind, value in (("name", recipe.medicine), ("amount", recipe.amount),
+                            ("instructions", recipe.instructions)):
+            value = _clean(value, _KINDS[kind])
+            if value:
+                keys[(medicine_key, kind, value)] += 1
+    return keys
+
+
+def appointment_medication_keys(appointment: Appointment) -> Counter:
+    """Aporte actual de una cita cargada, con sus recetas"""
+    return medication_usage_keys(appointment.recipes)
+
+
+def patient_medication_keys(db: Session, patient_id: int) -> Counter:
+    """Aporte de todas las recetas de un paciente (antes de eliminarlo)"""
+    rows = db.execute(
+        select(Recipe.medicine, Recipe.amount, Recipe.instructions)
+        .join(Appointment, Appointment.id == Recipe.appointment_id)
+        .where(Appointment.patient_id == patient_id)
+    ).all()
+    return medication_usage_keys(rows)
+
+
+def apply_medication_usage_delta(db: Session, before: Counter, after: Counter):
+    """
+    Aplicar la diferencia entre las recetas anteriores y las nuevas.
+    Se ejecuta en la misma transacción que la escritura de la cita.
+    """
+    delta = Counter(after)
+    delta.subtract(before)
+    changes = [(key, amount) for key, amount in delta.items() if amount]
+    if not changes:
+        return
+
+    stmt = insert(MedicationUsage).values([
+        {"medicine_key": medicine_key, "kind": kind, "value": value, "usage_count": amount}
+        for (medicine_key, kind, value), amount in changes
+    ])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[MedicationUsage.medicine_key, MedicationUsage.kind, MedicationUsage.value],
+        set_={"usage_count": MedicationUsage.usage_count + stmt.excluded.usage_count}
+    ))
+
+    if any(amount < 0 for _, amount in changes):
+        db.execute(delete(MedicationUsage).where(
+            MedicationUsage.medicine_key.in_({medicine_key for (medicine_key, _, _), _ in changes}),
+            MedicationUsage.usage_count <= 0
+        ))
+
+
+def rebuild_medication_usage(db: Session, batch_size: int = 5000) -> int:
+    """Recalcular el catálogo desde todas las recetas (lectura por lotes de ID)"""
+    totals = Counter()
+    last_id = 0
+    while True:
+        rows = db.execute(
+            select(Recipe.id, Recipe.medicine, Recipe.amount, Recipe.instructions)
+            .where(Recipe.id > last_id)
+            .order_by(Recipe.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        totals.update(medication_usage_keys(rows))
+        last_id = rows[-1].id
+
+    db.execute(delete(MedicationUsage))
+    if totals:
+        db.execute(insert(MedicationUsage), [
+            {"medicine_key": medicine_key, "kind": kind, "value": value, "usage_count": amount}
+            for (medicine_key, kind, value), amount in totals.items()
+        ])
+    db.commit()
+    medication_catalog.mark_stale()
+    logger.info(f"Catálogo de medicamentos recalculado: {len(totals)} filas")
+    return len(totals)
+
+
+def _prefix_range(keys: List[str], prefix: str) -> range:
+    start = bisect_left(keys, prefix)
+    end = bisect_left(keys, prefix + "\uffff", lo=start)
+    return range(start, end)
+
+
+class MedicationCatalog:
+    """Catálogo inmutable: claves ordenadas (prefijo por búsqueda binaria) y sugerencias precalculadas"""
+
+    def __init__(self, rows: Iterable):
+        usage: Dict[str, Dict[str, Counter]] = defaultdict(lambda: defaultdict(Counter))
+        for row in rows:
+            usage[row.medicine_key][row.kind][row.value] += row.usage_count
+
+        self._keys = sorted(usage)
+        self._entries = []
+        for medicine_key in self._keys:
+            names = usage[medicine_key]["name"]
+            self._entries.append({
+                "name": names.most_common(1)[0][0] if names else medicine_key,
+                "count": sum(names.values()),
+                "amounts": [{"value": value, "count": count}
+                            for value, count in usage[medicine_key]["amount"].most_common(SUGGESTIONS_PER_FIELD)],
+                "instructions": [{"value": value, "count": count}
+                                 for value, count in
+                                 usage[medicine_key]["instructions"].most_common(SUGGESTIONS_PER_FIELD)],
+            })
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def autocomplete(self, query: str, limit: int = 10) -> List[dict]:
+        """Medicamentos cuyo nombre empieza con el texto escrito, los más recetados primero"""
+        prefix = normalize_medicine(query)
+        if not prefix:
+            return []
+        matches = [self._entries[position] for position in _prefix_range(self._keys, prefix)]
+        return sorted(matches, key=lambda entry: -entry["count"])[:limit]
+
+
+class MedicationCatalogStore:
+    """
+    Mantiene el catálogo en memoria. La primera consulta lo carga; después se sirve
+    siempre el catálogo actual y, si hubo cambios o venció el TTL, se recarga en un
+    hilo de fondo (una recarga a la vez) sin bloquear las búsquedas.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._catalog: Optional[MedicationCatalog] = None
+        self._loaded_at = 0.0
+        self._generation = 0
+        self._loaded_generation = 0
+        self._refreshing = False
+
+    def mark_stale(self):
+        """Se llama después del commit de una escritura que cambió recetas"""
+        with self._lock:
+            self._generation += 1
+
+    def _load(self, session_factory: Callable[[], Session]):
+        with self._lock:
+            generation = self._generation
+        db = session_factory()
+        try:
+            catalog = MedicationCatalog(db.execute(
+                select(MedicationUsage.medicine_key, MedicationUsage.kind, MedicationUsage.value,
+                       MedicationUsage.usage_count)
+            ).all())
+        finally:
+            db.close()
+        with self._lock:
+            self._catalog = catalog
+            self._loaded_at = time.monotonic()
+            self._loaded_generation = generation
+        logger.info(f"Catálogo de medicamentos cargado: {len(catalog)} medicamentos")
+
+    def _refresh_in_background(self, session_factory: Callable[[], Session]):
+        try:
+            self._load(session_factory)
+        except Exception as e:
+            logger.error(f"Error al recargar el catálogo de medicamentos: {e}")
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def get(self, session_factory: Callable[[], Session]) -> MedicationCatalog:
+        if self._catalog is None:
+            self._load(session_factory)
+
+        with self._lock:
+            age = time.monotonic() - self._loaded_at
+            stale = (self._generation != self._loaded_generation and age >= MIN_REFRESH_SECONDS) \
+                or age >= REFRESH_TTL_SECONDS
+            start = stale and not self._refreshing
+            if start:
+                self._refreshing = True
+            catalog = self._catalog
+
+        if start:
+            threading.Thread(target=self._refresh_in_background, args=(session_factory,), daemon=True).start()
+        return catalog
+
+
+medication_catalog = MedicationCatalogStore()
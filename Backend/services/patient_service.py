@@ -3,13 +3,21 @@ from fastapi import HTTPException
 from pydantic import ValidationError
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_
-from typing import List, Optional
+from sqlalchemy import or_, and_, select
+from typing import List, Optional, Dict, Any
 import logging
+from collections import Counter
 
 from models.Patient import Patient
 from models.Contact import Contact
 from schemas.patient import PatientCreate, PatientUpdate, PatientResponse, ContactResponse, PatientManage
+from services.agenda_cache import today_agenda_cache
+from services.pdf_cache import report_pdf_cache
+from services.concurrency import claim_version
+from services.diagnosis_stats_service import patient_stat_keys, apply_diagnosis_stats_delta
+from services.workload_service import refresh_doctor_workload
+from services.medication_catalog import patient_medication_keys, apply_medication_usage_delta, medication_catalog
+from models.Appointment import Appointment
 
 logger = logging.getLogger(__name__)
 
@@ -81,6 +89,42 @@ def get_patients(db: Session, skip: int = 0, limit: int = 100) -> List[PatientRe
         )
 
 
+# READ - Get all patients (filas SQL para la serialización rápida)
+def list_patient_rows(db: Session, skip: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+    """Listado de pacientes con la forma de PatientResponse, armado desde filas SQL sin objetos ORM"""
+    try:
+        patient_columns = [Patient.__table__.c[name] for name in PatientResponse.model_fields
+                           if name in Patient.__table__.c]
+        contact_columns = [Contact.__table__.c[name] for name in ContactResponse.model_fields
+                           if name in Contact.__table__.c]
+
+        patients = [dict(row) for row in db.execute(
+            select(*patient_columns).order_by(Patient.id).offset(skip).limit(limit)
+        ).mappings()]
+
+        contacts_by_patient = {patient["id"]: [] for patient in patients}
+        if contacts_by_patient:
+            contacts = db.execute(
+                select(Contact.patient_id, *contact_columns)
+                .where(Contact.patient_id.in_(list(contacts_by_patient)))
+                .order_by(Contact.id)
+            ).mappings()
+            for contact in contacts:
+                contact = dict(contact)
+                contacts_by_patient[contact.pop("patient_id")].append(contact)
+
+        for patient in patients:
+            patient["contacts"] = contacts_by_patient[patient["id"]]
+
+        return patients
+    except Exception as e:
+        logger.error(f"Error al obtener pacientes: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail="Error al obtener la lista de pacientes"
+        )
+
+
 # READ - Get patient by ID
 def get_patient(db: Session, patient_id: int) -> PatientResponse:
     """Obtener un paciente por su ID"""
@@ -202,8 +246,11 @@ def update_patient(db: Session, patient_id: int, patient_update: PatientUpdate)
                 detail=f"Paciente con ID {patient_id} no encontrado"
             )
 
+        # Verificar e incrementar la versión antes de modificar (409 si otro usuario guardó antes)
+        claim_version(db, Patient, patient_id, patient_update.version, "El paciente")
+
         # DEBUG: Ver qué datos están llegando
-        update_data = patient_update.model_dump(exclude_unset=True, exclude={"contacts"})
+        update_data = patient_update.model_dump(exclude_unset=True, exclude={"contacts", "version"})
         print(f"🔍 Datos a actualizar: {update_data}")
         print(f"🔍 Document ID actual: {db_patient.document_id}")
         print(f"🔍 Document ID nuevo: {update_data.get('document_id', 'NO ENVIADO')}")
@@ -317,6 +364,9 @@ def update_patient(db: Session, patient_id: int, patient_update: PatientUpdate)
 
         db.commit()
         db.refresh(db_patient)
+        # La agenda del día cacheada incluye nombre y cédula del paciente
+        today_agenda_cache.clear()
+        report_pdf_cache.invalidate_patient(patient_id)
 
         return PatientResponse.model_validate(db_patient, from_attributes=True)
 
@@ -362,8 +412,11 @@ def manage_patient(db: Session, patient_id: int, patient_update: PatientManage)
                 detail="El campo de antecedentes médicos es obligatorio"
             )
 
+        # Verificar e incrementar la versión antes de modificar (409 si otro usuario guardó antes)
+        claim_version(db, Patient, patient_id, patient_update.version, "El paciente")
+
         # DEBUG: Ver qué datos están llegando
-        update_data = patient_update.model_dump(exclude_unset=True, exclude={"contacts"})
+        update_data = patient_update.model_dump(exclude_unset=True, exclude={"contacts", "version"})
         print(f"🔍 Datos a actualizar: {update_data}")
         print(f"🔍 Document ID actual: {db_patient.document_id}")
         print(f"🔍 Document ID nuevo: {update_data.get('document_id', 'NO ENVIADO')}")
@@ -477,6 +530,9 @@ def manage_patient(db: Session, patient_id: int, patient_update: PatientManage)
 
         db.commit()
         db.refresh(db_patient)
+        # La agenda del día cacheada incluye nombre y cédula del paciente
+        today_agenda_cache.clear()
+        report_pdf_cache.invalidate_patient(patient_id)
 
         return PatientResponse.model_validate(db_patient, from_attributes=True)
 
@@ -532,8 +588,17 @@ def delete_patient(db: Session, patient_id: int) -> dict:
         # db_patient.deleted_at = datetime.utcnow()
 
         # Para hard delete (eliminar permanentemente):
+        apply_diagnosis_stats_delta(db, patient_stat_keys(db, patient_id), Counter())
+        apply_medication_usage_delta(db, patient_medication_keys(db, patient_id), Counter())
+        workload_days = db.query(Appointment.user_id, Appointment.appointment_date).filter(
+            Appointment.patient_id == patient_id
+        ).distinct().all()
         db.delete(db_patient)
+        refresh_doctor_workload(db, [(user_id, day) for user_id, day in workload_days])
         db.commit()
+        today_agenda_cache.clear()
+        report_pdf_cache.invalidate_patient(patient_id)
+        medication_catalog.mark_stale()
 
         return {"message": f"Paciente con ID {patient_id} eliminado exitosamente"}
 
@@ -0,0 +1,272 @@
+# pdf_cache.py - Almacenamiento administrado de los PDF generados
+#
+# La clave es (tipo de reporte, ID, versión del contenido): si los datos cambian, la
+# versión cambia y la entrada vieja ya no se encuentra. Además las escrituras de citas y
+# pacientes borran las entradas del paciente para liberar espacio enseguida.
+# Nombres: p{patient_id}_{motor}_{report_type}_{entity_id}_{sha256 de la versión}.pdf
+#
+# Dos niveles, cada uno con su cuota y desalojo LRU:
+#   - memoria, para los PDF pequeños (certificados, recetas),
+#   - directorio en tmpfs (/dev/shm si existe) para el resto.
+# Un hilo barre cada REPORT_CACHE_SWEEP_SECONDS lo que lleva más de REPORT_CACHE_TTL_HOURS
+# sin usarse, y también los PDF viejos que quedaron en OUTPUT_DIR de versiones anteriores.
+import hashlib
+import io
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from typing import BinaryIO, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_TMPFS = "/dev/shm"
+REPORT_CACHE_DIR = os.getenv("REPORT_CACHE_DIR", os.path.join(_TMPFS, "fenix_reports")
+                             if os.path.isdir(_TMPFS) else "reports/cache")
+REPORT_CACHE_MAX_MB = int(os.getenv("REPORT_CACHE_MAX_MB", "256"))
+REPORT_CACHE_MEMORY_MB = int(os.getenv("REPORT_CACHE_MEMORY_MB", "32"))
+REPORT_CACHE_MEMORY_FILE_KB = int(os.getenv("REPORT_CACHE_MEMORY_FILE_KB", "128"))
+REPORT_CACHE_TTL_HOURS = float(os.getenv("REPORT_CACHE_TTL_HOURS", "24"))
+REPORT_CACHE_SWEEP_SECONDS = int(os.getenv("REPORT_CACHE_SWEEP_SECONDS", "300"))
+# Directorio donde la versión anterior dejaba los PDF sin borrarlos nunca
+LEGACY_OUTPUT_DIR = os.getenv("OUTPUT_DIR", "reports/output")
+
+
+class PdfCache:
+    """
+    Índice LRU en memoria sobre los dos niveles. Si varios procesos comparten el
+    directorio, cada uno lleva su propio índice: un archivo borrado por otro proceso
+    simplemente cuenta como fallo.
+    """
+
+    def __init__(self, directory: str = REPORT_CACHE_DIR, max_bytes: int = REPORT_CACHE_MAX_MB * 1024 * 1024,
+                 memory_bytes: int = REPORT_CACHE_MEMORY_MB * 1024 * 1024,
+                 memory_file_bytes: int = REPORT_CACHE_MEMORY_FILE_KB * 1024,
+                 ttl_seconds: float = REPORT_CACHE_TTL_HOURS * 3600,
+                 sweep_seconds: int = REPORT_CACHE_SWEEP_SECONDS, legacy_directory: Optional[str] = LEGACY_OUTPUT_DIR):
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self.memory_file_bytes = memory_file_bytes
+        self.ttl_seconds = ttl_seconds
+        self.sweep_seconds = sweep_seconds
+        self.legacy_directory = os.path.abspath(legacy_directory) if legacy_directory else None
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()  # nombre -> (PDF, último uso)
+        self._files: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()  # nombre -> (tamaño, último uso)
+        self._memory_held = 0
+        self._file_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._write_errors = 0
+        self._loaded = False
+        self._sweeper: Optional[threading.Thread] = None
+
+    def _load(self):
+        """Retomar lo que quedó en disco, del uso más antiguo al más reciente, y arrancar el barrido"""
+        os.makedirs(self.directory, exist_ok=True)
+        # En tmpfs la cuota no puede pasar de la mitad del espacio (en Docker /dev/shm es chico)
+        self.max_bytes = min(self.max_bytes, shutil.disk_usage(self.directory).total // 2)
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".pdf") and entry.is_file():
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name, stat.st_size))
+        for used, name, size in sorted(files):
+            self._files[name] = (size, used)
+            self._file_bytes += size
+        self._loaded = True
+        self._evict()
+
+        self._sweeper = threading.Thread(target=self._sweep_forever, name="pdf-cache-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def _ensure_loaded(self):
+        # Se llama con el candado tomado
+        if not self._loaded:
+            self._load()
+
+    @staticmethod
+    def file_name(patient_id: int, report_type: str, entity_id: int, version: str) -> str:
+        digest = hashlib.sha256(version.encode("utf-8")).hexdigest()[:32]
+        return f"p{patient_id}_{report_type}_{entity_id}_{digest}.pdf"
+
+    def open(self, name: str) -> Optional[BinaryIO]:
+        """
+        PDF para leerlo por partes. Si un archivo se desaloja mientras se envía, el
+        descriptor abierto sigue siendo válido hasta cerrarlo.
+        """
+        now = time.time()
+        with self._lock:
+            self._ensure_loaded()
+            if name in self._memory:
+                data = self._memory.pop(name)[0]
+                self._memory[name] = (data, now)
+                self._hits += 1
+                return io.BytesIO(data)
+            known = name in self._files
+            if known:
+                self._files.move_to_end(name)
+
+        path = os.path.join(self.directory, name)
+        try:
+            pdf = open(path, "rb")
+            os.utime(path)  # El orden LRU y el TTL sobreviven a un reinicio
+        except FileNotFoundError:
+            with self._lock:
+                self._misses += 1
+                if known and name in self._files:
+                    self._file_bytes -= self._files.pop(name)[0]
+            return None
+
+        with self._lock:
+            self._hits += 1
+            size = os.fstat(pdf.fileno()).st_size
+            if name in self._files:
+                self._files[name] = (size, now)
+            else:
+                # Lo escribió otro proceso
+                self._files[name] = (size, now)
+                self._file_bytes += size
+                self._evict()
+        return pdf
+
+    def get(self, name: str) -> Optional[bytes]:
+        pdf = self.open(name)
+        if pdf is None:
+            return None
+        with pdf:
+            return pdf.read()
+
+    def put(self, name: str, data: bytes):
+        now = time.time()
+        if len(data) <= self.memory_file_bytes:
+            with self._lock:
+                self._ensure_loaded()
+                if name in self._memory:
+                    self._memory_held -= len(self._memory.pop(name)[0])
+                self._memory[name] = (data, now)
+                self._memory_held += len(data)
+                self._evict()
+            return
+
+        path = os.path.join(self.directory, name)
+        with self._lock:
+            self._ensure_loaded()
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temporary, "wb") as pdf:
+                pdf.write(data)
+            os.replace(temporary, path)
+        except OSError as e:
+            # tmpfs lleno u otro problema de disco: se sigue sin guardar este PDF
+            logger.warning(f"No se pudo guardar {name} en la caché de reportes: {e}")
+            self._remove_path(temporary)
+            with self._lock:
+                self._write_errors += 1
+            return
+        with self._lock:
+            if name in self._files:
+                self._file_bytes -= self._files.pop(name)[0]
+            self._files[name] = (len(data), now)
+            self._file_bytes += len(data)
+            self._evict()
+
+    def invalidate_patient(self, patient_id: int):
+        """Borrar todos los PDF de un paciente (historial, certificados y recetas)"""
+        prefix = f"p{patient_id}_"
+        with self._lock:
+            self._ensure_loaded()
+            for name in [name for name in self._memory if name.startswith(prefix)]:
+                self._memory_held -= len(self._memory.pop(name)[0])
+            names = [name for name in self._files if name.startswith(prefix)]
+            for name in names:
+                self._file_bytes -= self._files.pop(name)[0]
+        for name in names:
+            self._remove_path(os.path.join(self.directory, name))
+
+    def _evict(self):
+        # Se llama con el candado tomado
+        while self._memory_held > self.memory_bytes and self._memory:
+            _, (data, _) = self._memory.popitem(last=False)
+            self._memory_held -= len(data)
+            self._evictions += 1
+        while self._file_bytes > self.max_bytes and self._files:
+            name, (size, _) = self._files.popitem(last=False)
+            self._file_bytes -= size
+            self._evictions += 1
+            self._remove_path(os.path.join(self.directory, name))
+
+    def sweep(self) -> int:
+        """Eliminar lo que lleva más de ttl_seconds sin usarse. Devuelve cuántos PDF se borraron"""
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            self._ensure_loaded()
+            expired_memory = [name for name, (_, used) in self._memory.items() if used < cutoff]
+            for name in expired_memory:
+                self._memory_held -= len(self._memory.pop(name)[0])
+            expired_files = [name for name, (_, used) in self._files.items() if used < cutoff]
+            for name in expired_files:
+                self._file_bytes -= self._files.pop(name)[0]
+            self._expirations += len(expired_memory) + len(expired_files)
+        for name in expired_files:
+            self._remove_path(os.path.join(self.directory, name))
+
+        legacy = 0
+        if self.legacy_directory and os.path.isdir(self.legacy_directory):
+            for entry in os.scandir(self.legacy_directory):
+                if entry.name.endswith(".pdf") and entry.is_file() and entry.stat().st_mtime < cutoff:
+                    self._remove_path(entry.path)
+                    legacy += 1
+        return len(expired_memory) + len(expired_files) + legacy
+
+    def _sweep_forever(self):
+        while True:
+            time.sleep(self.sweep_seconds)
+            try:
+                removed = self.sweep()
+                if removed:
+                    logger.info(f"Caché de reportes: {removed} PDF vencidos eliminados")
+            except Exception:
+                logger.exception("Error barriendo la caché de reportes")
+
+    @staticmethod
+    def _remove_path(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"No se pudo eliminar {path}: {e}")
+
+    @staticmethod
+    def _engine(name: str) -> str:
+        # p{patient_id}_{motor}_...
+        parts = name.split("_", 2)
+        return parts[1] if len(parts) == 3 else "desconocido"
+
+    def stats(self) -> dict:
+        with self._lock:
+            engines = {}
+            for name in list(self._memory) + list(self._files):
+                engine = self._engine(name)
+                engines[engine] = engines.get(engine, 0) + 1
+            return {
+                "memory": {"files": len(self._memory), "bytes": self._memory_held, "max_bytes": self.memory_bytes},
+                "disk": {"directory": self.directory, "files": len(self._files), "bytes": self._file_bytes,
+                         "max_bytes": self.max_bytes},
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "write_errors": self._write_errors,
+                "files_by_engine": engines,
+                "ttl_seconds": self.ttl_seconds
+            }
+
+
+report_pdf_cache = PdfCache()
@@ -0,0 +1,203 @@
+# report_batch.py - Certificados médicos por lote en un ZIP que se envía mientras se genera
+#
+# Los datos se cargan de a LOAD_CHUNK citas (dos consultas por bloque), los PDF se generan
+# con el mismo motor que el certificado individual (el pool de Jasper, o ReportLab en un
+# pool de procesos compartido) y cada uno se escribe en el ZIP en cuanto está listo,
+# en el orden de las citas. En memoria solo hay un bloque de datos y a lo sumo
+# 2 * REPORT_BATCH_WORKERS PDF pendientes. Un certificado que tarda más de
+# REPORT_BATCH_TIMEOUT se anota en errores.txt y el pool se recicla (un proceso colgado
+# no termina solo).
+import logging
+import multiprocessing
+import os
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date
+from typing import Iterator, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import exists, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from models.Appointment import Appointment, AppointmentDiagnosis
+from services.jasper_pool import JasperPool
+from services.report_data import load_certificates
+from services.report_service import JASPER_REPORTS
+from services.report_pdf import render_certificate
+
+logger = logging.getLogger(__name__)
+
+REPORT_BATCH_WORKERS = int(os.getenv("REPORT_BATCH_WORKERS", "2"))
+REPORT_BATCH_MAX = int(os.getenv("REPORT_BATCH_MAX", "5000"))
+REPORT_BATCH_TIMEOUT = float(os.getenv("REPORT_BATCH_TIMEOUT", "120"))
+LOAD_CHUNK = 100
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _render_pool() -> ProcessPoolExecutor:
+    """Pool compartido entre lotes: los procesos quedan con ReportLab ya importado"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(REPORT_BATCH_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+
+def _discard_pool(executor: ProcessPoolExecutor, terminate: bool = False) -> bool:
+    """
+    Descartar el pool si sigue siendo el compartido; con terminate también se matan sus
+    procesos. Devuelve False si otro lote ya lo había reemplazado.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is not executor:
+            return False
+        _executor = None
+    # shutdown no detiene un proceso colgado y ProcessPoolExecutor no expone otra forma de hacerlo
+    processes = list((executor._processes or {}).values()) if terminate else []
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+    return True
+
+
+def certificate_batch_ids(db: Session, start_date: date, end_date: date, doctor_id: Optional[int] = None,
+                          contingency_type: Optional[str] = None) -> List[int]:
+    """IDs de las citas del rango que tienen diagnóstico principal (las que llevan certificado)"""
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="La fecha final debe ser posterior a la inicial")
+
+    query = (
+        select(Appointment.id)
+        .where(Appointment.appointment_date.between(start_date, end_date),
+               exists().where(AppointmentDiagnosis.appointment_id == Appointment.id,
+                              AppointmentDiagnosis.diagnosis_type == "primary"))
+        .order_by(Appointment.appointment_date, Appointment.id)
+        .limit(REPORT_BATCH_MAX + 1)
+    )
+    if doctor_id is not None:
+        query = query.where(Appointment.user_id == doctor_id)
+    if contingency_type:
+        query = query.where(Appointment.contingency_type == contingency_type)
+
+    appointment_ids = db.scalars(query).all()
+    if len(appointment_ids) > REPORT_BATCH_MAX:
+        raise HTTPException(
+            status_code=400,
+            detail=f"El lote supera los {REPORT_BATCH_MAX} certificados; acote el rango de fechas"
+        )
+    if not appointment_ids:
+        raise HTTPException(status_code=404, detail="No hay certificados para los filtros indicados")
+    return appointment_ids
+
+
+class _ZipStream:
+    """Destino no buscable para zipfile: guarda lo escrito hasta que el generador lo entrega"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _entry_name(certificate: dict) -> str:
+    return f"certificado_{certificate['appointment_date'].isoformat()}_{certificate['id']}.pdf"
+
+
+def stream_certificates_zip(session_factory: sessionmaker, appointment_ids: List[int],
+                            jasper: Optional[JasperPool] = None) -> Iterator[bytes]:
+    """
+    Generar el ZIP por partes, con jasper si se indica o con ReportLab. Usa sus propias
+    sesiones porque se ejecuta después de que la ruta ya respondió. Un certificado que
+    falla o vence se anota en errores.txt.
+    """
+    if jasper is None:
+        pool = _render_pool()
+        window_size = 2 * REPORT_BATCH_WORKERS
+    else:
+        # El pool de Jasper ya genera en sus procesos: aquí solo hacen falta hilos que esperen
+        template, parameter, rows = JASPER_REPORTS["medical_certificate"]
+        pool = ThreadPoolExecutor(jasper.workers, thread_name_prefix="jasper-batch")
+        window_size = 2 * jasper.workers
+    pending = deque()  # [nombre, datos, future]
+    failures = []
+    output = _ZipStream()
+
+    def submit(certificate: dict):
+        if jasper is None:
+            return pool.submit(render_certificate, certificate)
+        return pool.submit(jasper.render, template, {parameter: certificate["id"]}, rows(certificate))
+
+    def resubmit():
+        # Lo pendiente se pierde con el pool descartado: se vuelve a enviar al nuevo
+        nonlocal pool
+        pool = _render_pool()
+        for entry in pending:
+            entry[2].cancel()
+            entry[2] = submit(entry[1])
+
+    def write_ready(keep: int):
+        while len(pending) > keep:
+            name, _, future = pending[0]
+            try:
+                data = future.result(timeout=REPORT_BATCH_TIMEOUT)
+            except TimeoutError:
+                pending.popleft()
+                logger.error(f"❌ Tiempo agotado generando {name}")
+                failures.append(f"{name}: tiempo de generación agotado ({REPORT_BATCH_TIMEOUT:g} s)")
+                if jasper is None:
+                    _discard_pool(pool, terminate=True)
+                    resubmit()
+                # Con Jasper el hilo queda esperando hasta JASPER_TIMEOUT, con el cupo del pool tomado
+                continue
+            except BrokenProcessPool:
+                if _discard_pool(pool):
+                    # Murió un proceso de este pool: se corta la descarga
+                    raise
+                # Otro lote recicló el pool por un certificado colgado
+                resubmit()
+                continue
+            except Exception as e:
+                pending.popleft()
+                logger.error(f"❌ Error generando {name}: {e}")
+                failures.append(f"{name}: {e}")
+                continue
+            pending.popleft()
+            archive.writestr(name, data)
+
+    try:
+        with zipfile.ZipFile(output, "w", compression=zipfile.ZIP_STORED) as archive:
+            for start in range(0, len(appointment_ids), LOAD_CHUNK):
+                with session_factory() as db:
+                    certificates = load_certificates(db, appointment_ids[start:start + LOAD_CHUNK])
+                for certificate in certificates:
+                    pending.append([_entry_name(certificate), certificate, submit(certificate)])
+                    write_ready(window_size - 1)
+                    data = output.drain()
+                    if data:
+                        yield data
+            write_ready(0)
+            if failures:
+                archive.writestr("errores.txt", "\n".join(failures))
+        yield output.drain()
+    finally:
+        # Cliente desconectado: no seguir generando lo que ya no se va a enviar
+        for _, _, future in pending:
+            future.cancel()
+        if jasper is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,190 @@
+# report_data.py - Datos de los reportes PDF leídos con la sesión SQLAlchemy (pool compartido)
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models.Appointment import Appointment, AppointmentDiagnosis
+from models.Contact import Contact
+from models.Patient import Patient
+from models.Recipe import Recipe
+from models.User import AuthUser
+
+PATIENT_COLUMNS = (Patient.id, Patient.first_name, Patient.last_name, Patient.document_id, Patient.birth_date,
+                   Patient.gender, Patient.enterprise, Patient.work_activity, Patient.street,
+                   Patient.neighborhood, Patient.city, Patient.telephone)
+
+DOCTOR_COLUMNS = (AuthUser.first_name.label("doctor_first_name"), AuthUser.last_name.label("doctor_last_name"),
+                  AuthUser.cedula.label("doctor_cedula"))
+
+DIAGNOSIS_COLUMNS = (AppointmentDiagnosis.appointment_id, AppointmentDiagnosis.diagnosis_code,
+                     AppointmentDiagnosis.diagnosis_description, AppointmentDiagnosis.diagnosis_type,
+                     AppointmentDiagnosis.diagnosis_observations)
+
+RECIPE_COLUMNS = (Recipe.appointment_id, Recipe.medicine, Recipe.amount, Recipe.instructions, Recipe.lunchTime,
+                  Recipe.observations)
+
+
+def _children(db: Session, columns, model, appointment_ids: List[int]) -> Dict[int, List[dict]]:
+    """Filas hijas de varias citas en una sola consulta, agrupadas por cita"""
+    grouped = {appointment_id: [] for appointment_id in appointment_ids}
+    if appointment_ids:
+        rows = db.execute(select(*columns).where(model.appointment_id.in_(appointment_ids)).order_by(model.id))
+        for row in rows.mappings():
+            grouped[row["appointment_id"]].append(dict(row))
+    return grouped
+
+
+def load_medical_record(db: Session, patient_id: int) -> Dict[str, Any]:
+    """
+    Historial médico: paciente, citas (con médico) de la más reciente a la más antigua,
+    diagnósticos y recetas. Cuatro consultas sin importar el número de citas.
+    """
+    patient = db.execute(select(*PATIENT_COLUMNS).where(Patient.id == patient_id)).mappings().first()
+
+    appointments = [dict(row) for row in db.execute(
+        select(Appointment.id, Appointment.appointment_date, Appointment.appointment_time,
+               Appointment.current_illness, Appointment.physical_examination, Appointment.observations,
+               Appointment.laboratory_tests, Appointment.temperature, Appointment.blood_pressure,
+               Appointment.heart_rate, Appointment.oxygen_saturation, Appointment.weight, Appointment.weight_unit,
+               Appointment.height, Appointment.medical_preinscription, *DOCTOR_COLUMNS)
+        .outerjoin(AuthUser, AuthUser.id == Appointment.user_id)
+        .where(Appointment.patient_id == patient_id)
+        .order_by(Appointment.appointment_date.desc(), Appointment.appointment_time.desc())
+    ).mappings()] if patient else []
+
+    if not appointments:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Paciente {patient_id} no encontrado o no tiene citas registradas"
+        )
+
+    appointment_ids = [appointment["id"] for appointment in appointments]
+    diagnoses = _children(db, DIAGNOSIS_COLUMNS, AppointmentDiagnosis, appointment_ids)
+    recipes = _children(db, RECIPE_COLUMNS, Recipe, appointment_ids)
+    for appointment in appointments:
+        appointment["diagnoses"] = diagnoses[appointment["id"]]
+        appointment["recipes"] = recipes[appointment["id"]]
+
+    return {"patient": dict(patient), "appointments": appointments}
+
+
+def _load_appointments(db: Session, appointment_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    """Citas con paciente, representante y médico en una sola consulta"""
+    contact_columns = (Contact.first_name.label("contact_first_name"), Contact.last_name.label("contact_last_name"),
+                       Contact.document_id.label("contact_document_id"), Contact.relationship_type)
+    rows = db.execute(
+        select(Appointment.id, Appointment.appointment_date, Appointment.appointment_time,
+               Appointment.current_illness, Appointment.physical_examination, Appointment.observations,
+               Appointment.laboratory_tests, Appointment.rest_from, Appointment.rest_to,
+               Appointment.sabbath_days, Appointment.has_representative, Appointment.representative_id,
+               Appointment.contingency_type, Appointment.medical_preinscription, *DOCTOR_COLUMNS, *contact_columns,
+               *[column.label(f"patient_{column.key}") for column in PATIENT_COLUMNS])
+        .join(Patient, Patient.id == Appointment.patient_id)
+        .outerjoin(AuthUser, AuthUser.id == Appointment.user_id)
+        .outerjoin(Contact, Contact.id == Appointment.representative_id)
+        .where(Appointment.id.in_(appointment_ids))
+    ).mappings()
+
+    appointments = {}
+    for row in rows:
+        appointment, patient = {}, {}
+        for key, value in row.items():
+            if key.startswith("patient_"):
+                patient[key[len("patient_"):]] = value
+            else:
+                appointment[key] = value
+        appointment["patient"] = patient
+        appointments[appointment["id"]] = appointment
+    return appointments
+
+
+def _load_appointment(db: Session, appointment_id: int) -> Optional[Dict[str, Any]]:
+    return _load_appointments(db, [appointment_id]).get(appointment_id)
+
+
+def _primary_diagnoses(db: Session, appointment_ids: List[int]) -> Dict[int, List[dict]]:
+    grouped = {appointment_id: [] for appointment_id in appointment_ids}
+    if appointment_ids:
+        rows = db.execute(
+            select(*DIAGNOSIS_COLUMNS)
+            .where(AppointmentDiagnosis.appointment_id.in_(appointment_ids),
+                   AppointmentDiagnosis.diagnosis_type == "primary")
+            .order_by(AppointmentDiagnosis.id)
+        ).mappings()
+        for row in rows:
+            grouped[row["appointment_id"]].append(dict(row))
+    return grouped
+
+
+def load_certificates(db: Session, appointment_ids: List[int]) -> List[Dict[str, Any]]:
+    """
+    Certificados de varias citas en dos consultas, en el orden de appointment_ids.
+    Se omiten las citas inexistentes o sin diagnóstico principal.
+    """
+    appointments = _load_appointments(db, appointment_ids)
+    diagnoses = _primary_diagnoses(db, list(appointments))
+    certificates = []
+    for appointment_id in appointment_ids:
+        if diagnoses.get(appointment_id):
+            appointments[appointment_id]["diagnoses"] = diagnoses[appointment_id]
+            certificates.append(appointments[appointment_id])
+    return certificates
+
+
+def load_certificate(db: Session, appointment_id: int) -> Dict[str, Any]:
+    """Certificado médico: cita, paciente, representante, médico y diagnósticos principales (dos consultas)"""
+    appointment = _load_appointment(db, appointment_id)
+    if appointment is None:
+        raise HTTPException(status_code=404, detail=f"Cita con ID {appointment_id} no encontrada")
+
+    appointment["diagnoses"] = _primary_diagnoses(db, [appointment_id])[appointment_id]
+    if not appointment["diagnoses"]:
+        raise HTTPException(
+            status_code=404,
+            detail=f"La cita {appointment_id} no tiene diagnóstico principal para el certificado"
+        )
+    return appointment
+
+
+def load_prescription(db: Session, appointment_id: int) -> Dict[str, Any]:
+    """Receta: cita, paciente, médico, diagnósticos y recetas (tres consultas)"""
+    appointment = _load_appointment(db, appointment_id)
+    if appointment is None:
+        raise HTTPException(status_code=404, detail=f"Cita con ID {appointment_id} no encontrada")
+
+    appointment["diagnoses"] = _children(db, DIAGNOSIS_COLUMNS, AppointmentDiagnosis, [appointment_id])[appointment_id]
+    appointment["recipes"] = _children(db, RECIPE_COLUMNS, Recipe, [appointment_id])[appointment_id]
+    return appointment
+
+
+def report_content_version(db: Session, report_type: str, entity_id: int) -> Optional[Tuple[int, str]]:
+    """
+    (patient_id, versión del contenido) de un reporte, en una consulta liviana.
+    La versión combina las columnas version de paciente y citas (se incrementan en cada
+    edición) con los IDs de diagnóstico, que también cambian al agregar o quitar uno.
+    None si el paciente o la cita no existen.
+    """
+    if report_type == "medical_history":
+        rows = db.execute(
+            select(Patient.id, Patient.version, Appointment.id, Appointment.version, AppointmentDiagnosis.id)
+            .select_from(Patient)
+            .outerjoin(Appointment, Appointment.patient_id == Patient.id)
+            .outerjoin(AppointmentDiagnosis, AppointmentDiagnosis.appointment_id == Appointment.id)
+            .where(Patient.id == entity_id)
+            .order_by(Appointment.id, AppointmentDiagnosis.id)
+        ).all()
+    else:
+        rows = db.execute(
+            select(Patient.id, Patient.version, Appointment.id, Appointment.version, Appointment.representative_id,
+                   AppointmentDiagnosis.id)
+            .select_from(Appointment)
+            .join(Patient, Patient.id == Appointment.patient_id)
+            .outerjoin(AppointmentDiagnosis, AppointmentDiagnosis.appointment_id == Appointment.id)
+            .where(Appointment.id == entity_id)
+            .order_by(AppointmentDiagnosis.id)
+        ).all()
+    if not rows:
+        return None
+    return rows[0][0], ";".join(",".join(str(value) for value in row[1:]) for row in rows)
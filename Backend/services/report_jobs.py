@@ -0,0 +1,154 @@
+# report_jobs.py - Cola persistente de reportes PDF (tabla medical.report_jobs)
+#
+# Las rutas solo insertan el trabajo y responden; report_worker.py levanta procesos que
+# toman los pendientes con SELECT ... FOR UPDATE SKIP LOCKED, generan el PDF y lo guardan
+# en la misma fila. Un fallo se reintenta con espera exponencial hasta max_attempts.
+import logging
+import os
+import select as socket_select
+import threading
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, delete, or_, select, text
+from sqlalchemy.orm import Session, sessionmaker
+
+from models.ReportJob import ReportJob
+from services.report_service import render_report, report_file_name
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "report_jobs"
+POLL_SECONDS = float(os.getenv("REPORT_JOB_POLL_SECONDS", "5"))
+RETRY_BASE_SECONDS = int(os.getenv("REPORT_JOB_RETRY_SECONDS", "10"))
+# Un trabajo "running" sin terminar después de este tiempo se considera de un proceso caído
+LEASE_SECONDS = int(os.getenv("REPORT_JOB_LEASE_SECONDS", "600"))
+RETENTION_DAYS = int(os.getenv("REPORT_JOB_RETENTION_DAYS", "7"))
+
+
+def enqueue_report_job(db: Session, report_type: str, entity_id: int) -> ReportJob:
+    """Registrar el trabajo y despertar a los procesos que esperan con LISTEN"""
+    job = ReportJob(report_type=report_type, entity_id=entity_id, status="pending")
+    db.add(job)
+    db.flush()
+    # NOTIFY se entrega al confirmar la transacción
+    db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": NOTIFY_CHANNEL, "payload": str(job.id)})
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def get_report_job(db: Session, job_id: int) -> ReportJob:
+    job = db.get(ReportJob, job_id)
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Trabajo de reporte {job_id} no encontrado")
+    return job
+
+
+def get_report_job_pdf(db: Session, job_id: int) -> Tuple[ReportJob, bytes]:
+    job = get_report_job(db, job_id)
+    if job.status != "done":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"El reporte todavía no está disponible (estado: {job.status})"
+        )
+    return job, job.pdf
+
+
+def claim_next_job(db: Session) -> Optional[ReportJob]:
+    """Tomar el siguiente trabajo pendiente sin bloquear a los demás procesos"""
+    while True:
+        now = datetime.utcnow()
+        job = db.execute(
+            select(ReportJob)
+            .where(or_(and_(ReportJob.status == "pending", ReportJob.run_after <= now),
+                       and_(ReportJob.status == "running",
+                            ReportJob.started_at < now - timedelta(seconds=LEASE_SECONDS))))
+            .order_by(ReportJob.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        ).scalar_one_or_none()
+        if job is None:
+            db.rollback()
+            return None
+
+        if job.status == "running" and job.attempts >= job.max_attempts:
+            job.status, job.error, job.finished_at = "failed", "El proceso que generaba el reporte se detuvo", now
+            db.commit()
+            continue
+
+        job.status = "running"
+        job.attempts += 1
+        job.started_at = now
+        db.commit()
+        return job
+
+
+def run_job(db: Session, job: ReportJob):
+    """Generar el PDF del trabajo y guardar el resultado o programar el reintento"""
+    try:
+        pdf = render_report(db, job.report_type, job.entity_id)
+    except HTTPException as e:
+        # Paciente o cita inexistente: reintentar no cambia el resultado
+        db.rollback()
+        _fail(db, job, str(e.detail), retry=False)
+    except Exception as e:
+        logger.exception(f"Error generando el reporte del trabajo {job.id}")
+        db.rollback()
+        _fail(db, job, str(e), retry=job.attempts < job.max_attempts)
+    else:
+        job.status = "done"
+        job.pdf = pdf
+        job.size_bytes = len(pdf)
+        job.file_name = report_file_name(job.report_type, job.entity_id)
+        job.error = None
+        job.finished_at = datetime.utcnow()
+        db.commit()
+
+
+def _fail(db: Session, job: ReportJob, error: str, retry: bool):
+    job.error = error
+    if retry:
+        job.status = "pending"
+        job.run_after = datetime.utcnow() + timedelta(seconds=RETRY_BASE_SECONDS * 2 ** (job.attempts - 1))
+    else:
+        job.status = "failed"
+        job.finished_at = datetime.utcnow()
+    db.commit()
+
+
+def purge_finished_jobs(db: Session, retention_days: int = RETENTION_DAYS) -> int:
+    """Eliminar trabajos terminados (y sus PDF) más antiguos que la retención"""
+    result = db.execute(
+        delete(ReportJob)
+        .where(ReportJob.status.in_(("done", "failed")),
+               ReportJob.finished_at < datetime.utcnow() - timedelta(days=retention_days))
+    )
+    db.commit()
+    return result.rowcount
+
+
+def run_worker(session_factory: sessionmaker, stop: threading.Event, poll_seconds: float = POLL_SECONDS):
+    """
+    Bucle de un proceso: procesa trabajos mientras haya y luego espera un NOTIFY
+    (o poll_seconds, por si se perdió alguno o hay reintentos programados).
+    """
+    listener = session_factory.kw["bind"].raw_connection()
+    connection = listener.driver_connection
+    connection.autocommit = True
+    connection.cursor().execute(f"LISTEN {NOTIFY_CHANNEL}")
+    try:
+        while not stop.is_set():
+            with session_factory() as db:
+                job = claim_next_job(db)
+                if job is not None:
+                    logger.info(f"Generando {job.report_type} {job.entity_id} (trabajo {job.id}, intento {job.attempts})")
+                    run_job(db, job)
+                    continue
+
+            if socket_select.select([connection], [], [], poll_seconds)[0]:
+                connection.poll()
+                connection.notifies.clear()
+    finally:
+        listener.close()
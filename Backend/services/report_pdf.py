@@ -0,0 +1,444 @@
+# report_pdf.py - Generación de PDF en Python (ReportLab), sin JVM ni conexión JDBC
+#
+# Reproduce los documentos de reports/*.jrxml a partir de los datos de
+# services/report_data.py: historial médico (MedicalRecord + subreportes de
+# diagnósticos y recetas), certificado médico (medicalCertificate) y receta (Recipe).
+import os
+from datetime import date
+from functools import lru_cache
+from io import BytesIO
+from typing import Any, Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_RIGHT
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+from reportlab.platypus import KeepTogether, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+PAGE_WIDTH, PAGE_HEIGHT = A4
+MARGIN = 20
+CONTENT_WIDTH = PAGE_WIDTH - 2 * MARGIN
+
+HEADER_BACKGROUND = colors.HexColor("#E8F4F8")
+GRID_COLOR = colors.HexColor("#B0B0B0")
+
+# Datos fijos de la clínica (los mismos de medicalCertificate.jrxml)
+CLINIC = {
+    "name": "Clínica FENIX",
+    "subtitle": "DE SALUD BENÍTEZ",
+    "city": "El Quinche",
+    "address": "Emsara Mas N1-77 y Quito",
+    "email": "dra.rosalespedia@outlook.es",
+    "specialty": "ESPECIALISTA EN PEDIATRÍA",
+    "doctor_id": "1724181265",
+}
+
+_DAYS = ("lunes", "martes", "miércoles", "jueves", "viernes", "sábado", "domingo")
+_MONTHS = ("enero", "febrero", "marzo", "abril", "mayo", "junio", "julio", "agosto", "septiembre", "octubre",
+           "noviembre", "diciembre")
+
+_STYLES = {
+    "title": ParagraphStyle("title", fontName="Helvetica-Bold", fontSize=16, leading=20, alignment=1),
+    "section": ParagraphStyle("section", fontName="Helvetica-Bold", fontSize=10, leading=13),
+    "label": ParagraphStyle("label", fontName="Helvetica-Bold", fontSize=9, leading=11),
+    "text": ParagraphStyle("text", fontName="Helvetica", fontSize=9, leading=11),
+    "small": ParagraphStyle("small", fontName="Helvetica", fontSize=8, leading=10),
+    "right": ParagraphStyle("right", fontName="Helvetica", fontSize=10, leading=12, alignment=TA_RIGHT),
+}
+
+
+def long_date(value: date) -> str:
+    """Fecha como en los reportes Jasper: 'lunes 5 de mayo del 2025'"""
+    return f"{_DAYS[value.weekday()]} {value.day} de {_MONTHS[value.month - 1]} del {value.year}"
+
+
+def short_date(value: Optional[date]) -> str:
+    return value.strftime("%d/%m/%Y") if value else ""
+
+
+def age_in_years(birth_date: Optional[date], today: Optional[date] = None) -> str:
+    if birth_date is None:
+        return ""
+    today = today or date.today()
+    years = today.year - birth_date.year - ((today.month, today.day) < (birth_date.month, birth_date.day))
+    return f"{years} años"
+
+
+def full_name(first_name: Optional[str], last_name: Optional[str]) -> str:
+    return f"{first_name or ''} {last_name or ''}".strip()
+
+
+def _text(value: Any, default: str = "") -> str:
+    """Texto escapado para Paragraph, con saltos de línea conservados"""
+    if value is None or value == "":
+        return default
+    return escape(str(value)).replace("\n", "<br/>")
+
+
+def _with_unit(value: Any, unit: str) -> str:
+    return f"{value} {unit}" if value not in (None, "") else "N/A"
+
+
+# ---------------------------------------------------------------------------
+# Historial médico
+# ---------------------------------------------------------------------------
+
+def _cell(value: Any, width: float, style: ParagraphStyle, default: str = ""):
+    """
+    Celda de tabla: texto plano si cabe en una línea (mucho más rápido de dibujar),
+    Paragraph con ajuste de línea si no
+    """
+    text = default if value is None or value == "" else str(value)
+    if "\n" not in text and stringWidth(text, style.fontName, style.fontSize) <= width - 4:
+        return text
+    return Paragraph(_text(text), style)
+
+
+def _label_value_table(pairs: List[tuple], column_widths: List[float]) -> Table:
+    """Tabla de pares etiqueta/valor en filas de varias columnas"""
+    per_row = len(column_widths) // 2
+    rows = []
+    for start in range(0, len(pairs), per_row):
+        row = []
+        for index, (label, value) in enumerate(pairs[start:start + per_row]):
+            row += [_cell(label, column_widths[2 * index], _STYLES["label"]),
+                    _cell(value, column_widths[2 * index + 1], _STYLES["text"], "N/A")]
+        rows.append(row + [""] * (len(column_widths) - len(row)))
+    table = Table(rows, colWidths=column_widths)
+    table.setStyle(TableStyle([("VALIGN", (0, 0), (-1, -1), "TOP"),
+                               ("FONT", (0, 0), (-1, -1), "Helvetica", 9),
+                               *[("FONT", (column, 0), (column, -1), "Helvetica-Bold", 9)
+                                 for column in range(0, len(column_widths), 2)],
+                               ("LEFTPADDING", (0, 0), (-1, -1), 2),
+                               ("BOTTOMPADDING", (0, 0), (-1, -1), 2)]))
+    return table
+
+
+def _grid_table(header: List[str], rows: List[List[Any]], column_widths: List[float]) -> Table:
+    data = [list(header)]
+    data += [[_cell(value, column_widths[index], _STYLES["text"]) for index, value in enumerate(row)]
+             for row in rows]
+    table = Table(data, colWidths=column_widths, repeatRows=1)
+    table.setStyle(TableStyle([("BACKGROUND", (0, 0), (-1, 0), HEADER_BACKGROUND),
+                               ("FONT", (0, 0), (-1, 0), "Helvetica-Bold", 9),
+                               ("FONT", (0, 1), (-1, -1), "Helvetica", 9),
+                               ("GRID", (0, 0), (-1, -1), 0.5, GRID_COLOR),
+                               ("VALIGN", (0, 0), (-1, -1), "TOP")]))
+    return table
+
+
+def _meal_mark(lunch_time: Any, meal: str) -> str:
+    return "X" if lunch_time and meal in str(lunch_time).lower() else ""
+
+
+def _appointment_flowables(patient: Dict[str, Any], appointment: Dict[str, Any]) -> List:
+    weight = appointment["weight"]
+    flowables = [
+        _label_value_table([
+            ("Paciente:", full_name(patient["first_name"], patient["last_name"])),
+            ("Cédula:", patient["document_id"] or "N/A"),
+            ("Fecha de Nacimiento:", short_date(patient["birth_date"]) or "N/A"),
+            ("Fecha de Consulta:", short_date(appointment["appointment_date"])),
+            ("Hora:", appointment["appointment_time"].strftime("%H:%M") if appointment["appointment_time"] else ""),
+            ("Médico:", full_name(appointment["doctor_first_name"], appointment["doctor_last_name"])),
+        ], [100, 177, 100, 178]),
+        Spacer(0, 4),
+        Paragraph("Signos Vitales", _STYLES["section"]),
+        _label_value_table([
+            ("Temperatura:", _with_unit(appointment["temperature"], "°C")),
+            ("Presión Arterial:", _with_unit(appointment["blood_pressure"], "mmHg")),
+            ("Frec. Cardíaca:", _with_unit(appointment["heart_rate"], "lpm")),
+            ("Sat. Oxígeno:", _with_unit(appointment["oxygen_saturation"], "%")),
+            ("Peso:", _with_unit(weight, appointment["weight_unit"] or "kg")),
+            ("Altura:", _with_unit(appointment["height"], "cm")),
+        ], [80, 105, 80, 105, 80, 105]),
+        Spacer(0, 4),
+        Paragraph("Enfermedad Actual", _STYLES["section"]),
+        Paragraph(_text(appointment["current_illness"], "No registrado"), _STYLES["text"]),
+        Spacer(0, 4),
+        Paragraph("Examen Físico", _STYLES["section"]),
+        Paragraph(_text(appointment["physical_examination"], "No registrado"), _STYLES["text"]),
+    ]
+
+    if appointment["diagnoses"]:
+        flowables += [Spacer(0, 6), Paragraph("DIAGNÓSTICOS", _STYLES["section"]), _grid_table(
+            ["Código", "Descripción", "Tipo"],
+            [[d["diagnosis_code"], d["diagnosis_description"], d["diagnosis_type"]] for d in appointment["diagnoses"]],
+            [70, 395, 90])]
+
+    if appointment["recipes"]:
+        flowables += [Spacer(0, 6), Paragraph("RECETA MÉDICA", _STYLES["section"]), _grid_table(
+            ["Medicamento", "Cant.", "Instrucciones", "Desayuno", "Almuerzo", "Cena", "Observaciones:"],
+            [[r["medicine"], r["amount"], r["instructions"], _meal_mark(r["lunchTime"], "desayuno"),
+              _meal_mark(r["lunchTime"], "almuerzo"), _meal_mark(r["lunchTime"], "cena"), r["observations"]]
+             for r in appointment["recipes"]],
+            [105, 40, 140, 55, 55, 35, 125])]
+
+    return flowables
+
+
+def _record_footer(pdf: canvas.Canvas, document):
+    pdf.saveState()
+    pdf.setStrokeColor(GRID_COLOR)
+    pdf.line(MARGIN, 40, PAGE_WIDTH - MARGIN, 40)
+    pdf.setFont("Helvetica", 9)
+    pdf.drawString(MARGIN, 28, f"Generado el: {document.generated_on:%d/%m/%Y}")
+    pdf.drawRightString(PAGE_WIDTH - MARGIN, 28, f"Página {pdf.getPageNumber()}")
+    pdf.restoreState()
+
+
+def render_medical_record(data: Dict[str, Any]) -> bytes:
+    """Historial médico completo del paciente (una sección por cita, la más reciente primero)"""
+    buffer = BytesIO()
+    document = SimpleDocTemplate(buffer, pagesize=A4, leftMargin=MARGIN, rightMargin=MARGIN,
+                                 topMargin=MARGIN, bottomMargin=50,
+                                 title="Historial médico", author=CLINIC["name"])
+    # El día lo fija report_service y forma parte de la clave de la caché: un PDF guardado
+    # muestra siempre la fecha de su clave
+    document.generated_on = data.get("generated_on") or date.today()
+
+    story = [Paragraph("HISTORIAL MÉDICO DEL PACIENTE", _STYLES["title"]), Spacer(0, 10)]
+    for appointment in data["appointments"]:
+        section = _appointment_flowables(data["patient"], appointment)
+        # El encabezado de la cita no queda solo al final de una página
+        story += [KeepTogether(section[:3]), *section[3:], Spacer(0, 14)]
+
+    document.build(story, onFirstPage=_record_footer, onLaterPages=_record_footer)
+    return buffer.getvalue()
+
+
+# ---------------------------------------------------------------------------
+# Certificado médico
+# ---------------------------------------------------------------------------
+
+def _top(y: float) -> float:
+    """Coordenada Y medida desde el borde superior, como en los jrxml"""
+    return PAGE_HEIGHT - MARGIN - y
+
+
+def _draw_paragraph(pdf: canvas.Canvas, text: str, x: float, y: float, width: float, style: ParagraphStyle):
+    paragraph = Paragraph(text, style)
+    _, height = paragraph.wrap(width, PAGE_HEIGHT)
+    paragraph.drawOn(pdf, x, _top(y) - height)
+    return height
+
+
+def render_certificate(data: Dict[str, Any]) -> bytes:
+    """Certificado médico de una cita (una página por diagnóstico principal)"""
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=A4, pageCompression=1)
+    pdf.setTitle("Certificado médico")
+    pdf.setAuthor(CLINIC["name"])
+
+    patient = data["patient"]
+    doctor_id = data.get("doctor_cedula") or CLINIC["doctor_id"]
+    companion = None
+    if data["has_representative"] and data["contact_first_name"]:
+        companion = (f"Acude en compañía de {data['relationship_type'] or ''} "
+                     f"{full_name(data['contact_first_name'], data['contact_last_name'])} "
+                     f"CI: {data['contact_document_id'] or ''}")
+    address = ", ".join(part for part in (patient["street"], patient["neighborhood"], patient["city"]) if part)
+
+    for diagnosis in data["diagnoses"]:
+        # Encabezado
+        pdf.setFont("Helvetica-Bold", 24)
+        pdf.drawRightString(MARGIN + 540, _top(38), CLINIC["name"])
+        pdf.setFont("Helvetica", 10)
+        pdf.drawRightString(MARGIN + 540, _top(60), CLINIC["subtitle"])
+        pdf.drawString(MARGIN + 10, _top(88), f"{CLINIC['city']}, {long_date(data['appointment_date'])}")
+
+        # Cuerpo
+        body = 100
+        pdf.setFont("Helvetica-Bold", 16)
+        pdf.drawCentredString(PAGE_WIDTH / 2, _top(body + 27), "CERTIFICADO MÉDICO")
+
+        pdf.setFont("Helvetica", 10)
+        pdf.drawString(MARGIN + 10, _top(body + 64), "Certifico que:")
+        pdf.setFont("Helvetica-Bold", 10)
+        pdf.drawString(MARGIN + 110, _top(body + 64),
+                       full_name(patient["first_name"], patient["last_name"]).upper())
+        pdf.setFont("Helvetica", 10)
+        pdf.drawString(MARGIN + 10, _top(body + 89), "de")
+        pdf.drawString(MARGIN + 40, _top(body + 89), age_in_years(patient["birth_date"], data["appointment_date"]))
+        pdf.drawString(MARGIN + 120, _top(body + 89), "con CI:")
+        pdf.drawString(MARGIN + 170, _top(body + 89), patient["document_id"] or "")
+        pdf.drawString(MARGIN + 270, _top(body + 89), "y Número de historia clínica:")
+        pdf.setFont("Helvetica-Bold", 10)
+        pdf.drawString(MARGIN + 420, _top(body + 89), patient["document_id"] or "")
+        pdf.setFont("Helvetica", 10)
+        pdf.drawString(MARGIN + 10, _top(body + 114),
+                       f"es atendido en esta casa de salud el día {long_date(data['appointment_date'])}")
+        pdf.drawString(MARGIN + 10, _top(body + 134), "con el diagnóstico de:")
+        _draw_paragraph(pdf, f"<b>{_text(diagnosis['diagnosis_description'])} {_text(diagnosis['diagnosis_code'])}</b>",
+                        MARGIN + 10, body + 142, 535, _STYLES["text"])
+
+        pdf.drawString(MARGIN + 10, _top(body + 199), "Reposo médico:")
+        pdf.drawString(MARGIN + 10, _top(body + 224), "Desde")
+        pdf.drawString(MARGIN + 60, _top(body + 224), f"el {short_date(data['rest_from'])}")
+        pdf.drawString(MARGIN + 10, _top(body + 249), "Hasta")
+        pdf.drawString(MARGIN + 60, _top(body + 249), f"el {short_date(data['rest_to'])}")
+
+        pdf.drawString(MARGIN + 10, _top(body + 279), "Notas del médico:")
+        notes = "<br/>".join(_text(note) for note in (data["observations"], companion) if note)
+        if notes:
+            _draw_paragraph(pdf, notes, MARGIN + 10, body + 285, 520, _STYLES["text"])
+
+        rows = (("Dirección:", address), ("Teléfono:", patient["telephone"] or ""),
+                ("Empresa:", patient["enterprise"] or "Ninguna"),
+                ("Actividad Laboral:", patient["work_activity"] or "Ninguno"),
+                ("Tipo de contingencia:", data["contingency_type"] or ""))
+        for index, (label, value) in enumerate(rows):
+            y = _top(body + 399 + 25 * index)
+            pdf.setFont("Helvetica", 10)
+            pdf.drawString(MARGIN + 10, y, label)
+            pdf.drawString(MARGIN + 150, y, value)
+
+        pdf.line(MARGIN + 10, _top(body + 520), MARGIN + 545, _top(body + 520))
+        pdf.setFont("Helvetica", 10)
+        pdf.drawCentredString(MARGIN + 277, _top(body + 566), f"CI {doctor_id}")
+        pdf.setFont("Helvetica-Bold", 10)
+        pdf.drawCentredString(MARGIN + 277, _top(body + 581), CLINIC["specialty"])
+
+        # Pie de página
+        pdf.setFont("Helvetica", 8)
+        pdf.drawRightString(MARGIN + 540, 60, f"{CLINIC['city']}.")
+        pdf.setFont("Helvetica-Bold", 8)
+        pdf.drawString(MARGIN + 380, 48, "Dir: ")
+        pdf.setFont("Helvetica", 8)
+        pdf.drawRightString(MARGIN + 540, 48, CLINIC["address"])
+        pdf.drawRightString(MARGIN + 540, 36, CLINIC["email"])
+        pdf.showPage()
+
+    pdf.save()
+    return buffer.getvalue()
+
+
+# ---------------------------------------------------------------------------
+# Receta médica
+# ---------------------------------------------------------------------------
+
+ALARM_SIGNS = ("Signos de alarma: 1. Medidas generales, 2. Si mantienes fiebre, vómito persistente, alzas "
+               "térmicas mayor a 38 grados acudir a emergencias, 3. Tomar abundante líquido, descanso, "
+               "4. Control por esta consulta en 5 días.")
+
+# Logo del membrete (Recipe.jrxml apuntaba a un archivo de Windows); sin archivo la receta sale sin logo
+REPORT_LOGO = os.getenv("REPORT_LOGO", os.path.join("reports", "logo.png"))
+
+# Bandas fijas de cada página, como title y pageFooter de Recipe.jrxml
+PRESCRIPTION_HEADER = 75
+PRESCRIPTION_FOOTER = 120
+_FOOTER_TOP = MARGIN + PRESCRIPTION_FOOTER
+_LETTERHEAD = "prescription_letterhead"
+LETTERHEAD_LINE = colors.HexColor("#CCCCCC")
+
+
+@lru_cache(maxsize=1)
+def _prescription_letterhead() -> Tuple[tuple, Optional[bytes]]:
+    """
+    Capa fija de la receta (membrete, logo, marco de la autorización) calculada una vez por
+    proceso: las llamadas al canvas con posiciones y fuentes ya resueltas, y el logo leído
+    del disco. Cada PDF la dibuja una sola vez como Form XObject y sus páginas la reutilizan.
+    """
+    operations = (
+        ("setFont", "Helvetica-Bold", 18),
+        ("drawString", MARGIN, _top(22), CLINIC["name"]),
+        ("setStrokeColor", LETTERHEAD_LINE),
+        ("setLineWidth", 1),
+        ("line", MARGIN, _top(50), PAGE_WIDTH - MARGIN, _top(50)),
+        ("setFont", "Helvetica-Bold", 10),
+        ("drawString", MARGIN, _top(64), "FECHA DE EMISIÓN:"),
+        ("setFont", "Helvetica-Bold", 12),
+        ("drawCentredString", PAGE_WIDTH / 2, _FOOTER_TOP - 24, "AUTORIZACIÓN DE SERVICIO"),
+        ("setFont", "Helvetica-Bold", 10),
+        ("drawString", MARGIN + 40, _FOOTER_TOP - 66, "Fecha:"),
+        ("drawString", MARGIN + 40, _FOOTER_TOP - 86, "Firma:"),
+        ("rect", MARGIN + 40, _FOOTER_TOP - 115, 200, 20),
+        ("setFont", "Helvetica", 9),
+        ("drawCentredString", MARGIN + 400, _FOOTER_TOP - 93, CLINIC["specialty"]),
+    )
+    logo = None
+    if os.path.isfile(REPORT_LOGO):
+        with open(REPORT_LOGO, "rb") as image:
+            logo = image.read()
+    return operations, logo
+
+
+def _draw_letterhead(pdf: canvas.Canvas):
+    operations, logo = _prescription_letterhead()
+    pdf.beginForm(_LETTERHEAD)
+    for operation, *args in operations:
+        getattr(pdf, operation)(*args)
+    if logo:
+        pdf.drawImage(ImageReader(BytesIO(logo)), MARGIN + 500, _top(50), 60, 50,
+                      preserveAspectRatio=True, anchor="ne", mask="auto")
+    pdf.endForm()
+
+
+def _prescription_page(pdf: canvas.Canvas, document):
+    """Capa fija (definida en la primera página) más los datos de la banda que cambian por receta"""
+    if not pdf.hasForm(_LETTERHEAD):
+        _draw_letterhead(pdf)
+    pdf.doForm(_LETTERHEAD)
+    pdf.saveState()
+    pdf.setFont("Helvetica", 10)
+    pdf.drawString(MARGIN + 120, _top(64), document.issued)
+    pdf.drawString(MARGIN + 90, _FOOTER_TOP - 66, document.issued)
+    pdf.setFont("Helvetica", 9)
+    pdf.drawCentredString(MARGIN + 400, _FOOTER_TOP - 82, document.doctor)
+    pdf.drawCentredString(MARGIN + 400, _FOOTER_TOP - 104, document.doctor_id)
+    pdf.restoreState()
+
+
+def render_prescription(data: Dict[str, Any]) -> bytes:
+    """Receta de una cita (Recipe.jrxml): datos del paciente, medicamentos e indicaciones"""
+    buffer = BytesIO()
+    document = SimpleDocTemplate(buffer, pagesize=A4, leftMargin=MARGIN, rightMargin=MARGIN,
+                                 topMargin=MARGIN + PRESCRIPTION_HEADER, bottomMargin=_FOOTER_TOP + 5,
+                                 title="Receta médica", author=CLINIC["name"])
+    # La receta se emite en la cita: la fecha sale de los datos, no del momento de generar,
+    # así una reimpresión (o un PDF de la caché) muestra siempre la misma
+    document.issued = f"{long_date(data['appointment_date'])} {data['appointment_time']:%H:%M}"
+    document.doctor = f"Dr. {full_name(data['doctor_first_name'], data['doctor_last_name'])}"
+    document.doctor_id = f"CI {data.get('doctor_cedula') or CLINIC['doctor_id']}"
+
+    patient = data["patient"]
+    # Un diagnóstico por línea; _cell lo ajusta como Paragraph
+    diagnosis = "\n".join(f"{d['diagnosis_code'] or ''} {d['diagnosis_description'] or ''}".strip()
+                          for d in data["diagnoses"])
+
+    story = [
+        _label_value_table([
+            ("Nombre paciente:", full_name(patient["first_name"], patient["last_name"])),
+            ("Cédula paciente:", patient["document_id"]),
+            ("Edad:", age_in_years(patient["birth_date"], data["appointment_date"])),
+            ("Sexo paciente:", patient["gender"]),
+            ("Fecha de cita:", short_date(data["appointment_date"])),
+        ], [100, 177, 100, 178]),
+        _label_value_table([("Diagnóstico:", diagnosis or None),
+                            ("Enfermedad actual:", data["current_illness"]),
+                            ("Examen físico:", data["physical_examination"])], [100, 455]),
+        Spacer(0, 8),
+    ]
+
+    if data["recipes"]:
+        story.append(_grid_table(["Medicamento", "Cantidad", "Indicaciones", "Observaciones"],
+                                 [[r["medicine"], r["amount"], r["instructions"], r["observations"]]
+                                  for r in data["recipes"]],
+                                 [200, 90, 160, 105]))
+    else:
+        story.append(Paragraph("<b>No hay recetas</b>", _STYLES["title"]))
+
+    story += [
+        Spacer(0, 8),
+        _label_value_table([("Observaciones:", data["observations"]),
+                            ("Exámenes de lab:", data["laboratory_tests"])], [100, 455]),
+        Spacer(0, 12),
+        Paragraph(f"<b>{_text(ALARM_SIGNS)}</b>", _STYLES["small"]),
+    ]
+
+    document.build(story, onFirstPage=_prescription_page, onLaterPages=_prescription_page)
+    return buffer.getvalue()
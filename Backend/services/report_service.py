@@ -1,47 +1,86 @@
-import os
-import subprocess
-from datetime import datetime
-
-# Configuración
-JASPER_STARTER = r"C:\Users\Boris\Desktop\Jasper\jasperstarter.exe"
-
-
-def generate_recipe_report(appointment_id: int,
-                           db_host: str = "localhost",
-                           db_port: str = "5432",
-                           db_name: str = "femixweb3",
-                           db_user: str = "postgres",
-                           db_password: str = "sa") -> str:
-    os.makedirs("tmp", exist_ok=True)
-    report_path = "reports/Recipe.jrxml"
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_file = f"tmp/Recipe_{timestamp}"
-
-    try:
-        # Crear archivo batch temporal para ejecutar con permisos
-        batch_content = f'''@echo off
-cd /d "{os.getcwd()}"
-"{JASPER_STARTER}" process "{report_path}" -f pdf -o "{output_file}" -t postgres -H {db_host} -u {db_user} -p {db_password} -n {db_name} --db-port {db_port} -P filtro={appointment_id}
-'''
-
-        batch_file = "tmp/run_jasper.bat"
-        with open(batch_file, 'w') as f:
-            f.write(batch_content)
-
-        # Ejecutar el batch con permisos elevados
-        result = subprocess.run([
-            "powershell",
-            "Start-Process",
-            f'"{batch_file}"',
-            "-Verb", "RunAs",
-            "-Wait"
-        ], capture_output=True, text=True, check=True)
-
-        pdf_file = f"{output_file}.pdf"
-        if os.path.exists(pdf_file):
-            return pdf_file
-        else:
-            raise Exception("No se generó el archivo PDF")
-
-    except subprocess.CalledProcessError as e:
-        raise Exception(f"Error generando reporte: {e.stderr}")
\ No newline at end of file
+import io
+from datetime import date
+from typing import Any, BinaryIO, Callable, Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from services.jasper_pool import JasperPool, certificate_rows, medical_record_rows
+from services.pdf_cache import report_pdf_cache, PdfCache
+from services.report_data import load_certificate, load_medical_record, load_prescription, report_content_version
+from services.report_pdf import render_certificate, render_medical_record, render_prescription
+
+# Tipo de reporte -> (carga de datos, generación, nombre del archivo)
+REPORTS = {
+    "medical_history": (load_medical_record, render_medical_record, "historial_medico_paciente_{}.pdf"),
+    "medical_certificate": (load_certificate, render_certificate, "certificado_medico_{}.pdf"),
+    "prescription": (load_prescription, render_prescription, "receta_{}.pdf"),
+}
+
+# Plantilla Jasper de cada reporte: (plantilla, parámetro con el ID, filas a partir de los datos)
+JASPER_REPORTS = {
+    "medical_history": ("MedicalRecord", "patient_id", medical_record_rows),
+    "medical_certificate": ("medicalCertificate", "APPOINTMENT_ID", certificate_rows),
+}
+
+# Reportes que imprimen la fecha de generación: el día forma parte de la clave y se pasa al
+# generador (generated_on), así un PDF de la caché siempre muestra la fecha de su clave
+DATED_REPORTS = {"medical_history"}
+
+
+def report_file_name(report_type: str, entity_id: int) -> str:
+    return REPORTS[report_type][2].format(entity_id)
+
+
+def _renderer(report_type: str, entity_id: int, jasper: Optional[JasperPool]) -> Callable[[Dict[str, Any]], bytes]:
+    if jasper is None:
+        return REPORTS[report_type][1]
+    template, parameter, rows = JASPER_REPORTS[report_type]
+
+    def render(data: Dict[str, Any]) -> bytes:
+        parameters = {parameter: entity_id}
+        if "generated_on" in data:
+            parameters["REPORT_DATE"] = data["generated_on"]
+        return jasper.render(template, parameters, rows(data))
+    return render
+
+
+def _load(db: Session, report_type: str, entity_id: int, generated_on: Optional[date]) -> Dict[str, Any]:
+    data = REPORTS[report_type][0](db, entity_id)
+    if generated_on is not None:
+        data["generated_on"] = generated_on
+    return data
+
+
+def open_report(db: Session, report_type: str, entity_id: int, jasper: Optional[JasperPool] = None) -> BinaryIO:
+    """
+    PDF de un reporte como archivo abierto, para enviarlo por partes. Con jasper se genera
+    con ese pool; si no, con ReportLab. El motor forma parte de la clave, así los PDF de
+    uno y otro nunca se mezclan. Una reimpresión sin cambios en los datos sale de la
+    caché; solo cuesta la consulta de versión.
+    """
+    render = _renderer(report_type, entity_id, jasper)
+    generated_on = date.today() if report_type in DATED_REPORTS else None
+    content = report_content_version(db, report_type, entity_id)
+    if content is None:
+        # Paciente o cita inexistente: el cargador responde con el 404 correspondiente
+        return io.BytesIO(render(_load(db, report_type, entity_id, generated_on)))
+
+    patient_id, version = content
+    if generated_on is not None:
+        version = f"{version};{generated_on.isoformat()}"
+    engine = "python" if jasper is None else "jasper"
+    name = PdfCache.file_name(patient_id, f"{engine}_{report_type}", entity_id, version)
+    pdf = report_pdf_cache.open(name)
+    if pdf is None:
+        # Recién generado ya está en memoria: se guarda para la próxima vez y se envía desde aquí
+        data = render(_load(db, report_type, entity_id, generated_on))
+        report_pdf_cache.put(name, data)
+        pdf = io.BytesIO(data)
+    return pdf
+
+
+def render_report(db: Session, report_type: str, entity_id: int, jasper: Optional[JasperPool] = None) -> bytes:
+    """PDF completo en memoria (respuesta JSON y trabajos en segundo plano)"""
+    with open_report(db, report_type, entity_id, jasper) as pdf:
+        return pdf.read()
+
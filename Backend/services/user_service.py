@@ -2,50 +2,86 @@ from bson import ObjectId
 from sqlalchemy.orm import Session
 from models.User import AuthUser, Role, PasswordChange
 from typing import Optional
-from datetime import datetime
+from datetime import date, datetime
 from fastapi import HTTPException
-from sqlalchemy import and_
+from sqlalchemy import and_, func, select
 from database.db import SessionLocal, get_db
 
+# Columnas del listado de usuarios; el nombre del rol sale del JOIN, sin cargar AuthUser.role por fila
+USER_LIST_COLUMNS = (AuthUser.id, AuthUser.first_name, AuthUser.last_name, AuthUser.email, AuthUser.cedula,
+                     AuthUser.birth_date, Role.name.label("role"), AuthUser.created_at, AuthUser.is_active)
+
+
+def _parse_birth_date(value: Optional[str]) -> Optional[date]:
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Formato de fecha inválido. Usa YYYY-MM-DD.")
+
+
+def _list_users(db: Session, conditions: list, skip: int, limit: int):
+    """
+    Página de usuarios en una consulta: solo las columnas del listado, el rol por JOIN y el
+    total con COUNT(*) OVER (). Solo una página vacía fuera de rango necesita un COUNT aparte.
+    """
+    rows = db.execute(
+        select(*USER_LIST_COLUMNS, func.count().over().label("total"))
+        .join(Role, Role.id == AuthUser.role_id)
+        .where(*conditions)
+        .order_by(AuthUser.id)
+        .offset(skip)
+        .limit(limit)
+    ).mappings().all()
+
+    if rows:
+        total = rows[0]["total"]
+    elif skip:
+        total = db.scalar(select(func.count()).select_from(AuthUser).join(Role, Role.id == AuthUser.role_id)
+                          .where(*conditions))
+    else:
+        total = 0
+
+    results = [{
+        "id": row["id"],
+        "first_name": row["first_name"],
+        "last_name": row["last_name"],
+        "email": row["email"],
+        "cedula": row["cedula"],
+        "birth_date": row["birth_date"].isoformat() if row["birth_date"] else None,
+        "role": row["role"],
+        "created_at": row["created_at"].isoformat(),
+        "is_active": row["is_active"]
+    } for row in rows]
+
+    return {"message": "Ok", "data": results, "total": total, "skip": skip, "limit": limit}
+
+
 def get_users(
     db: Session,
     role: Optional[str] = None,
     first_name: Optional[str] = None,
     start_birth_date: Optional[str] = None,
-    end_birth_date: Optional[str] = None
+    end_birth_date: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100
 ):
-    query = db.query(AuthUser).join(Role)
-
+    """Usuarios paginados; first_name filtra por prefijo sin distinguir mayúsculas"""
+    conditions = []
     if role:
-        query = query.filter(Role.name == role)
+        conditions.append(Role.name == role)
     if first_name:
-        query = query.filter(AuthUser.first_name == first_name)
-    if start_birth_date and end_birth_date:
-        try:
-            start = datetime.strptime(start_birth_date, "%Y-%m-%d").date()
-            end = datetime.strptime(end_birth_date, "%Y-%m-%d").date()
-            query = query.filter(AuthUser.birth_date.between(start, end))
-        except ValueError:
-            raise HTTPException(status_code=400, detail="Formato de fecha inválido. Usa YYYY-MM-DD.")
-
-    users = query.all()
+        prefix = first_name.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        conditions.append(func.lower(AuthUser.first_name).like(f"{prefix}%", escape="\\"))
 
-    results = []
-    for user in users:
-        user_dict = {
-            "id": user.id,
-            "first_name": user.first_name,
-            "last_name": user.last_name,
-            "email": user.email,
-            "cedula": user.cedula,  # ← AGREGAR ESTE CAMPO
-            "birth_date": user.birth_date.isoformat() if user.birth_date else None,
-            "role": user.role.name if user.role else None,
-            "created_at": user.created_at.isoformat(),
-            "is_active": user.is_active
-        }
-        results.append(user_dict)
+    start, end = _parse_birth_date(start_birth_date), _parse_birth_date(end_birth_date)
+    if start:
+        conditions.append(AuthUser.birth_date >= start)
+    if end:
+        conditions.append(AuthUser.birth_date <= end)
 
-    return {"message": "Ok", "data": results}
+    return _list_users(db, conditions, skip, limit)
 
 
 def update_user(db: Session, user_id: int, user_data):
@@ -168,28 +204,7 @@ def get_roles(db: Session):
 def get_by_role_services(
         db: Session,
         role_id: Optional[int] = None,
+        skip: int = 0,
+        limit: int = 100
 ):
-    query = db.query(AuthUser).join(Role)
-    print(f"Role ID recibido: {role_id}")
-
-    if role_id:
-        query = query.filter(Role.id == role_id)
-
-    users = query.all()
-
-    results = []
-    for user in users:
-        user_dict = {
-            "id": user.id,
-            "first_name": user.first_name,
-            "last_name": user.last_name,
-            "email": user.email,
-            "cedula": user.cedula,  # ← AGREGAR ESTE CAMPO
-            "birth_date": user.birth_date.isoformat() if user.birth_date else None,
-            "role": user.role.name if user.role else None,
-            "created_at": user.created_at.isoformat(),
-            "is_active": user.is_active
-        }
-        results.append(user_dict)
-
-    return {"message": "Ok", "data": results}
\ No newline at end of file
+    return _list_users(db, [AuthUser.role_id == role_id] if role_id else [], skip, limit)
\ No newline at end of file
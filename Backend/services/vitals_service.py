@@ -0,0 +1,219 @@
+# vitals_service.py - Signos vitales numéricos y tendencias por paciente
+import logging
+import re
+from datetime import date
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from fastapi import HTTPException
+from sqlalchemy import select, insert, asc
+from sqlalchemy.orm import Session
+
+from models.Appointment import Appointment
+from models.Patient import Patient
+from models.Vitals import AppointmentVitals
+
+logger = logging.getLogger(__name__)
+
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)?")
+_BLOOD_PRESSURE = re.compile(r"(\d{2,3})\s*/\s*(\d{2,3})")
+
+# Rangos plausibles; los valores fuera de rango se descartan en lugar de graficarse
+VITAL_RANGES = {
+    "temperature_c": (30, 45),
+    "systolic_mmhg": (50, 300),
+    "diastolic_mmhg": (20, 200),
+    "heart_rate_bpm": (20, 300),
+    "oxygen_saturation_pct": (50, 100),
+    "weight_kg": (0.3, 500),
+    "height_cm": (20, 250),
+}
+
+VITAL_FIELDS = tuple(VITAL_RANGES)
+
+
+def _first_number(value: Optional[str]) -> Optional[float]:
+    if value is None:
+        return None
+    match = _NUMBER.search(str(value))
+    return float(match.group().replace(",", ".")) if match else None
+
+
+def _in_range(field: str, value: Optional[float]) -> Optional[float]:
+    if value is None:
+        return None
+    low, high = VITAL_RANGES[field]
+    return value if low <= value <= high else None
+
+
+def parse_vitals(temperature: Optional[str], blood_pressure: Optional[str], heart_rate: Optional[str],
+                 oxygen_saturation: Optional[str], weight: Optional[Decimal], weight_unit: Optional[str],
+                 height: Optional[str]) -> Dict[str, Optional[float]]:
+    """Interpretar los signos vitales en texto libre y normalizarlos (°C, mmHg, lpm, %, kg, cm)"""
+    temperature_c = _first_number(temperature)
+    if temperature_c is not None and temperature_c > 50:
+        # Registrada en °F
+        temperature_c = (temperature_c - 32) * 5 / 9
+
+    systolic = diastolic = None
+    if blood_pressure:
+        match = _BLOOD_PRESSURE.search(blood_pressure)
+        if match:
+            systolic, diastolic = float(match.group(1)), float(match.group(2))
+
+    weight_kg = float(weight) if weight is not None else None
+    unit = (weight_unit or "kg").strip().lower()
+    if weight_kg is not None:
+        if unit in ("lb", "lbs"):
+            weight_kg *= 0.45359237
+        elif unit == "g":
+            weight_kg /= 1000
+
+    height_cm = _first_number(height)
+    if height_cm is not None and height_cm < 3:
+        # Registrada en metros
+        height_cm *= 100
+
+    values = {
+        "temperature_c": temperature_c,
+        "systolic_mmhg": systolic,
+        "diastolic_mmhg": diastolic,
+        "heart_rate_bpm": _first_number(heart_rate),
+        "oxygen_saturation_pct": _first_number(oxygen_saturation),
+        "weight_kg": weight_kg,
+        "height_cm": height_cm,
+    }
+    values = {field: _in_range(field, value) for field, value in values.items()}
+    for field in ("systolic_mmhg", "diastolic_mmhg", "heart_rate_bpm"):
+        if values[field] is not None:
+            values[field] = int(round(values[field]))
+    for field in ("temperature_c", "oxygen_saturation_pct", "height_cm"):
+        if values[field] is not None:
+            values[field] = round(values[field], 1)
+    if values["weight_kg"] is not None:
+        values["weight_kg"] = round(values["weight_kg"], 2)
+    return values
+
+
+def _parse_appointment_vitals(appointment) -> Dict[str, Optional[float]]:
+    return parse_vitals(appointment.temperature, appointment.blood_pressure, appointment.heart_rate,
+                        appointment.oxygen_saturation, appointment.weight, appointment.weight_unit,
+                        appointment.height)
+
+
+def sync_appointment_vitals(appointment: Appointment):
+    """Actualizar los signos vitales numéricos de una cita (se llama antes del commit)"""
+    if appointment.vitals is None:
+        appointment.vitals = AppointmentVitals()
+    vitals = appointment.vitals
+    vitals.patient_id = appointment.patient_id
+    vitals.measured_on = appointment.appointment_date
+    for field, value in _parse_appointment_vitals(appointment).items():
+        setattr(vitals, field, value)
+
+
+def backfill_vitals(db: Session, batch_size: int = 1000) -> int:
+    """Llenar los signos vitales numéricos de las citas existentes, por lotes de ID"""
+    source_columns = (Appointment.id, Appointment.patient_id, Appointment.appointment_date,
+                      Appointment.temperature, Appointment.blood_pressure, Appointment.heart_rate,
+                      Appointment.oxygen_saturation, Appointment.weight, Appointment.weight_unit,
+                      Appointment.height)
+    missing = ~select(AppointmentVitals.appointment_id).where(
+        AppointmentVitals.appointment_id == Appointment.id).exists()
+
+    last_id = 0
+    total = 0
+    while True:
+        rows = db.execute(
+            select(*source_columns)
+            .where(Appointment.id > last_id, missing)
+            .order_by(Appointment.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+
+        db.execute(insert(AppointmentVitals), [
+            {
+                "appointment_id": row.id,
+                "patient_id": row.patient_id,
+                "measured_on": row.appointment_date,
+                **_parse_appointment_vitals(row)
+            }
+            for row in rows
+        ])
+        db.commit()
+
+        last_id = rows[-1].id
+        total += len(rows)
+        logger.info(f"Signos vitales generados para {total} citas (último ID {last_id})")
+
+    return total
+
+
+def _rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Media móvil de las últimas `window` mediciones, ignorando valores faltantes (NaN)"""
+    valid = ~np.isnan(values)
+    kernel = np.ones(window)
+    sums = np.convolve(np.where(valid, values, 0.0), kernel)[:len(values)]
+    counts = np.convolve(valid.astype(float), kernel)[:len(values)]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return sums / counts
+
+
+def _to_json_list(values: np.ndarray) -> List[Optional[float]]:
+    return [None if np.isnan(value) else round(float(value), 2) for value in values]
+
+
+def get_vitals_trend(
+        db: Session,
+        patient_id: int,
+        window: int = 3,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None
+) -> Dict[str, Any]:
+    """Serie de signos vitales de un paciente con media móvil, mínimo, máximo y último valor por métrica"""
+    if db.get(Patient, patient_id) is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Paciente con ID {patient_id} no encontrado"
+        )
+
+    stmt = (select(AppointmentVitals.appointment_id, AppointmentVitals.measured_on,
+                   *[getattr(AppointmentVitals, field) for field in VITAL_FIELDS])
+            .where(AppointmentVitals.patient_id == patient_id))
+
+    if start_date:
+        stmt = stmt.where(AppointmentVitals.measured_on >= start_date)
+
+    if end_date:
+        stmt = stmt.where(AppointmentVitals.measured_on <= end_date)
+
+    rows = db.execute(stmt.order_by(asc(AppointmentVitals.measured_on),
+                                    asc(AppointmentVitals.appointment_id))).all()
+
+    # Matriz (mediciones x métricas) con NaN para valores faltantes
+    matrix = np.array([[np.nan if value is None else float(value) for value in row[2:]] for row in rows],
+                      dtype=float).reshape(len(rows), len(VITAL_FIELDS))
+
+    metrics = {}
+    for index, field in enumerate(VITAL_FIELDS):
+        series = matrix[:, index]
+        present = series[~np.isnan(series)]
+        metrics[field] = {
+            "values": _to_json_list(series),
+            "rolling_mean": _to_json_list(_rolling_mean(series, window)) if len(series) else [],
+            "min": round(float(present.min()), 2) if present.size else None,
+            "max": round(float(present.max()), 2) if present.size else None,
+            "mean": round(float(present.mean()), 2) if present.size else None,
+            "last": round(float(present[-1]), 2) if present.size else None,
+        }
+
+    return {
+        "patient_id": patient_id,
+        "window": window,
+        "appointment_ids": [row.appointment_id for row in rows],
+        "dates": [row.measured_on for row in rows],
+        "metrics": metrics
+    }
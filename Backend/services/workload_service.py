@@ -0,0 +1,132 @@
+# workload_service.py - Carga de trabajo por médico desde contadores diarios
+import logging
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, delete, func, case, asc, literal_column
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from models.Appointment import Appointment
+from models.User import AuthUser
+from models.Workload import DoctorDailyWorkload
+
+logger = logging.getLogger(__name__)
+
+# Primer entero del advisory lock (médico, día): desplazado para no chocar con otros usos de dos claves
+WORKLOAD_LOCK_NAMESPACE = 1_000_000_000
+
+
+def refresh_doctor_workload(db: Session, keys: Iterable[Tuple[int, date]]):
+    """
+    Recalcular los contadores de los días (médico, fecha) afectados por una escritura.
+    Solo lee las citas de ese médico en ese día; se ejecuta antes del commit.
+
+    Antes de contar se toma un advisory lock de transacción por (médico, día): dos citas
+    del mismo día que se guardan a la vez se serializan, y como en READ COMMITTED cada
+    consulta toma una foto nueva, la segunda cuenta también la cita ya confirmada por la
+    primera. Las claves se bloquean en orden para no provocar interbloqueos.
+    """
+    db.flush()
+    for user_id, day in sorted(set(keys)):
+        db.execute(select(func.pg_advisory_xact_lock(WORKLOAD_LOCK_NAMESPACE + user_id, day.toordinal())))
+        count, first_time, last_time = db.execute(
+            select(func.count(), func.min(Appointment.appointment_time), func.max(Appointment.appointment_time))
+            .where(Appointment.user_id == user_id, Appointment.appointment_date == day)
+        ).one()
+
+        if not count:
+            db.execute(delete(DoctorDailyWorkload).where(
+                DoctorDailyWorkload.user_id == user_id, DoctorDailyWorkload.day == day
+            ))
+            continue
+
+        stmt = insert(DoctorDailyWorkload).values(
+            user_id=user_id, day=day, appointment_count=count, first_time=first_time, last_time=last_time
+        )
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[DoctorDailyWorkload.user_id, DoctorDailyWorkload.day],
+            set_={
+                "appointment_count": stmt.excluded.appointment_count,
+                "first_time": stmt.excluded.first_time,
+                "last_time": stmt.excluded.last_time,
+            }
+        ))
+
+
+def rebuild_doctor_workload(db: Session, start_date: Optional[date] = None, end_date: Optional[date] = None) -> int:
+    """Recalcular los contadores diarios desde appointments (todo o un rango de fechas)"""
+    clear = delete(DoctorDailyWorkload)
+    source = select(Appointment.user_id, Appointment.appointment_date, func.count(),
+                    func.min(Appointment.appointment_time), func.max(Appointment.appointment_time))
+
+    if start_date:
+        clear = clear.where(DoctorDailyWorkload.day >= start_date)
+        source = source.where(Appointment.appointment_date >= start_date)
+
+    if end_date:
+        clear = clear.where(DoctorDailyWorkload.day <= end_date)
+        source = source.where(Appointment.appointment_date <= end_date)
+
+    db.execute(clear)
+    result = db.execute(insert(DoctorDailyWorkload).from_select(
+        ["user_id", "day", "appointment_count", "first_time", "last_time"],
+        source.group_by(Appointment.user_id, Appointment.appointment_date)
+    ))
+    db.commit()
+    logger.info(f"Contadores de carga de trabajo recalculados: {result.rowcount} filas")
+    return result.rowcount
+
+
+def get_doctor_workload(
+        db: Session,
+        start_date: date,
+        end_date: date,
+        doctor_id: Optional[int] = None,
+        granularity: str = "day"
+) -> List[Dict[str, Any]]:
+    """
+    Citas por médico y día o semana, con el intervalo promedio entre citas.
+    La suma de intervalos entre citas consecutivas de un día es (última - primera),
+    así que el promedio sale de los contadores sin leer las citas.
+    """
+    workload = DoctorDailyWorkload
+    if granularity == "week":
+        period = func.date_trunc("week", workload.day).cast(workload.day.type)
+    else:
+        period = workload.day
+
+    span_minutes = func.extract("epoch", workload.last_time - workload.first_time) / 60
+    gaps = case((workload.appointment_count > 1, workload.appointment_count - 1), else_=0)
+
+    stmt = (select(
+        period.label("period"),
+        workload.user_id,
+        AuthUser.first_name,
+        AuthUser.last_name,
+        func.sum(workload.appointment_count).label("appointments"),
+        func.count().label("working_days"),
+        (func.sum(span_minutes) / func.nullif(func.sum(gaps), 0)).label("average_gap_minutes")
+    )
+            .join(AuthUser, AuthUser.id == workload.user_id)
+            .where(workload.day.between(start_date, end_date)))
+
+    if doctor_id is not None:
+        stmt = stmt.where(workload.user_id == doctor_id)
+
+    stmt = (stmt
+            .group_by(literal_column("1"), workload.user_id, AuthUser.first_name, AuthUser.last_name)
+            .order_by(asc(literal_column("1")), workload.user_id))
+
+    return [
+        {
+            "period": row.period,
+            "user_id": row.user_id,
+            "doctor": f"{row.first_name} {row.last_name}",
+            "appointments": int(row.appointments),
+            "working_days": row.working_days,
+            "average_gap_minutes": round(float(row.average_gap_minutes), 1)
+            if row.average_gap_minutes is not None else None
+        }
+        for row in db.execute(stmt)
+    ]
@@ -0,0 +1,56 @@
+"""
+Pruebas que corren sin base de datos ni JVM.
+
+database/db.py se conecta al importarse: aquí el engine se crea con un conector que falla
+de inmediato, así ninguna prueba abre conexiones de red. Las pruebas que necesitan SQL
+usan su propio engine SQLite en memoria (fixture sqlite_session).
+
+Uso (desde Backend/):
+    python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+import sqlalchemy
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_create_engine = sqlalchemy.create_engine
+
+
+def _no_connection():
+    raise ConnectionError("las pruebas no usan la base de datos de la aplicación")
+
+
+sqlalchemy.create_engine = lambda url, **kwargs: _create_engine(url, **dict(kwargs, creator=_no_connection))
+try:
+    import database.db  # noqa: F401  (el intento de conexión falla aquí, una sola vez)
+finally:
+    sqlalchemy.create_engine = _create_engine
+
+# Todos los modelos, para que las relaciones entre ellos se resuelvan como en la aplicación
+import models.User  # noqa: E402,F401
+import models.Patient  # noqa: E402,F401
+import models.Appointment  # noqa: E402,F401
+
+
+@pytest.fixture
+def sqlite_session():
+    """
+    Sesión sobre SQLite en memoria con los esquemas medical y auth adjuntos. Cada prueba
+    crea las tablas que usa con Base.metadata.create_all(bind, tables=[...]).
+    """
+    engine = _create_engine("sqlite://")
+
+    @event.listens_for(engine, "connect")
+    def attach_schemas(connection, _record):
+        for schema in ("medical", "auth"):
+            connection.execute(f"ATTACH DATABASE ':memory:' AS {schema}")
+
+    # Una sola conexión: las bases adjuntas en memoria son por conexión
+    with engine.connect() as connection:
+        with Session(bind=connection) as session:
+            yield session
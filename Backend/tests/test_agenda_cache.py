@@ -0,0 +1,72 @@
+from datetime import date
+
+from services.agenda_cache import AgendaCache
+
+TODAY = date(2025, 3, 10)
+
+
+class Clock:
+    def __init__(self, day: date):
+        self.day = day
+
+    def __call__(self) -> date:
+        return self.day
+
+
+def test_second_read_is_a_hit_and_returns_a_copy():
+    cache = AgendaCache(Clock(TODAY))
+    loads = []
+
+    first = cache.get_or_load(None, lambda day: loads.append(day) or ["cita 1"])
+    first.append("modificada por quien llamó")
+    second = cache.get_or_load(None, lambda day: loads.append(day) or ["otra"])
+
+    assert loads == [TODAY]
+    assert second == ["cita 1"]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_write_during_load_does_not_store_stale_agenda():
+    cache = AgendaCache(Clock(TODAY))
+
+    def load_while_someone_writes(day):
+        cache.invalidate(day, 7)
+        return ["agenda vieja"]
+
+    assert cache.get_or_load(7, load_while_someone_writes) == ["agenda vieja"]
+    assert cache.get_or_load(7, lambda day: ["agenda nueva"]) == ["agenda nueva"]
+    assert cache.misses == 2
+
+
+def test_invalidate_drops_doctor_and_global_entries_only_for_today():
+    cache = AgendaCache(Clock(TODAY))
+    for doctor_id in (None, 1, 2):
+        cache.get_or_load(doctor_id, lambda day, doctor_id=doctor_id: [doctor_id])
+
+    cache.invalidate(date(2025, 3, 11), 1)
+    assert cache.stats()["entries"] == 3
+
+    cache.invalidate(TODAY, 1)
+    assert cache.stats()["entries"] == 1
+    assert cache.get_or_load(2, lambda day: ["recargada"]) == [2]
+
+
+def test_day_change_empties_the_cache():
+    clock = Clock(TODAY)
+    cache = AgendaCache(clock)
+    cache.get_or_load(None, lambda day: [day])
+
+    clock.day = date(2025, 3, 11)
+    assert cache.get_or_load(None, lambda day: [day]) == [date(2025, 3, 11)]
+
+
+def test_load_across_midnight_is_not_served_the_next_day():
+    clock = Clock(TODAY)
+    cache = AgendaCache(clock)
+
+    def load_at_midnight(day):
+        clock.day = date(2025, 3, 11)
+        return [day]
+
+    assert cache.get_or_load(None, load_at_midnight) == [TODAY]
+    assert cache.get_or_load(None, lambda day: [day]) == [date(2025, 3, 11)]
@@ -0,0 +1,118 @@
+import asyncio
+import json
+import threading
+from collections import deque
+from datetime import date, time
+
+import services.agenda_events as agenda_events
+from services.agenda_events import AgendaEventBroker
+
+DAY = date(2025, 3, 10)
+
+
+def appointment(appointment_id: int, user_id: int = 1, day: date = DAY) -> dict:
+    return {"id": appointment_id, "patient_id": 50 + appointment_id, "user_id": user_id,
+            "appointment_date": day, "appointment_time": time(9, 30)}
+
+
+def parse(message: str) -> dict:
+    fields = dict(line.split(": ", 1) for line in message.strip().split("\n"))
+    return {"id": fields.get("id"), "event": fields["event"], "data": json.loads(fields["data"])}
+
+
+def first_messages(broker: AgendaEventBroker, count: int, publish=None, **filters) -> list:
+    """Primeros mensajes del stream después de 'retry'; publish se ejecuta ya suscrito"""
+    async def collect():
+        stream = broker.stream(**filters)
+        assert await stream.__anext__() == "retry: 3000\n\n"
+        if publish:
+            threading.Thread(target=publish).start()
+        messages = [parse(await asyncio.wait_for(stream.__anext__(), 5)) for _ in range(count)]
+        await stream.aclose()
+        return messages
+    return asyncio.run(collect())
+
+
+def test_replays_events_after_last_event_id():
+    broker = AgendaEventBroker()
+    for appointment_id in (1, 2, 3):
+        broker.publish("created", appointment(appointment_id))
+
+    messages = first_messages(broker, 2, last_event_id=1)
+
+    assert [message["id"] for message in messages] == ["2", "3"]
+    assert messages[0]["event"] == "created"
+    assert messages[0]["data"]["appointment_date"] == "2025-03-10"
+    assert broker.stats()["subscribers"] == 0
+
+
+def test_replay_only_includes_events_for_the_subscriber():
+    broker = AgendaEventBroker()
+    broker.publish("created", appointment(1, user_id=1))
+    broker.publish("created", appointment(2, user_id=2))
+    broker.publish("updated", appointment(3, user_id=2, day=date(2025, 3, 11)))
+    broker.publish("deleted", appointment(4, user_id=2))
+
+    messages = first_messages(broker, 2, last_event_id=0, doctor_id=2, day=DAY)
+
+    assert [message["data"]["id"] for message in messages] == [2, 4]
+
+
+def test_moved_appointment_reaches_the_previous_day():
+    broker = AgendaEventBroker()
+    broker.publish("updated", appointment(1, day=date(2025, 3, 12)), previous_date=DAY)
+
+    [message] = first_messages(broker, 1, last_event_id=0, day=DAY)
+
+    assert message["data"]["previous_date"] == "2025-03-10"
+
+
+def test_resync_after_server_restart():
+    broker = AgendaEventBroker()
+    broker.publish("created", appointment(1))
+
+    [message] = first_messages(broker, 1, last_event_id=40)
+
+    assert message["event"] == "resync"
+    # El próximo Last-Event-ID del cliente es la secuencia actual del servidor
+    assert message["id"] == "1"
+
+
+def test_resync_when_events_left_the_buffer():
+    broker = AgendaEventBroker()
+    broker._recent = deque(maxlen=2)
+    for appointment_id in range(1, 6):
+        broker.publish("created", appointment(appointment_id))
+    subscriber = agenda_events._Subscriber(None, None, None)
+
+    assert broker._missed_events(subscriber, 2) == [{"seq": 5, "action": "resync"}]
+    assert [event["seq"] for event in broker._missed_events(subscriber, 3)] == [4, 5]
+
+
+def test_no_replay_without_last_event_id_or_when_up_to_date():
+    broker = AgendaEventBroker()
+    broker.publish("created", appointment(1))
+    subscriber = agenda_events._Subscriber(None, None, None)
+
+    assert broker._missed_events(subscriber, None) == []
+    assert broker._missed_events(subscriber, 1) == []
+
+
+def test_live_publish_from_another_thread():
+    broker = AgendaEventBroker()
+
+    [message] = first_messages(broker, 1, publish=lambda: broker.publish("created", appointment(9)))
+
+    assert message["id"] == "1"
+    assert message["data"]["id"] == 9
+
+
+def test_slow_subscriber_gets_a_resync_instead_of_a_backlog(monkeypatch):
+    monkeypatch.setattr(agenda_events, "SUBSCRIBER_QUEUE_SIZE", 2)
+    subscriber = agenda_events._Subscriber(None, None, None)
+
+    for seq in (1, 2, 3):
+        subscriber.push({"seq": seq, "action": "created"})
+
+    assert subscriber.queue.qsize() == 1
+    assert subscriber.queue.get_nowait() == {"action": "resync"}
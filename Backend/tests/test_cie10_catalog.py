@@ -0,0 +1,87 @@
+import pytest
+from fastapi import HTTPException
+
+import services.cie10_catalog as cie10_catalog
+from services.cie10_catalog import Cie10Catalog, check_diagnosis_codes, load_catalog, require_catalog
+
+ENTRIES = {
+    "J06.9": "Infección aguda de las vías respiratorias superiores, no especificada",
+    "J02.9": "Faringitis aguda, no especificada",
+    "J03.9": "Amigdalitis aguda, no especificada",
+    "K30": "Dispepsia funcional",
+    "A09": "Diarrea y gastroenteritis de presunto origen infeccioso",
+}
+
+
+@pytest.fixture
+def catalog():
+    return Cie10Catalog(ENTRIES)
+
+
+def codes(entries):
+    return [entry["code"] for entry in entries]
+
+
+def test_code_prefix_ignores_case_and_dots(catalog):
+    assert codes(catalog.autocomplete("j0")) == ["J02.9", "J03.9", "J06.9"]
+    assert codes(catalog.autocomplete("J06.")) == ["J06.9"]
+    assert codes(catalog.autocomplete("j069")) == ["J06.9"]
+
+
+def test_word_prefixes_ignore_accents_and_must_all_match(catalog):
+    assert codes(catalog.autocomplete("farin aguda")) == ["J02.9"]
+    assert codes(catalog.autocomplete("infeccion")) == ["J06.9"]
+    assert codes(catalog.autocomplete("aguda no espec")) == ["J02.9", "J03.9", "J06.9"]
+    assert catalog.autocomplete("farin diarrea") == []
+
+
+def test_limit_and_empty_query(catalog):
+    assert len(catalog.autocomplete("J", limit=2)) == 2
+    assert catalog.autocomplete("   ") == []
+
+
+def test_exact_lookup(catalog):
+    assert catalog.get(" k30 ") == {"code": "K30", "description": "Dispepsia funcional"}
+    assert catalog.contains("J069")
+    assert catalog.get("J06") is None
+
+
+@pytest.mark.parametrize("content", [
+    "codigo;descripcion\nJ06.9;Infección aguda\nK30;Dispepsia funcional\n",
+    "J06.9\tInfección aguda\nK30\tDispepsia funcional\n",
+    "\ufeffcode,description\nJ06.9,\"Infección aguda, no especificada\"\nK30,Dispepsia funcional\n",
+])
+def test_load_catalog_detects_the_separator(tmp_path, content):
+    path = tmp_path / "cie10.csv"
+    path.write_text(content, encoding="utf-8")
+
+    catalog = load_catalog(str(path))
+
+    assert len(catalog) == 2
+    assert catalog.get("J06.9")["description"].startswith("Infección aguda")
+
+
+def test_load_catalog_falls_back_when_the_separator_is_ambiguous(tmp_path):
+    path = tmp_path / "cie10.csv"
+    path.write_text("J06.9\nK30,Dispepsia funcional\n", encoding="utf-8")
+
+    assert codes(load_catalog(str(path)).autocomplete("K")) == ["K30"]
+
+
+def test_codes_are_checked_against_the_loaded_catalog(monkeypatch, catalog):
+    monkeypatch.setattr(cie10_catalog, "_catalog", catalog)
+
+    check_diagnosis_codes(["J06.9", "k30", None])
+    with pytest.raises(HTTPException) as error:
+        check_diagnosis_codes(["J06.9", "X99"])
+    assert error.value.status_code == 422
+    assert "X99" in error.value.detail
+
+
+def test_without_catalog_routes_answer_503_and_codes_are_not_checked(monkeypatch):
+    monkeypatch.setattr(cie10_catalog, "_catalog", Cie10Catalog({}))
+
+    check_diagnosis_codes(["X99"])
+    with pytest.raises(HTTPException) as error:
+        require_catalog()
+    assert error.value.status_code == 503
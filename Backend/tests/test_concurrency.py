@@ -0,0 +1,55 @@
+import logging
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from database.db import Base
+from models.Patient import Patient
+from services.concurrency import claim_version
+
+
+@pytest.fixture
+def db(sqlite_session):
+    Base.metadata.create_all(sqlite_session.connection(), tables=[Patient.__table__])
+    sqlite_session.add(Patient(id=1, first_name="Ana", last_name="Pérez", gender="F", document_id="1700000001"))
+    sqlite_session.commit()
+    return sqlite_session
+
+
+def version(db) -> int:
+    return db.scalar(select(Patient.version).where(Patient.id == 1))
+
+
+def test_matching_version_is_claimed_and_incremented(db):
+    claim_version(db, Patient, 1, 1, "El paciente")
+    db.commit()
+
+    assert version(db) == 2
+
+
+def test_stale_version_answers_409(db):
+    claim_version(db, Patient, 1, 1, "El paciente")
+    db.commit()
+
+    with pytest.raises(HTTPException) as error:
+        claim_version(db, Patient, 1, 1, "El paciente")
+
+    assert error.value.status_code == 409
+    assert "versión 1" in error.value.detail
+    assert version(db) == 2
+
+
+def test_missing_row_answers_409(db):
+    with pytest.raises(HTTPException) as error:
+        claim_version(db, Patient, 99, 1, "El paciente")
+    assert error.value.status_code == 409
+
+
+def test_save_without_version_still_increments_and_is_logged(db, caplog):
+    with caplog.at_level(logging.WARNING, logger="services.concurrency"):
+        claim_version(db, Patient, 1, None, "El paciente")
+    db.commit()
+
+    assert version(db) == 2
+    assert "sin versión" in caplog.text
@@ -0,0 +1,144 @@
+import os
+import time
+
+import pytest
+
+from services.pdf_cache import PdfCache
+
+SMALL = b"s" * 10
+LARGE = b"L" * 100
+
+
+@pytest.fixture
+def make_cache(tmp_path):
+    def make(**kwargs):
+        options = dict(directory=str(tmp_path / "cache"), max_bytes=1000, memory_bytes=25, memory_file_bytes=10,
+                       ttl_seconds=3600, sweep_seconds=3600, legacy_directory=None)
+        options.update(kwargs)
+        return PdfCache(**options)
+    return make
+
+
+def on_disk(cache: PdfCache) -> list:
+    return sorted(name for name in os.listdir(cache.directory) if name.endswith(".pdf"))
+
+
+def test_file_name_is_stable_and_prefixed_by_patient():
+    name = PdfCache.file_name(12, "jasper_medical_certificate", 3, "1,2;3")
+
+    assert name == PdfCache.file_name(12, "jasper_medical_certificate", 3, "1,2;3")
+    assert name != PdfCache.file_name(12, "jasper_medical_certificate", 3, "1,2;4")
+    assert name.startswith("p12_jasper_medical_certificate_3_") and name.endswith(".pdf")
+
+
+def test_small_pdfs_stay_in_memory_and_large_ones_on_disk(make_cache):
+    cache = make_cache()
+    cache.put("p1_python_prescription_1_a.pdf", SMALL)
+    cache.put("p1_jasper_medical_history_1_a.pdf", LARGE)
+
+    assert cache.get("p1_python_prescription_1_a.pdf") == SMALL
+    assert cache.get("p1_jasper_medical_history_1_a.pdf") == LARGE
+    assert on_disk(cache) == ["p1_jasper_medical_history_1_a.pdf"]
+    stats = cache.stats()
+    assert (stats["memory"]["files"], stats["memory"]["bytes"]) == (1, 10)
+    assert (stats["disk"]["files"], stats["disk"]["bytes"]) == (1, 100)
+    assert stats["hits"] == 2
+
+
+def test_memory_tier_evicts_least_recently_used(make_cache):
+    cache = make_cache()
+    for name in ("p1_python_x_1_a.pdf", "p1_python_x_2_a.pdf"):
+        cache.put(name, SMALL)
+    cache.get("p1_python_x_1_a.pdf")
+    cache.put("p1_python_x_3_a.pdf", SMALL)
+
+    assert cache.get("p1_python_x_2_a.pdf") is None
+    assert cache.get("p1_python_x_1_a.pdf") == SMALL
+    assert cache.stats()["evictions"] == 1
+
+
+def test_disk_tier_evicts_least_recently_used(make_cache):
+    cache = make_cache(max_bytes=250)
+    for name in ("p1_python_h_1_a.pdf", "p2_python_h_2_a.pdf"):
+        cache.put(name, LARGE)
+    cache.get("p1_python_h_1_a.pdf")
+    cache.put("p3_python_h_3_a.pdf", LARGE)
+
+    assert on_disk(cache) == ["p1_python_h_1_a.pdf", "p3_python_h_3_a.pdf"]
+    assert cache.stats()["disk"]["bytes"] == 200
+
+
+def test_open_file_survives_eviction(make_cache):
+    cache = make_cache(max_bytes=150)
+    cache.put("p1_python_h_1_a.pdf", LARGE)
+    pdf = cache.open("p1_python_h_1_a.pdf")
+    cache.put("p2_python_h_2_a.pdf", LARGE)
+
+    with pdf:
+        assert pdf.read() == LARGE
+    assert on_disk(cache) == ["p2_python_h_2_a.pdf"]
+
+
+def test_files_on_disk_are_picked_up_after_restart(make_cache):
+    make_cache().put("p1_python_h_1_a.pdf", LARGE)
+
+    cache = make_cache()
+    assert cache.get("p1_python_h_1_a.pdf") == LARGE
+    assert cache.stats()["disk"]["files"] == 1
+
+
+def test_file_removed_by_another_process_is_a_miss(make_cache):
+    cache = make_cache()
+    cache.put("p1_python_h_1_a.pdf", LARGE)
+    os.remove(os.path.join(cache.directory, "p1_python_h_1_a.pdf"))
+
+    assert cache.get("p1_python_h_1_a.pdf") is None
+    assert (cache.stats()["misses"], cache.stats()["disk"]["bytes"]) == (1, 0)
+
+
+def test_invalidate_patient_clears_both_tiers_for_that_patient_only(make_cache):
+    cache = make_cache()
+    cache.put("p1_python_prescription_1_a.pdf", SMALL)
+    cache.put("p1_jasper_medical_history_1_a.pdf", LARGE)
+    cache.put("p12_jasper_medical_history_12_a.pdf", LARGE)
+
+    cache.invalidate_patient(1)
+
+    assert cache.get("p1_python_prescription_1_a.pdf") is None
+    assert on_disk(cache) == ["p12_jasper_medical_history_12_a.pdf"]
+
+
+def test_sweep_removes_idle_entries(make_cache):
+    cache = make_cache()
+    cache.put("p1_python_prescription_1_a.pdf", SMALL)
+    cache.put("p1_python_h_1_a.pdf", LARGE)
+    assert cache.sweep() == 0
+
+    cache.ttl_seconds = -1
+    assert cache.sweep() == 2
+    assert on_disk(cache) == []
+    assert cache.stats()["expirations"] == 2
+
+
+def test_sweep_cleans_old_legacy_output(make_cache, tmp_path):
+    legacy = tmp_path / "output"
+    legacy.mkdir()
+    (legacy / "viejo.pdf").write_bytes(LARGE)
+    (legacy / "reciente.pdf").write_bytes(LARGE)
+    (legacy / "notas.txt").write_text("no es un PDF")
+    two_days_ago = time.time() - 2 * 86400
+    for name in ("viejo.pdf", "notas.txt"):
+        os.utime(legacy / name, (two_days_ago, two_days_ago))
+
+    cache = make_cache(legacy_directory=str(legacy), ttl_seconds=86400)
+
+    assert cache.sweep() == 1
+    assert sorted(os.listdir(legacy)) == ["notas.txt", "reciente.pdf"]
+
+
+def test_write_errors_are_counted_not_raised(make_cache):
+    cache = make_cache()
+    cache.put("no_existe/p1_python_h_1_a.pdf", LARGE)
+
+    assert cache.stats()["write_errors"] == 1
+    assert cache.stats()["disk"]["files"] == 0
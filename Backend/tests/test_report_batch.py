@@ -0,0 +1,63 @@
+import io
+import threading
+import zipfile
+from contextlib import nullcontext
+from datetime import date
+
+import pytest
+
+import services.report_batch as report_batch
+
+
+class FakeJasper:
+    workers = 2
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def render(self, template, parameters, rows):
+        appointment_id = parameters["APPOINTMENT_ID"]
+        if appointment_id == 3:
+            raise RuntimeError("plantilla inválida")
+        if appointment_id == 4:
+            self.release.wait(5)
+        return f"%PDF {template} {appointment_id}".encode()
+
+
+@pytest.fixture
+def jasper(monkeypatch):
+    monkeypatch.setattr(report_batch, "LOAD_CHUNK", 2)
+    monkeypatch.setattr(report_batch, "REPORT_BATCH_TIMEOUT", 0.5)
+    monkeypatch.setattr(report_batch, "JASPER_REPORTS", {
+        "medical_certificate": ("medicalCertificate", "APPOINTMENT_ID", lambda certificate: [certificate]),
+    })
+    monkeypatch.setattr(report_batch, "load_certificates", lambda db, appointment_ids: [
+        {"id": appointment_id, "appointment_date": date(2025, 3, appointment_id)} for appointment_id in appointment_ids
+    ])
+    fake = FakeJasper()
+    yield fake
+    fake.release.set()
+
+
+def read_zip(parts) -> zipfile.ZipFile:
+    return zipfile.ZipFile(io.BytesIO(b"".join(parts)))
+
+
+def test_jasper_batch_keeps_order_and_reports_failures(jasper):
+    archive = read_zip(report_batch.stream_certificates_zip(nullcontext, [1, 2, 3, 4, 5], jasper))
+
+    assert archive.namelist() == [
+        "certificado_2025-03-01_1.pdf", "certificado_2025-03-02_2.pdf", "certificado_2025-03-05_5.pdf", "errores.txt"
+    ]
+    assert archive.read("certificado_2025-03-05_5.pdf") == b"%PDF medicalCertificate 5"
+    errors = archive.read("errores.txt").decode().splitlines()
+    assert errors == [
+        "certificado_2025-03-03_3.pdf: plantilla inválida",
+        "certificado_2025-03-04_4.pdf: tiempo de generación agotado (0.5 s)",
+    ]
+
+
+def test_batch_without_failures_has_no_error_file(jasper):
+    archive = read_zip(report_batch.stream_certificates_zip(nullcontext, [1, 2], jasper))
+
+    assert archive.namelist() == ["certificado_2025-03-01_1.pdf", "certificado_2025-03-02_2.pdf"]
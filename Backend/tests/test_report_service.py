@@ -0,0 +1,99 @@
+from datetime import date
+
+import pytest
+
+import services.report_service as report_service
+from services.pdf_cache import PdfCache
+
+
+class FakeJasper:
+    def __init__(self):
+        self.calls = []
+
+    def render(self, template, parameters, rows):
+        self.calls.append((template, parameters, rows))
+        return b"%PDF jasper"
+
+
+@pytest.fixture
+def reports(monkeypatch, tmp_path):
+    """Reportes con cargadores y generadores de prueba sobre una caché en un directorio temporal"""
+    state = {"version": "v1", "loads": 0, "renders": 0}
+
+    def load(db, entity_id):
+        state["loads"] += 1
+        return {"id": entity_id}
+
+    def render(data):
+        state["renders"] += 1
+        return f"%PDF python {data.get('generated_on')}".encode()
+
+    monkeypatch.setattr(report_service, "REPORTS", {
+        "medical_certificate": (load, render, "certificado_{}.pdf"),
+        "medical_history": (load, render, "historial_{}.pdf"),
+    })
+    monkeypatch.setattr(report_service, "JASPER_REPORTS", {
+        "medical_certificate": ("medicalCertificate", "APPOINTMENT_ID", lambda data: [data]),
+        "medical_history": ("MedicalRecord", "patient_id", lambda data: [data]),
+    })
+    monkeypatch.setattr(report_service, "report_content_version",
+                        lambda db, report_type, entity_id: (7, state["version"]) if entity_id != 404 else None)
+    cache = PdfCache(str(tmp_path), legacy_directory=None, sweep_seconds=3600)
+    monkeypatch.setattr(report_service, "report_pdf_cache", cache)
+    state["cache"] = cache
+    return state
+
+
+def test_reprint_without_changes_comes_from_the_cache(reports):
+    first = report_service.render_report(None, "medical_certificate", 3)
+    second = report_service.render_report(None, "medical_certificate", 3)
+
+    assert first == second
+    assert reports["renders"] == 1
+    assert reports["loads"] == 1
+
+
+def test_new_content_version_renders_again(reports):
+    report_service.render_report(None, "medical_certificate", 3)
+    reports["version"] = "v2"
+    report_service.render_report(None, "medical_certificate", 3)
+
+    assert reports["renders"] == 2
+
+
+def test_jasper_and_python_outputs_never_mix(reports):
+    jasper = FakeJasper()
+
+    assert report_service.render_report(None, "medical_certificate", 3, jasper) == b"%PDF jasper"
+    assert report_service.render_report(None, "medical_certificate", 3, jasper) == b"%PDF jasper"
+    assert report_service.render_report(None, "medical_certificate", 3).startswith(b"%PDF python")
+
+    assert len(jasper.calls) == 1
+    assert jasper.calls[0][:2] == ("medicalCertificate", {"APPOINTMENT_ID": 3})
+    assert reports["cache"].stats()["files_by_engine"] == {"jasper": 1, "python": 1}
+
+
+def test_dated_report_prints_the_day_in_its_key(reports, monkeypatch):
+    class Today(date):
+        value = date(2025, 3, 10)
+
+        @classmethod
+        def today(cls):
+            return cls.value
+
+    monkeypatch.setattr(report_service, "date", Today)
+    jasper = FakeJasper()
+
+    assert report_service.render_report(None, "medical_history", 7) == b"%PDF python 2025-03-10"
+    report_service.render_report(None, "medical_history", 7, jasper)
+    assert jasper.calls[0][1] == {"patient_id": 7, "REPORT_DATE": date(2025, 3, 10)}
+
+    Today.value = date(2025, 3, 11)
+    assert report_service.render_report(None, "medical_history", 7) == b"%PDF python 2025-03-11"
+    assert reports["renders"] == 2
+
+
+def test_missing_entity_is_rendered_without_caching(reports):
+    report_service.render_report(None, "medical_certificate", 404)
+
+    assert reports["cache"].stats()["memory"]["files"] == 0
@@ -0,0 +1,78 @@
+import io
+
+import pytest
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+
+import routes.report as report
+from routes.report import _byte_range
+
+PDF = bytes(range(256)) * 1024  # 256 KiB: varias partes de PDF_CHUNK_SIZE
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=990-5000", (990, 999)),
+    (" bytes=0-0 ", (0, 0)),
+])
+def test_single_ranges(header, expected):
+    assert _byte_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=-", "bytes=0-10,20-30", "items=0-10", "bytes=a-b"])
+def test_unsupported_ranges_are_ignored(header):
+    assert _byte_range(header, 1000) is None
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=1500-2000", "bytes=50-10"])
+def test_unsatisfiable_ranges_answer_416(header):
+    with pytest.raises(HTTPException) as error:
+        _byte_range(header, 1000)
+    assert error.value.status_code == 416
+    assert error.value.headers == {"Content-Range": "bytes */1000"}
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+
+    @app.get("/pdf")
+    def pdf(request: Request):
+        return report._pdf_response(request, io.BytesIO(PDF), "reporte.pdf")
+
+    return TestClient(app)
+
+
+def test_full_download(client):
+    response = client.get("/pdf")
+
+    assert response.status_code == 200
+    assert response.content == PDF
+    assert response.headers["content-length"] == str(len(PDF))
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["content-disposition"] == "attachment; filename=reporte.pdf"
+
+
+def test_range_crossing_chunks(client):
+    start, end = report.PDF_CHUNK_SIZE - 10, 2 * report.PDF_CHUNK_SIZE + 10
+    response = client.get("/pdf", headers={"Range": f"bytes={start}-{end}"})
+
+    assert response.status_code == 206
+    assert response.content == PDF[start:end + 1]
+    assert response.headers["content-range"] == f"bytes {start}-{end}/{len(PDF)}"
+    assert response.headers["content-length"] == str(end - start + 1)
+
+
+def test_suffix_and_open_ended_ranges(client):
+    assert client.get("/pdf", headers={"Range": "bytes=-10"}).content == PDF[-10:]
+    assert client.get("/pdf", headers={"Range": f"bytes={len(PDF) - 3}-"}).content == PDF[-3:]
+
+
+def test_out_of_range_request(client):
+    response = client.get("/pdf", headers={"Range": f"bytes={len(PDF)}-"})
+
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(PDF)}"
@@ -0,0 +1,42 @@
+import base64
+from datetime import date, time
+
+import pytest
+from fastapi import HTTPException
+
+from services.appointment_service import _decode_timeline_cursor, _encode_timeline_cursor
+
+LAST_ROW = {"id": 1234, "appointment_date": date(2025, 3, 10), "appointment_time": time(9, 30)}
+
+
+def test_cursor_round_trip():
+    cursor = _encode_timeline_cursor(LAST_ROW)
+
+    assert _decode_timeline_cursor(cursor) == (date(2025, 3, 10), time(9, 30), 1234)
+
+
+def test_cursor_is_url_safe_without_padding():
+    for appointment_id in range(1, 20):
+        cursor = _encode_timeline_cursor(dict(LAST_ROW, id=appointment_id, appointment_time=time(23, 59, 59)))
+        assert "=" not in cursor
+        assert set(cursor) <= set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_")
+        assert _decode_timeline_cursor(cursor)[2] == appointment_id
+
+
+def test_seconds_in_the_time_are_kept():
+    cursor = _encode_timeline_cursor(dict(LAST_ROW, appointment_time=time(9, 30, 15)))
+
+    assert _decode_timeline_cursor(cursor)[1] == time(9, 30, 15)
+
+
+@pytest.mark.parametrize("cursor", [
+    "no-es-un-cursor",
+    base64.urlsafe_b64encode(b"2025-03-10|09:30").decode(),
+    base64.urlsafe_b64encode(b"2025-13-10|09:30:00|1").decode(),
+    base64.urlsafe_b64encode(b"2025-03-10|09:30:00|uno").decode(),
+    base64.urlsafe_b64encode(b"\xff\xfe").decode(),
+])
+def test_invalid_cursor_answers_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        _decode_timeline_cursor(cursor)
+    assert error.value.status_code == 400
@@ -0,0 +1,84 @@
+from datetime import date, datetime
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+
+from database.db import Base
+from models.User import AuthUser, Role
+from services.user_service import get_users
+
+USERS = [
+    ("Ana", "doctor", date(1980, 5, 1)),
+    ("andrés", "doctor", date(1990, 1, 15)),
+    ("Andrea", "admin", None),
+    ("Beatriz", "doctor", date(1975, 7, 30)),
+    ("an_a", "admin", date(2000, 2, 2)),
+    ("ANNA%", "doctor", date(1995, 3, 3)),
+]
+
+
+@pytest.fixture
+def db(sqlite_session):
+    Base.metadata.create_all(sqlite_session.connection(), tables=[Role.__table__, AuthUser.__table__])
+    sqlite_session.add_all([Role(id=1, name="doctor"), Role(id=2, name="admin")])
+    for user_id, (first_name, role, birth_date) in enumerate(USERS, start=1):
+        sqlite_session.add(AuthUser(id=user_id, first_name=first_name, last_name="Pérez", email=f"u{user_id}@fenix.ec",
+                                    password="x", birth_date=birth_date, role_id=1 if role == "doctor" else 2,
+                                    is_active=True, created_at=datetime(2025, 1, 1)))
+    sqlite_session.commit()
+    return sqlite_session
+
+
+@pytest.fixture
+def statements(db):
+    executed = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: executed.append(args[2]))
+    return executed
+
+
+def names(page: dict) -> list:
+    return [user["first_name"] for user in page["data"]]
+
+
+def test_page_and_total_come_from_one_query(db, statements):
+    page = get_users(db, skip=1, limit=2)
+
+    assert names(page) == ["andrés", "Andrea"]
+    assert (page["total"], page["skip"], page["limit"]) == (6, 1, 2)
+    assert page["data"][0] == {
+        "id": 2, "first_name": "andrés", "last_name": "Pérez", "email": "u2@fenix.ec", "cedula": None,
+        "birth_date": "1990-01-15", "role": "doctor", "created_at": "2025-01-01T00:00:00", "is_active": True
+    }
+    assert len(statements) == 1
+
+
+def test_filters_by_role_and_birth_date_bounds(db):
+    assert names(get_users(db, role="admin")) == ["Andrea", "an_a"]
+    assert names(get_users(db, role="doctor", start_birth_date="1980-01-01")) == ["Ana", "andrés", "ANNA%"]
+    assert names(get_users(db, end_birth_date="1980-05-01")) == ["Ana", "Beatriz"]
+
+
+def test_first_name_is_a_case_insensitive_prefix_with_literal_wildcards(db):
+    assert names(get_users(db, first_name="AN")) == ["Ana", "andrés", "Andrea", "an_a", "ANNA%"]
+    assert names(get_users(db, first_name="an_")) == ["an_a"]
+    assert names(get_users(db, first_name="anna%")) == ["ANNA%"]
+    assert names(get_users(db, first_name="nd")) == []
+
+
+def test_empty_page_past_the_end_still_reports_the_total(db, statements):
+    page = get_users(db, role="doctor", skip=10, limit=5)
+
+    assert (page["data"], page["total"]) == ([], 4)
+    assert len(statements) == 2
+
+
+def test_empty_first_page_needs_no_count(db, statements):
+    assert get_users(db, first_name="zz")["total"] == 0
+    assert len(statements) == 1
+
+
+def test_invalid_birth_date_answers_400(db):
+    with pytest.raises(HTTPException) as error:
+        get_users(db, start_birth_date="01/02/1990")
+    assert error.value.status_code == 400
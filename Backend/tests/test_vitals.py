@@ -0,0 +1,61 @@
+from decimal import Decimal
+
+import pytest
+
+from services.vitals_service import VITAL_FIELDS, parse_vitals
+
+
+def vitals(temperature=None, blood_pressure=None, heart_rate=None, oxygen_saturation=None, weight=None,
+           weight_unit=None, height=None) -> dict:
+    return parse_vitals(temperature, blood_pressure, heart_rate, oxygen_saturation, weight, weight_unit, height)
+
+
+def test_free_text_is_normalized():
+    assert vitals("36,8 °C", "120 / 80 mmHg", "72 lpm", "97%", Decimal("70.50"), "kg", "1.70") == {
+        "temperature_c": 36.8,
+        "systolic_mmhg": 120,
+        "diastolic_mmhg": 80,
+        "heart_rate_bpm": 72,
+        "oxygen_saturation_pct": 97.0,
+        "weight_kg": 70.5,
+        "height_cm": 170.0,
+    }
+
+
+def test_empty_values_give_none_for_every_field():
+    assert vitals() == {field: None for field in VITAL_FIELDS}
+    assert vitals("", "", "", "", None, "", "") == {field: None for field in VITAL_FIELDS}
+
+
+def test_fahrenheit_temperature_is_converted():
+    assert vitals(temperature="98.6")["temperature_c"] == 37.0
+
+
+@pytest.mark.parametrize("weight, unit, expected", [
+    (Decimal("154"), "lb", 69.85),
+    (Decimal("154"), " LBS ", 69.85),
+    (Decimal("3500"), "g", 3.5),
+    (Decimal("12.345"), None, 12.35),
+])
+def test_weight_units(weight, unit, expected):
+    assert vitals(weight=weight, weight_unit=unit)["weight_kg"] == expected
+
+
+def test_height_in_centimeters_is_kept():
+    assert vitals(height="165 cm")["height_cm"] == 165.0
+
+
+@pytest.mark.parametrize("field, kwargs", [
+    ("temperature_c", {"temperature": "25"}),
+    ("heart_rate_bpm", {"heart_rate": "720"}),
+    ("oxygen_saturation_pct", {"oxygen_saturation": "150"}),
+    ("systolic_mmhg", {"blood_pressure": "400/80"}),
+    ("weight_kg", {"weight": Decimal("900")}),
+])
+def test_implausible_values_are_discarded(field, kwargs):
+    assert vitals(**kwargs)[field] is None
+
+
+def test_unparseable_blood_pressure():
+    values = vitals(blood_pressure="normal")
+    assert values["systolic_mmhg"] is None and values["diastolic_mmhg"] is None